@@ -0,0 +1,142 @@
+import casadi
+import matplotlib
+import numpy as np
+import pytest
+
+from training_ml_control.control import build_lqr_controller, build_mpc_controller
+from training_ml_control.environments import (
+    create_cart_environment,
+    create_inverted_pendulum_environment,
+)
+from training_ml_control.explicit_mpc import build_explicit_mpc_controller
+from training_ml_control.models import (
+    build_cart_model,
+    build_inverted_pendulum_linear_model,
+    build_inverted_pendulum_nonlinear_model,
+)
+
+# Render animations without a display
+matplotlib.use("Agg")
+
+
+@pytest.fixture(scope="session")
+def cart_env():
+    return create_cart_environment(render_mode=None, goal_position=9)
+
+
+@pytest.fixture(scope="session")
+def inverted_pendulum_env():
+    return create_inverted_pendulum_environment(render_mode=None, max_steps=200)
+
+
+@pytest.fixture(scope="session")
+def cart_model(cart_env):
+    return build_cart_model(cart_env)
+
+
+@pytest.fixture(scope="session")
+def inverted_pendulum_linear_model(inverted_pendulum_env):
+    return build_inverted_pendulum_linear_model(inverted_pendulum_env)
+
+
+@pytest.fixture(scope="session")
+def inverted_pendulum_nonlinear_model(inverted_pendulum_env):
+    return build_inverted_pendulum_nonlinear_model(inverted_pendulum_env)
+
+
+@pytest.fixture(scope="session")
+def cart_lqr_kwargs(cart_env, cart_model):
+    return dict(
+        model=cart_model,
+        t_step=cart_env.dt,
+        n_horizon=None,
+        setpoint=np.array([[cart_env.goal_position], [0.0]]),
+        Q=np.diag([100, 1]),
+        R=np.diag([1e-2]),
+    )
+
+
+@pytest.fixture(scope="session")
+def cart_mpc_kwargs(cart_env, cart_model):
+    distance_cost = casadi.norm_2(cart_model.x["position"] - cart_env.goal_position)
+    return dict(
+        model=cart_model,
+        t_step=cart_env.dt,
+        n_horizon=10,
+        stage_cost=distance_cost,
+        terminal_cost=distance_cost,
+        u_penalty={"force": 1e-2},
+        x_limits={"velocity": np.array([-10, 10])},
+        u_limits={"force": np.array([-10, 10])},
+    )
+
+
+@pytest.fixture(scope="session")
+def cart_quadratic_mpc_kwargs(cart_env, cart_mpc_kwargs):
+    """Same as `cart_mpc_kwargs` with quadratic costs,
+    which turns the optimization problem into a QP solved with OSQP."""
+    distance_cost = (
+        cart_mpc_kwargs["model"].x["position"] - cart_env.goal_position
+    ) ** 2
+    return dict(
+        cart_mpc_kwargs,
+        stage_cost=distance_cost,
+        terminal_cost=distance_cost,
+        qp_solver="osqp",
+    )
+
+
+@pytest.fixture(scope="session")
+def inverted_pendulum_mpc_kwargs(
+    inverted_pendulum_env, inverted_pendulum_nonlinear_model
+):
+    model = inverted_pendulum_nonlinear_model
+    distance_cost = casadi.bilin(np.diag([1, 0, 100, 1]), model.x.cat)
+    return dict(
+        model=model,
+        t_step=inverted_pendulum_env.dt,
+        n_horizon=50,
+        stage_cost=distance_cost,
+        terminal_cost=distance_cost,
+        u_penalty={"force": 1e-3},
+        x_limits={"position": np.array([-3, 3])},
+        u_limits={"force": np.array([-30, 30])},
+    )
+
+
+@pytest.fixture(scope="session")
+def cart_lqr_controller(cart_lqr_kwargs):
+    return build_lqr_controller(**cart_lqr_kwargs)
+
+
+@pytest.fixture(scope="session")
+def cart_explicit_mpc_controller(cart_env, cart_model):
+    return build_explicit_mpc_controller(
+        cart_model,
+        n_horizon=5,
+        setpoint=np.array([cart_env.goal_position, 0.0]),
+        Q=np.diag([100, 1]),
+        R=np.diag([1e-2]),
+        x_limits={
+            "position": np.array([-20, 20]),
+            "velocity": np.array([-cart_env.max_speed, cart_env.max_speed]),
+        },
+        u_limits={"force": np.array([-10, 10])},
+    )
+
+
+@pytest.fixture(scope="session")
+def mpc_controller_factory(request):
+    """Builds MPC controllers once per session, keyed by the name
+    of the fixture with their arguments and by the compile option."""
+    controllers = {}
+
+    def factory(kwargs_fixture: str, compile: str | None = None):
+        if (kwargs_fixture, compile) not in controllers:
+            kwargs = request.getfixturevalue(kwargs_fixture)
+            controllers[kwargs_fixture, compile] = build_mpc_controller(
+                **kwargs, compile=compile
+            )
+        return controllers[kwargs_fixture, compile]
+
+    return factory
@@ -0,0 +1,75 @@
+import shutil
+
+import numpy as np
+import pytest
+
+from training_ml_control.control import build_lqr_controller, build_mpc_controller
+from training_ml_control.rti_mpc import build_rti_mpc_controller
+
+
+def test_build_lqr_controller(benchmark, cart_lqr_kwargs):
+    benchmark(build_lqr_controller, **cart_lqr_kwargs)
+
+
+@pytest.mark.parametrize(
+    "kwargs_fixture", ["cart_mpc_kwargs", "inverted_pendulum_mpc_kwargs"]
+)
+def test_build_mpc_controller(benchmark, request, kwargs_fixture):
+    kwargs = request.getfixturevalue(kwargs_fixture)
+    benchmark.pedantic(build_mpc_controller, kwargs=kwargs, rounds=3)
+
+
+def test_lqr_make_step(benchmark, cart_lqr_controller):
+    x0 = np.array([[0.5], [0.0]])
+    benchmark(cart_lqr_controller.make_step, x0)
+
+
+def test_explicit_mpc_act(benchmark, cart_explicit_mpc_controller):
+    x0 = np.array([0.5, 0.0])
+    benchmark(cart_explicit_mpc_controller.act, x0)
+
+
+@pytest.mark.parametrize("compile", [None, "jit", "codegen"])
+@pytest.mark.parametrize(
+    "kwargs_fixture, x0",
+    [
+        ("cart_mpc_kwargs", np.array([[0.5], [0.0]])),
+        ("cart_quadratic_mpc_kwargs", np.array([[0.5], [0.0]])),
+        ("inverted_pendulum_mpc_kwargs", np.array([[0.0], [0.0], [0.1], [0.0]])),
+    ],
+    ids=["cart", "cart_quadratic", "inverted_pendulum"],
+)
+def test_mpc_make_step(benchmark, mpc_controller_factory, kwargs_fixture, x0, compile):
+    if compile is not None and shutil.which("cc") is None:
+        pytest.skip("No C compiler available")
+    mpc = mpc_controller_factory(kwargs_fixture, compile)
+
+    def setup():
+        mpc.reset_history()
+        mpc.x0 = x0
+        mpc.set_initial_guess()
+
+    def make_step():
+        mpc.make_step(x0)
+
+    # Solve from a cold start, like the first step of an episode
+    benchmark.pedantic(make_step, setup=setup, rounds=10)
+
+
+def test_rti_mpc_make_step(
+    benchmark, inverted_pendulum_env, inverted_pendulum_mpc_kwargs
+):
+    kwargs = inverted_pendulum_mpc_kwargs
+    controller = build_rti_mpc_controller(
+        kwargs["model"],
+        kwargs["t_step"],
+        kwargs["n_horizon"],
+        setpoint=np.zeros(4),
+        Q=np.diag([1, 0, 100, 1]),
+        R=np.diag([1e-3]),
+        x_limits=kwargs["x_limits"],
+        u_limits=kwargs["u_limits"],
+    )
+    x0 = np.array([[0.0], [0.0], [0.1], [0.0]])
+    # Each step is warm-started from the previous one, as in closed loop
+    benchmark(controller.make_step, x0)
@@ -0,0 +1,21 @@
+import networkx as nx
+import pytest
+
+from training_ml_control.environments import value_iteration
+
+
+def create_grid_graph(size: int) -> nx.DiGraph:
+    """Directed grid graph in which all nodes can move to their neighbours
+    except the target node in the corner, which is terminal."""
+    G = nx.grid_2d_graph(size, size).to_directed()
+    target_node = (0, 0)
+    G.remove_edges_from(list(G.out_edges(target_node)))
+    return G
+
+
+@pytest.mark.parametrize("size", [5, 10, 20])
+def test_value_iteration(benchmark, size):
+    G = create_grid_graph(size)
+    benchmark.extra_info["n_nodes"] = G.number_of_nodes()
+    values = benchmark(value_iteration, G)
+    assert values[(size - 1, size - 1)] == 2 * (size - 1)
@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+
+from training_ml_control.control import (
+    ConstantController,
+    LQRController,
+    RandomController,
+)
+from training_ml_control.environments import (
+    create_cart_environment,
+    create_grid_world_environment,
+    create_inverted_pendulum_environment,
+    simulate_environment,
+)
+
+N_STEPS = 1000
+
+
+def run_episodes(env, actions):
+    env.reset(seed=16)
+    for action in actions:
+        _, _, terminated, truncated, _ = env.step(action)
+        if np.any(terminated) or np.any(truncated):
+            env.reset()
+
+
+@pytest.mark.parametrize(
+    "factory, kwargs",
+    [
+        (create_cart_environment, {"max_steps": N_STEPS}),
+        (create_inverted_pendulum_environment, {"max_steps": N_STEPS}),
+        (create_grid_world_environment, {"max_steps": N_STEPS}),
+    ],
+    ids=["cart", "inverted_pendulum", "grid_world"],
+)
+def test_env_step(benchmark, factory, kwargs):
+    env = factory(render_mode=None, **kwargs)
+    env.action_space.seed(16)
+    actions = [env.action_space.sample() for _ in range(N_STEPS)]
+    benchmark.extra_info["steps"] = N_STEPS
+    benchmark(run_episodes, env, actions)
+
+
+@pytest.mark.parametrize(
+    "factory",
+    [create_cart_environment, create_inverted_pendulum_environment],
+    ids=["cart", "inverted_pendulum"],
+)
+@pytest.mark.parametrize("num_envs", [16, 1024])
+def test_vector_env_step(benchmark, factory, num_envs):
+    env = factory(num_envs=num_envs, max_steps=N_STEPS)
+    env.action_space.seed(16)
+    actions = [env.action_space.sample() for _ in range(N_STEPS // 10)]
+    benchmark.extra_info["steps"] = num_envs * len(actions)
+    benchmark(run_episodes, env, actions)
+
+
+@pytest.mark.parametrize(
+    "factory, controller_factory",
+    [
+        (create_cart_environment, lambda env: ConstantController(np.array([1.0]))),
+        (create_inverted_pendulum_environment, RandomController),
+    ],
+    ids=["cart", "inverted_pendulum"],
+)
+def test_simulate_environment(benchmark, factory, controller_factory):
+    env = factory(render_mode=None, max_steps=N_STEPS)
+    controller = controller_factory(env)
+    benchmark(simulate_environment, env, max_steps=N_STEPS, controller=controller)
+
+
+class MakeStepController:
+    def __init__(self, lqr) -> None:
+        self.lqr = lqr
+
+    def act(self, measurement):
+        return self.lqr.make_step(measurement.reshape(-1, 1)).ravel()
+
+
+def test_simulate_environment_withLQR(benchmark, cart_env, cart_lqr_controller):
+    env = create_cart_environment(render_mode=None, goal_position=9, max_steps=200)
+    controller = MakeStepController(cart_lqr_controller)
+    benchmark(simulate_environment, env, max_steps=200, controller=controller)
+
+
+def test_simulate_environment_withBatchedLQR(benchmark, cart_lqr_controller):
+    env = create_cart_environment(render_mode=None, goal_position=9, max_steps=200)
+    controller = LQRController.from_lqr(cart_lqr_controller)
+    benchmark(simulate_environment, env, max_steps=200, controller=controller)
+
+
+@pytest.mark.parametrize("num_envs", [16, 1024])
+def test_vector_env_rollout_withBatchedLQR(benchmark, cart_lqr_controller, num_envs):
+    env = create_cart_environment(num_envs=num_envs, goal_position=9, max_steps=200)
+    controller = LQRController.from_lqr(cart_lqr_controller)
+
+    def rollout():
+        observations, _ = env.reset(seed=16)
+        for _ in range(200):
+            observations, *_ = env.step(controller.act_batch(observations))
+
+    benchmark.extra_info["steps"] = num_envs * 200
+    benchmark(rollout)
@@ -0,0 +1,72 @@
+"""Accuracy against cost of the integrators of the inverted pendulum environment.
+
+Each configuration simulates the same open-loop trajectory, with the force
+held constant over control intervals of `dt`. The maximum errors with respect
+to a reference computed with many RK4 substeps are recorded
+in the extra info of the benchmarks.
+"""
+import functools
+
+import numpy as np
+import pytest
+
+from training_ml_control.environments.inverted_pendulum import InvertedPendulumEnv
+
+DURATION = 2.0
+
+
+def force_profile(t: float) -> float:
+    return 2.0 * np.sin(2 * np.pi * t)
+
+
+def create_env(
+    kinematics_integrator: str, dt: float, n_substeps: int
+) -> InvertedPendulumEnv:
+    return InvertedPendulumEnv(
+        theta_initial=10,
+        x_threshold=np.inf,
+        theta_threshold=np.inf,
+        dt=dt,
+        kinematics_integrator=kinematics_integrator,
+        n_substeps=n_substeps,
+    )
+
+
+def simulate(env: InvertedPendulumEnv) -> np.ndarray:
+    env.reset(seed=16, options={"low": 0.0, "high": 0.0})
+    n_steps = round(DURATION / env.dt)
+    states = np.empty((n_steps + 1, 4))
+    states[0] = env.state
+    for i in range(n_steps):
+        env.step(np.array([force_profile(i * env.dt)]))
+        states[i + 1] = env.state
+    return states
+
+
+@functools.cache
+def reference(dt: float) -> np.ndarray:
+    return simulate(create_env("rk4", dt, 200))
+
+
+@pytest.mark.parametrize(
+    "kinematics_integrator, dt, n_substeps",
+    [
+        ("euler", 0.02, 1),
+        ("semi-implicit euler", 0.02, 1),
+        ("rk4", 0.02, 1),
+        ("euler", 0.1, 1),
+        ("euler", 0.1, 5),
+        ("semi-implicit euler", 0.1, 5),
+        ("rk4", 0.1, 1),
+        ("rk4", 0.1, 2),
+        ("rk45", 0.1, 1),
+    ],
+)
+def test_integrator(benchmark, kinematics_integrator, dt, n_substeps):
+    env = create_env(kinematics_integrator, dt, n_substeps)
+    states = benchmark(simulate, env)
+    error = np.max(np.abs(states - reference(dt)), axis=0)
+    benchmark.extra_info["steps"] = len(states) - 1
+    benchmark.extra_info["max_position_error"] = float(error[0])
+    benchmark.extra_info["max_angle_error"] = float(error[2])
+    assert np.isfinite(error).all()
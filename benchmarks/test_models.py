@@ -0,0 +1,93 @@
+import casadi
+import numpy as np
+import pysindy as ps
+import pytest
+
+from training_ml_control.control import build_mpc_controller
+from training_ml_control.models import build_dmd_model, build_sindy_model
+
+
+@pytest.fixture(scope="module")
+def training_data():
+    rng = np.random.default_rng(16)
+    dt = 0.02
+    t = np.arange(0, 20, dt)
+    U = np.sin(t)[:, np.newaxis] + 0.1 * rng.normal(size=(len(t), 1))
+    X = np.stack([np.cos(t), np.sin(t), np.cos(2 * t), np.sin(2 * t)], axis=1)
+    return X, U, dt
+
+
+@pytest.mark.parametrize("degree", [1, 2, 3])
+def test_build_sindy_model(benchmark, training_data, degree):
+    X, U, dt = training_data
+    sindy_model = ps.SINDy(
+        optimizer=ps.STLSQ(threshold=0.0),
+        feature_library=ps.PolynomialLibrary(degree=degree),
+        differentiation_method=ps.FiniteDifference(order=1),
+    )
+    sindy_model.fit(X, u=U, t=dt)
+    benchmark.extra_info["n_features"] = len(sindy_model.get_feature_names())
+    model = benchmark(build_sindy_model, sindy_model)
+    benchmark.extra_info["n_nodes"] = casadi.n_nodes(model._rhs)
+
+
+@pytest.fixture(scope="module")
+def duffing_data():
+    # Damped Duffing oscillator with piecewise constant inputs,
+    # whose identified models can be controlled from the same initial state
+    rng = np.random.default_rng(16)
+    dt = 0.01
+    n_steps = 3000
+    U = np.repeat(rng.uniform(-1, 1, size=(n_steps // 50, 1)), 50, axis=0)
+    X = np.zeros((n_steps, 2))
+    X[0] = [1.0, 0.0]
+    for k in range(n_steps - 1):
+        x, v = X[k]
+        X[k + 1] = X[k] + dt * np.array([v, -x - 0.5 * v - x**3 + U[k, 0]])
+    return X, U, dt
+
+
+@pytest.mark.parametrize("degree", [3, 5])
+def test_sindy_mpc_make_step(benchmark, duffing_data, degree):
+    X, U, dt = duffing_data
+    sindy_model = ps.SINDy(
+        optimizer=ps.STLSQ(threshold=0.0),
+        feature_library=ps.PolynomialLibrary(degree=degree),
+        differentiation_method=ps.FiniteDifference(order=1),
+    )
+    sindy_model.fit(X, u=U, t=dt)
+    model = build_sindy_model(sindy_model)
+    benchmark.extra_info["n_nodes"] = casadi.n_nodes(model._rhs)
+    mpc = build_mpc_controller(
+        model,
+        t_step=0.05,
+        n_horizon=20,
+        stage_cost=casadi.sumsqr(model.x.cat) + 0.1 * casadi.sumsqr(model.u.cat),
+        terminal_cost=casadi.sumsqr(model.x.cat),
+        u_limits={"u0": np.array([-1, 1])},
+    )
+    x0 = X[0].reshape(-1, 1)
+
+    def setup():
+        mpc.reset_history()
+        mpc.x0 = x0
+        mpc.set_initial_guess()
+
+    def make_step():
+        mpc.make_step(x0)
+
+    # Solve from a cold start, like the first step of an episode
+    benchmark.pedantic(make_step, setup=setup, rounds=10)
+
+
+@pytest.mark.parametrize("degree", [1, 2])
+def test_build_dmd_model(benchmark, training_data, degree):
+    pk = pytest.importorskip("pykoopman")
+    X, U, dt = training_data
+    dmd_model = pk.Koopman(
+        observables=pk.observables.Polynomial(degree=degree),
+        regressor=pk.regression.EDMDc(),
+    )
+    dmd_model.fit(X, u=U, dt=dt)
+    model = benchmark(build_dmd_model, dmd_model)
+    benchmark.extra_info["n_nodes"] = casadi.n_nodes(model._rhs)
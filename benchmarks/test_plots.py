@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+from do_mpc.simulator import Simulator
+from matplotlib import animation
+
+from training_ml_control.plots import (
+    animate_cart_simulation,
+    animate_full_inverted_pendulum_simulation,
+    animate_inverted_pendulum_simulation,
+)
+
+pytestmark = pytest.mark.skipif(
+    not animation.writers.is_available("ffmpeg"),
+    reason="Animations are encoded with ffmpeg",
+)
+
+N_STEPS = 50
+
+
+def simulate(model, t_step, x0):
+    simulator = Simulator(model)
+    simulator.set_param(t_step=t_step)
+    simulator.setup()
+    simulator.x0 = x0
+    rng = np.random.default_rng(16)
+    for _ in range(N_STEPS):
+        simulator.make_step(rng.uniform(-1, 1, size=(1, 1)))
+    return simulator.data
+
+
+def test_animate_cart_simulation(benchmark, cart_env, cart_model):
+    data = simulate(cart_model, cart_env.dt, np.zeros((2, 1)))
+    benchmark.pedantic(animate_cart_simulation, args=(data,), rounds=1)
+
+
+def test_animate_inverted_pendulum_simulation(
+    benchmark, inverted_pendulum_env, inverted_pendulum_linear_model
+):
+    data = simulate(
+        inverted_pendulum_linear_model, inverted_pendulum_env.dt, np.zeros((2, 1))
+    )
+    benchmark.pedantic(animate_inverted_pendulum_simulation, args=(data,), rounds=1)
+
+
+def test_animate_full_inverted_pendulum_simulation(
+    benchmark, inverted_pendulum_env, inverted_pendulum_nonlinear_model
+):
+    data = simulate(
+        inverted_pendulum_nonlinear_model, inverted_pendulum_env.dt, np.zeros((4, 1))
+    )
+    benchmark.pedantic(
+        animate_full_inverted_pendulum_simulation, args=(data,), rounds=1
+    )
@@ -0,0 +1,84 @@
+#!/usr/bin/env bash
+
+set -euo pipefail
+
+function usage() {
+  cat > /dev/stdout <<EOF
+Usage:
+  run_benchmarks.sh [FLAGS] [PYTEST_ARGS...]
+
+  Runs the benchmark suite in the benchmarks directory with pytest-benchmark and
+  compares the results to the baseline committed in the .benchmarks directory,
+  e.g. .benchmarks/Linux-CPython-3.11-64bit/0001_baseline.json. The script fails
+  if the median time of any benchmark got worse than in the baseline by more than
+  the threshold. Baselines are specific to the machine id of pytest-benchmark,
+  i.e. the platform and the Python version.
+
+  Additional arguments are passed to pytest, e.g. "-k mpc" to only run some benchmarks.
+
+  Optional flags:
+    -h, --help              Show this information and exit
+    --threshold PERCENT     Maximum allowed regression of the median, defaults to 20
+    --baseline ID           Number of the baseline to compare to, defaults to 0001
+    --save-baseline         Save the results as a new baseline instead of comparing them
+    --no-compare            Only run the benchmarks, without comparing them to the baseline
+EOF
+}
+
+THRESHOLD=20
+BASELINE=0001
+SAVE_BASELINE=false
+COMPARE=true
+PYTEST_ARGS=()
+
+while [[ $# -gt 0 ]]
+do
+  key="$1"
+  case $key in
+      --threshold)
+        THRESHOLD="$2"
+        shift 2
+      ;;
+      --baseline)
+        BASELINE="$2"
+        shift 2
+      ;;
+      --save-baseline)
+        SAVE_BASELINE=true
+        shift
+      ;;
+      --no-compare)
+        COMPARE=false
+        shift
+      ;;
+      -h|--help)
+        usage
+        exit 0
+      ;;
+      *)
+        PYTEST_ARGS+=("$1")
+        shift
+      ;;
+  esac
+done
+
+
+BUILD_DIR=$(dirname "$0")
+
+(
+  cd "${BUILD_DIR}/.." || (echo "Unknown error, could not find directory ${BUILD_DIR}" && exit 255)
+
+  BENCHMARK_ARGS=()
+  if [ "$SAVE_BASELINE" = true ] ; then
+    BENCHMARK_ARGS=(--benchmark-save=baseline)
+  elif [ "$COMPARE" = true ] ; then
+    BENCHMARK_ARGS=("--benchmark-compare=${BASELINE}" "--benchmark-compare-fail=median:${THRESHOLD}%")
+  fi
+
+  echo "Running benchmarks"
+  python -m pytest benchmarks \
+    --benchmark-columns=min,median,mean,stddev,rounds \
+    --benchmark-sort=name \
+    "${BENCHMARK_ARGS[@]}" \
+    "${PYTEST_ARGS[@]}"
+)
@@ -0,0 +1,36 @@
+import os
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Iterator
+
+__all__ = ["atomic_write"]
+
+
+@contextmanager
+def atomic_write(path: str | os.PathLike, mode: str = "wb") -> Iterator[IO]:
+    """Opens a temporary file next to `path` for writing and replaces `path`
+    by it once the block exits, so that concurrent processes never read
+    a partially written file.
+
+    If the block raises, `path` is left as it was and the temporary file
+    is removed.
+
+    Args:
+        path: Path of the file to write.
+        mode: Mode in which the temporary file is opened, "wb" or "w".
+
+    Yields:
+        Temporary file to write to.
+    """
+    path = Path(path)
+    file = tempfile.NamedTemporaryFile(
+        mode, dir=path.parent, suffix=path.suffix, delete=False
+    )
+    try:
+        with file:
+            yield file
+        os.replace(file.name, path)
+    except BaseException:
+        os.unlink(file.name)
+        raise
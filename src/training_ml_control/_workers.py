@@ -0,0 +1,27 @@
+import multiprocessing
+import os
+from multiprocessing.context import BaseContext
+
+__all__ = ["get_worker_context", "silence_stdout"]
+
+
+def get_worker_context() -> BaseContext:
+    """Multiprocessing context of the worker processes solving MPC problems.
+
+    Workers are forked on platforms that support it, so that the functions
+    creating their controllers can be any callable, e.g. a closure.
+    Otherwise they have to be picklable.
+    """
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return multiprocessing.get_context()
+
+
+def silence_stdout() -> None:
+    """Redirects the standard output of the current process to the null device.
+
+    Called in worker processes to silence IPOPT,
+    which prints to the file descriptor directly.
+    """
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
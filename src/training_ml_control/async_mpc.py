@@ -0,0 +1,189 @@
+import time
+from multiprocessing.connection import Connection
+from typing import Callable, Protocol
+
+import numpy as np
+from do_mpc.controller import MPC
+from numpy.typing import NDArray
+
+from training_ml_control._workers import get_worker_context, silence_stdout
+
+__all__ = ["CONTROL_PATHS", "DeadlineMPCController"]
+
+# Ways in which DeadlineMPCController computes an input, see its docstring
+CONTROL_PATHS = ("mpc", "shifted", "fallback")
+
+
+class _MPCLike(Protocol):
+    def make_step(self, x0: NDArray) -> NDArray:
+        ...
+
+
+def _serve(connection: Connection, controller_factory: Callable[[], MPC]) -> None:
+    silence_stdout()
+    mpc = controller_factory()
+    connection.send(mpc.settings.n_horizon)
+    while True:
+        request = connection.recv()
+        if request is None:
+            break
+        step, x0, u_previous = request
+        if not mpc.flags["set_initial_guess"]:
+            # Otherwise do-mpc warns and sleeps for 5 seconds
+            mpc.x0 = x0
+            mpc.set_initial_guess()
+        if u_previous is not None:
+            # The input penalty applies to the input that was actually applied
+            mpc.u0 = u_previous
+        mpc.make_step(x0)
+        inputs = np.hstack(mpc.opt_x_num_unscaled["_u", :, 0]).T
+        connection.send((step, inputs, bool(mpc.solver_stats["success"])))
+
+
+class DeadlineMPCController:
+    """MPC controller that computes its inputs within a deadline.
+
+    The optimization problem is solved by an MPC controller in a worker
+    process, created by calling `controller_factory` once, so that a slow solve
+    never blocks the control loop. A process is needed because CasADi holds
+    Python's global interpreter lock while solving.
+
+    At each step, the state is sent to the worker if it is idle and the input
+    is taken from the first of these paths that is available:
+
+    - "mpc": the solution for this step, if it arrives before the deadline
+      and the solver succeeded.
+    - "shifted": the input sequence of the latest successful solution, shifted
+      by the number of steps since the state it was computed for,
+      as long as it extends that far.
+    - "fallback": the input of the `fallback` controller, e.g. an LQR built with
+      :func:`training_ml_control.control.build_lqr_controller`.
+
+    When the deadline is missed, the solve goes on in the background
+    and its solution is used for the shifted inputs of the next steps.
+    The number of times each path was taken is counted in `counts`.
+
+    If the worker process dies, e.g. because it ran out of memory, a new one
+    is started and the shifted and fallback inputs are used until it is set up.
+    The number of restarts is counted in `n_restarts`.
+
+    The worker is forked on platforms that support it, so that
+    `controller_factory` can be any callable. Otherwise it has to be picklable.
+    Call :meth:`close`, or use the controller as a context manager,
+    to stop the worker.
+
+    :param controller_factory: function that creates the MPC controller.
+    :param deadline: maximum time in seconds spent in `make_step`
+        waiting for the solution.
+    :param fallback: controller with a `make_step` method used when no solution
+        is available.
+    """
+
+    def __init__(
+        self,
+        controller_factory: Callable[[], MPC],
+        deadline: float,
+        fallback: _MPCLike,
+    ) -> None:
+        self.deadline = deadline
+        self.fallback = fallback
+        self._controller_factory = controller_factory
+        self._context = get_worker_context()
+        self._start_worker()
+        # Wait until the controller is set up, which can take a while
+        try:
+            self.n_horizon = self._connection.recv()
+        except EOFError:
+            raise RuntimeError("The MPC worker process stopped") from None
+        self.counts = dict.fromkeys(CONTROL_PATHS, 0)
+        self.last_path: str | None = None
+        self.n_steps = 0
+        self.n_restarts = 0
+        self._busy = False
+        self._plan_step = -1
+        self._plan: NDArray | None = None
+        self._u_previous: NDArray | None = None
+
+    def _start_worker(self) -> None:
+        self._connection, worker_connection = self._context.Pipe()
+        self._worker = self._context.Process(
+            target=_serve,
+            args=(worker_connection, self._controller_factory),
+            daemon=True,
+        )
+        self._worker.start()
+        # Only the worker holds its end, so that its death ends the pipe
+        worker_connection.close()
+
+    def _restart_worker(self) -> None:
+        self._connection.close()
+        self._worker.kill()
+        self._worker.join()
+        self._start_worker()
+        self.n_restarts += 1
+        # Until the new worker sends its horizon once it is set up
+        self._busy = True
+
+    def _store(self, message: int | tuple[int, NDArray, bool]) -> None:
+        self._busy = False
+        if isinstance(message, int):
+            # The horizon sent by a restarted worker, which is now set up
+            return
+        step, inputs, success = message
+        if success and step > self._plan_step:
+            self._plan_step, self._plan = step, inputs
+
+    def _solve(self, step: int, x0: NDArray, start: float) -> None:
+        # Receives the solutions that arrived after the deadline of earlier steps,
+        # then sends the state to the worker if it is idle and waits for
+        # the solution until the deadline
+        sent = False
+        while self._plan_step < step:
+            if not self._busy:
+                if sent:
+                    # The solver failed
+                    break
+                self._connection.send((step, x0, self._u_previous))
+                self._busy = sent = True
+            remaining = self.deadline - (time.perf_counter() - start)
+            if not self._connection.poll(max(remaining, 0)):
+                break
+            self._store(self._connection.recv())
+
+    def make_step(self, x0: NDArray) -> NDArray:
+        start = time.perf_counter()
+        step = self.n_steps
+        self.n_steps += 1
+        try:
+            self._solve(step, x0, start)
+        except (EOFError, OSError):
+            # The worker died
+            self._restart_worker()
+
+        offset = step - self._plan_step
+        if self._plan is not None and offset < len(self._plan):
+            path = "mpc" if offset == 0 else "shifted"
+            u0 = self._plan[offset].reshape(-1, 1)
+        else:
+            path = "fallback"
+            u0 = np.reshape(self.fallback.make_step(x0), (-1, 1))
+        self.counts[path] += 1
+        self.last_path = path
+        self._u_previous = u0
+        return u0
+
+    def close(self) -> None:
+        """Stops the worker process."""
+        if self._worker.is_alive():
+            try:
+                self._connection.send(None)
+            except OSError:
+                self._worker.kill()
+            self._worker.join()
+        self._connection.close()
+
+    def __enter__(self) -> "DeadlineMPCController":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
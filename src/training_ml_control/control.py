@@ -1,4 +1,6 @@
-from typing import Protocol
+import os
+import tempfile
+from typing import Literal, Protocol, Sequence, runtime_checkable
 
 import numpy as np
 from do_mpc.controller import LQR, MPC
@@ -6,16 +8,22 @@ from do_mpc.model import LinearModel, Model
 from gymnasium import Env
 from numpy.typing import NDArray
 
+from training_ml_control.mpc_cache import compile_mpc_solver, setup_mpc
+from training_ml_control.robust_mpc import reduce_scenarios, set_uncertainty_scenarios
+
 __all__ = [
     "FeedbackController",
     "Observer",
+    "OpenLoopController",
     "ConstantController",
     "SineController",
     "SumOfSineController",
     "SchroederSweepController",
     "PRBSController",
     "RandomController",
+    "LQRController",
     "build_lqr_controller",
+    "build_batched_lqr_controller",
     "build_mpc_controller",
 ]
 
@@ -30,6 +38,24 @@ class Observer(Protocol):
         ...
 
 
+@runtime_checkable
+class OpenLoopController(Protocol):
+    """Controller whose inputs do not depend on the measurements.
+
+    The next `n_steps` inputs can therefore be generated at once,
+    which is equivalent to calling `act` `n_steps` times.
+    Inputs that were generated but not applied, e.g. because the episode
+    terminated early, are given back with `rewind`, so that they are
+    generated again by the next call.
+    """
+
+    def generate(self, n_steps: int) -> NDArray:
+        ...
+
+    def rewind(self, n_steps: int) -> None:
+        ...
+
+
 class ConstantController:
     def __init__(self, u: NDArray = np.zeros(1)) -> None:
         self.u = u
@@ -37,6 +63,12 @@ class ConstantController:
     def act(self, measurement: NDArray) -> NDArray:
         return self.u
 
+    def generate(self, n_steps: int) -> NDArray:
+        return np.tile(self.u, (n_steps,) + (1,) * np.ndim(self.u))
+
+    def rewind(self, n_steps: int) -> None:
+        pass
+
 
 class SineController:
     def __init__(
@@ -48,10 +80,16 @@ class SineController:
         self.i = 0
 
     def act(self, measurement: NDArray) -> NDArray:
-        t = self.dt * self.i
-        self.i += 1
-        u = self.u_max * np.sin(2 * np.pi * self.frequency * t)
-        return u
+        return self.generate(1)[0]
+
+    def generate(self, n_steps: int) -> NDArray:
+        t = self.dt * np.arange(self.i, self.i + n_steps)
+        self.i += n_steps
+        u = np.sin(2 * np.pi * self.frequency * t)
+        return self.u_max * u[:, np.newaxis]
+
+    def rewind(self, n_steps: int) -> None:
+        self.i -= n_steps
 
 
 class SumOfSineController:
@@ -67,13 +105,16 @@ class SumOfSineController:
         self.i = 0
 
     def act(self, measurement: NDArray) -> NDArray:
-        t = self.dt * self.i
-        self.i += 1
-        u = np.asarray([0.0])
-        for frequency in self.frequencies:
-            u += np.sin(2 * np.pi * frequency * t)
-        u *= self.u_max
-        return u
+        return self.generate(1)[0]
+
+    def generate(self, n_steps: int) -> NDArray:
+        t = self.dt * np.arange(self.i, self.i + n_steps)
+        self.i += n_steps
+        u = np.sin(2 * np.pi * np.outer(t, self.frequencies)).sum(axis=1)
+        return self.u_max * u[:, np.newaxis]
+
+    def rewind(self, n_steps: int) -> None:
+        self.i -= n_steps
 
 
 class SchroederSweepController:
@@ -94,25 +135,99 @@ class SchroederSweepController:
         self.phis = np.zeros(self.n_harmonics)
         for k in range(1, self.n_harmonics):
             self.phis[k] = self.phis[k - 1] - np.pi * k**2 / self.n_time_steps
+        self.harmonics = np.arange(1, self.n_harmonics + 1)
         self.i = 0
 
     def act(self, measurement: NDArray) -> NDArray:
-        t = self.dt * self.i
-        self.i += 1
-        u = np.asarray([0.0])
-        for k, phi in enumerate(self.phis):
-            u += np.cos(2 * np.pi * (k + 1) * self.frequency * t + phi)
-        u *= self.amplitude
-        return u
+        return self.generate(1)[0]
+
+    def generate(self, n_steps: int) -> NDArray:
+        t = self.dt * np.arange(self.i, self.i + n_steps)
+        self.i += n_steps
+        phases = 2 * np.pi * self.frequency * np.outer(t, self.harmonics) + self.phis
+        u = np.cos(phases).sum(axis=1)
+        return self.amplitude * u[:, np.newaxis]
+
+    def rewind(self, n_steps: int) -> None:
+        self.i -= n_steps
 
 
 class PRBSController:
-    def __init__(self, u_max: NDArray = np.asarray([10]), seed: int = 16) -> None:
+    """Pseudo-random binary sequence generated by a maximum-length
+    linear-feedback shift register (LFSR) of the given order.
+
+    The sequence switches between `u_max` and `-u_max`
+    and repeats itself every `2**order - 1` steps.
+
+    :param u_max: amplitude of the sequence.
+    :param seed: seed used to draw the initial state of the register.
+    :param order: number of bits in the register, between 2 and 16.
+    """
+
+    # Feedback taps of maximum-length LFSRs, i.e. exponents
+    # of the non-constant terms of primitive polynomials over GF(2)
+    TAPS = {
+        2: (2, 1),
+        3: (3, 2),
+        4: (4, 3),
+        5: (5, 3),
+        6: (6, 5),
+        7: (7, 6),
+        8: (8, 6, 5, 4),
+        9: (9, 5),
+        10: (10, 7),
+        11: (11, 9),
+        12: (12, 11, 10, 4),
+        13: (13, 12, 11, 8),
+        14: (14, 13, 12, 2),
+        15: (15, 14),
+        16: (16, 15, 13, 4),
+    }
+
+    def __init__(
+        self, u_max: NDArray = np.asarray([10]), seed: int = 16, order: int = 10
+    ) -> None:
+        if order not in self.TAPS:
+            raise ValueError(
+                f"Order should be between {min(self.TAPS)} and {max(self.TAPS)}"
+            )
         self.u_max = u_max
+        self.order = order
         self.rng = np.random.default_rng(seed)
+        initial_state = self.rng.integers(0, 2, size=order, dtype=np.uint8)
+        # The all-zero state is the only one that the register never leaves
+        if not initial_state.any():
+            initial_state[0] = 1
+        self.bits = self._generate_period(initial_state)
+        self.i = 0
+
+    def _generate_period(self, initial_state: NDArray) -> NDArray:
+        taps = self.TAPS[self.order]
+        period = 2**self.order - 1
+        bits = np.zeros(period + self.order, dtype=np.uint8)
+        bits[: self.order] = initial_state
+        # Each new bit only depends on bits that are at least min(taps) steps old,
+        # so blocks of that many bits can be computed at once.
+        block_size = min(taps)
+        for start in range(self.order, len(bits), block_size):
+            stop = min(start + block_size, len(bits))
+            block = np.zeros(stop - start, dtype=np.uint8)
+            for tap in taps:
+                block ^= bits[start - tap : stop - tap]
+            bits[start:stop] = block
+        return bits[:period]
 
     def act(self, measurement: NDArray) -> NDArray:
-        return self.rng.choice([self.u_max, -self.u_max])
+        return self.generate(1)[0]
+
+    def generate(self, n_steps: int) -> NDArray:
+        indices = np.arange(self.i, self.i + n_steps) % len(self.bits)
+        self.i = (self.i + n_steps) % len(self.bits)
+        signs = 2 * self.bits[indices].astype(np.int64) - 1
+        return signs[:, np.newaxis] * self.u_max
+
+    def rewind(self, n_steps: int) -> None:
+        self.i = (self.i - n_steps) % len(self.bits)
 
 
 class RandomController:
@@ -123,6 +238,64 @@ class RandomController:
         return self.action_space.sample()
 
 
+class LQRController:
+    """Linear state feedback `u = u_ref - K (x - x_ref)`, e.g. of an LQR,
+    evaluated with NumPy for one or many states at once.
+
+    :param K: gain matrix with shape (n_u, n_x).
+    :param setpoint: setpoint of the states.
+    :param u_setpoint: setpoint of the inputs, defaults to zero.
+    :param observation_indices: indices of the states in the measurements,
+        e.g. `[2, 3]` to control the angle of the inverted pendulum
+        from its full observations. Defaults to all of the measurements.
+    """
+
+    def __init__(
+        self,
+        K: NDArray,
+        setpoint: NDArray,
+        u_setpoint: NDArray | None = None,
+        observation_indices: Sequence[int] | None = None,
+    ) -> None:
+        self.K = np.asarray(K, dtype=float)
+        self.setpoint = np.ravel(setpoint).astype(float)
+        if u_setpoint is None:
+            u_setpoint = np.zeros(self.K.shape[0])
+        self.u_setpoint = np.ravel(u_setpoint).astype(float)
+        if observation_indices is None:
+            self.observation_indices = slice(None)
+        else:
+            self.observation_indices = np.asarray(observation_indices)
+
+    @classmethod
+    def from_lqr(
+        cls, lqr: LQR, observation_indices: Sequence[int] | None = None
+    ) -> "LQRController":
+        """Creates the controller from the gain and setpoints
+        of a do-mpc LQR that was set up."""
+        if lqr.mode != "standard":
+            raise ValueError("Only LQRs without input rate penalty are supported")
+        if not hasattr(lqr, "xss"):
+            lqr.set_setpoint()
+        # do-mpc computes u = K (x - xss) + uss
+        return cls(-lqr.K, lqr.xss, lqr.uss, observation_indices)
+
+    def act(self, measurement: NDArray) -> NDArray:
+        x = np.ravel(measurement)[self.observation_indices]
+        return self.u_setpoint - self.K @ (x - self.setpoint)
+
+    def act_batch(self, measurements: NDArray) -> NDArray:
+        """Computes the inputs for measurements with shape (N, n_observations),
+        e.g. the observations of a vectorized environment,
+        in a single matrix product.
+
+        Returns:
+            Inputs with shape (N, n_u).
+        """
+        x = measurements[:, self.observation_indices]
+        return self.u_setpoint - (x - self.setpoint) @ self.K.T
+
+
 def build_lqr_controller(
     model: LinearModel,
     t_step: float,
@@ -140,6 +313,23 @@ def build_lqr_controller(
     return lqr
 
 
+def build_batched_lqr_controller(
+    model: LinearModel,
+    t_step: float,
+    n_horizon: int | None,
+    setpoint: NDArray,
+    Q: NDArray,
+    R: NDArray,
+    observation_indices: Sequence[int] | None = None,
+) -> LQRController:
+    """Computes the gain of an LQR like :func:`build_lqr_controller` and returns
+    a controller that evaluates it for many states at once, without
+    the overhead of `LQR.make_step`. The gain is available as `controller.K`.
+    """
+    lqr = build_lqr_controller(model, t_step, n_horizon, setpoint, Q, R)
+    return LQRController.from_lqr(lqr, observation_indices)
+
+
 def build_mpc_controller(
     model: Model,
     t_step: float,
@@ -152,7 +342,52 @@ def build_mpc_controller(
     *,
     uncertainty_values: dict[str, NDArray] | None = None,
     n_robust: int = 1,
+    scenario_reduction: Literal["full", "extreme", "representative"] = "full",
+    max_branches: int | None = None,
+    cache_dir: str | os.PathLike | None = None,
+    compile: Literal["jit", "codegen"] | None = None,
+    linear_solver: str = "mumps",
+    qp_solver: str | None = None,
 ) -> MPC:
+    """Creates and sets up an MPC controller with orthogonal collocation.
+
+    With `uncertainty_values`, the controller is a robust multi-stage MPC
+    whose scenario tree branches, at each of the first `n_robust` steps, into
+    combinations of the uncertain parameter values, i.e. it has up to
+    `n_branches**n_robust` scenarios. By default all combinations are used,
+    but they can be reduced to the extreme or representative ones and capped
+    to `max_branches`, see :func:`training_ml_control.robust_mpc.reduce_scenarios`.
+
+    If `cache_dir` is given, the optimization problem is stored in that
+    directory and reused by later calls with the same model, horizon, costs,
+    limits and uncertainty, which makes their setup much faster.
+    See :func:`training_ml_control.mpc_cache.setup_mpc`.
+
+    With `compile`, the functions of the NLP evaluated by IPOPT (objective,
+    constraints, their Jacobians and the Hessian of the Lagrangian) are compiled
+    to machine code with the local C compiler instead of being evaluated
+    by CasADi's virtual machine:
+
+    - "jit": CasADi compiles them just in time, every time the solver is created.
+    - "codegen": CasADi generates C code that is compiled into a shared library,
+      stored in `cache_dir` if it is given and loaded again by later calls
+      without compiling. See
+      :func:`training_ml_control.mpc_cache.compile_mpc_solver`.
+
+    Compiling takes from seconds to minutes, depending on the size of the
+    problem, and only pays off when the controller is used for many steps.
+
+    `linear_solver` is the linear solver used by IPOPT, e.g. "mumps" or,
+    if the HSL libraries are installed, "ma27" or "ma57".
+
+    If the model is linear and the costs are quadratic, the optimization problem
+    is a sparse quadratic program. If `qp_solver` is given, e.g. "osqp", it is
+    then solved with that QP solver instead of IPOPT, which is an order of
+    magnitude faster, unless the NLP is compiled with `compile`. See
+    :func:`training_ml_control.mpc_cache.setup_mpc`.
+    """
+    if compile not in (None, "jit", "codegen"):
+        raise ValueError(f"Unknown compile option {compile}")
     mpc = MPC(model)
     mpc_params = {
         "n_horizon": n_horizon,
@@ -163,9 +398,16 @@ def build_mpc_controller(
         "collocation_deg": 3,
         "collocation_ni": 1,
         "store_full_solution": True,
-        # Use MA27 linear solver in ipopt for faster calculations:
-        "nlpsol_opts": {"ipopt.linear_solver": "mumps"},
+        "nlpsol_opts": {"ipopt.linear_solver": linear_solver},
     }
+    if compile == "jit":
+        mpc_params["nlpsol_opts"].update(
+            {
+                "jit": True,
+                "compiler": "shell",
+                "jit_options": {"flags": ["-O1"], "verbose": False},
+            }
+        )
     mpc.set_param(**mpc_params)
     mpc.set_objective(mterm=terminal_cost, lterm=stage_cost)
     if u_penalty is not None:
@@ -182,6 +424,17 @@ def build_mpc_controller(
             mpc.bounds["upper", "_u", key] = value[1]
     # Parameter uncertainty
     if uncertainty_values is not None:
-        mpc.set_uncertainty_values(**uncertainty_values)
-    mpc.setup()
+        scenarios = reduce_scenarios(
+            uncertainty_values, scenario_reduction, max_branches
+        )
+        set_uncertainty_scenarios(mpc, scenarios)
+    setup_mpc(mpc, cache_dir, qp_solver=qp_solver if compile is None else None)
+    if compile == "codegen":
+        if cache_dir is not None:
+            compile_mpc_solver(mpc, cache_dir)
+        else:
+            # The library is loaded when the solver is created
+            # and can be deleted afterwards
+            with tempfile.TemporaryDirectory() as build_dir:
+                compile_mpc_solver(mpc, build_dir)
     return mpc
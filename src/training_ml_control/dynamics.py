@@ -0,0 +1,383 @@
+import functools
+import os
+import subprocess
+import tempfile
+from pathlib import Path
+from typing import Callable
+
+import casadi
+import numpy as np
+from numpy.typing import NDArray
+
+__all__ = [
+    "build_inverted_pendulum_rhs",
+    "build_batched_inverted_pendulum_rhs",
+    "compile_function",
+    "numpy_function",
+    "INTEGRATION_METHODS",
+    "integrate",
+]
+
+
+@functools.cache
+def build_inverted_pendulum_rhs(gravity: float = 9.81) -> casadi.Function:
+    """Builds the right-hand side of the cart-pole dynamics as a CasADi function.
+
+    It is shared by :class:`InvertedPendulumEnv` and
+    :func:`build_inverted_pendulum_nonlinear_model`, so that the simulated system
+    and the model used for control follow exactly the same equations.
+
+    The function takes as inputs the state (position, velocity, angle and
+    angular velocity), the force applied to the cart and the parameters
+    (pole mass, cart mass and pole length) and returns the time derivative
+    of the state.
+
+    Args:
+        gravity: Gravitational acceleration.
+
+    Returns:
+        CasADi function `(state, force, parameters) -> state_dot`.
+    """
+    state = casadi.SX.sym("state", 4)
+    force = casadi.SX.sym("force")
+    parameters = casadi.SX.sym("parameters", 3)
+
+    x_dot, theta, theta_dot = state[1], state[2], state[3]
+    masspole, masscart, length = parameters[0], parameters[1], parameters[2]
+    total_mass = masspole + masscart
+    half_length = length / 2
+    polemass_length = masspole * half_length
+    costheta = casadi.cos(theta)
+    sintheta = casadi.sin(theta)
+
+    # For the interested reader:
+    # https://coneural.org/florian/papers/05_cart_pole.pdf
+    temp = (force + polemass_length * theta_dot**2 * sintheta) / total_mass
+    thetaacc = (gravity * sintheta - costheta * temp) / (
+        half_length * (4.0 / 3.0 - masspole * costheta**2 / total_mass)
+    )
+    xacc = temp - polemass_length * thetaacc * costheta / total_mass
+
+    return casadi.Function(
+        "inverted_pendulum_rhs",
+        [state, force, parameters],
+        [casadi.vertcat(x_dot, xacc, theta_dot, thetaacc)],
+        ["state", "force", "parameters"],
+        ["state_dot"],
+    )
+
+
+@functools.cache
+def build_batched_inverted_pendulum_rhs(
+    n_instances: int,
+    gravity: float = 9.81,
+    *,
+    compiled: bool = False,
+) -> casadi.Function:
+    """Maps the right-hand side returned by :func:`build_inverted_pendulum_rhs`
+    over `n_instances` instances.
+
+    The inputs of the mapped function are the horizontally stacked inputs
+    of the instances, i.e. `(4, N)` states, `(1, N)` forces
+    and `(3, N)` parameters.
+
+    Args:
+        n_instances: Number of instances.
+        gravity: Gravitational acceleration.
+        compiled: If True, the mapped function is compiled to C code
+            with :func:`compile_function`.
+
+    Returns:
+        Mapped CasADi function.
+    """
+    rhs = build_inverted_pendulum_rhs(gravity).map(n_instances)
+    if compiled:
+        rhs = compile_function(rhs)
+    return rhs
+
+
+def compile_function(
+    function: casadi.Function,
+    directory: str | os.PathLike | None = None,
+    *,
+    compiler: str = "cc",
+    flags: tuple[str, ...] = ("-O3", "-fPIC", "-shared"),
+) -> casadi.Function:
+    """Generates C code for a CasADi function, compiles it into a shared library
+    with the local C compiler and loads it back as an external function.
+
+    Args:
+        function: Function to compile.
+        directory: Directory in which the code and library are written.
+            Defaults to a new temporary directory.
+        compiler: C compiler executable.
+        flags: Flags passed to the compiler.
+
+    Returns:
+        Compiled function with the same inputs and outputs.
+    """
+    if directory is None:
+        directory = tempfile.mkdtemp(prefix="training_ml_control_")
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    name = function.name()
+    code_generator = casadi.CodeGenerator(f"{name}.c")
+    code_generator.add(function)
+    code_generator.generate(f"{directory}{os.sep}")
+    library = directory / f"{name}.so"
+    subprocess.run(
+        [compiler, *flags, "-o", str(library), str(directory / f"{name}.c")],
+        check=True,
+    )
+    return casadi.external(name, str(library))
+
+
+# NumPy expressions equivalent to the operations of CasADi's SX virtual machine
+_NUMPY_OPERATIONS = {
+    casadi.OP_ASSIGN: "{0}",
+    casadi.OP_ADD: "{0} + {1}",
+    casadi.OP_SUB: "{0} - {1}",
+    casadi.OP_MUL: "{0} * {1}",
+    casadi.OP_DIV: "{0} / {1}",
+    casadi.OP_NEG: "-{0}",
+    casadi.OP_TWICE: "2.0 * {0}",
+    casadi.OP_INV: "1.0 / {0}",
+    casadi.OP_SQ: "{0} * {0}",
+    casadi.OP_POW: "{0} ** {1}",
+    casadi.OP_CONSTPOW: "{0} ** {1}",
+    casadi.OP_SQRT: "np.sqrt({0})",
+    casadi.OP_EXP: "np.exp({0})",
+    casadi.OP_LOG: "np.log({0})",
+    casadi.OP_SIN: "np.sin({0})",
+    casadi.OP_COS: "np.cos({0})",
+    casadi.OP_TAN: "np.tan({0})",
+    casadi.OP_ASIN: "np.arcsin({0})",
+    casadi.OP_ACOS: "np.arccos({0})",
+    casadi.OP_ATAN: "np.arctan({0})",
+    casadi.OP_ATAN2: "np.arctan2({0}, {1})",
+    casadi.OP_SINH: "np.sinh({0})",
+    casadi.OP_COSH: "np.cosh({0})",
+    casadi.OP_TANH: "np.tanh({0})",
+    casadi.OP_FABS: "np.abs({0})",
+    casadi.OP_SIGN: "np.sign({0})",
+    casadi.OP_FLOOR: "np.floor({0})",
+    casadi.OP_CEIL: "np.ceil({0})",
+    casadi.OP_FMIN: "np.minimum({0}, {1})",
+    casadi.OP_FMAX: "np.maximum({0}, {1})",
+    casadi.OP_LT: "1.0 * ({0} < {1})",
+    casadi.OP_LE: "1.0 * ({0} <= {1})",
+    casadi.OP_EQ: "1.0 * ({0} == {1})",
+    casadi.OP_NE: "1.0 * ({0} != {1})",
+    casadi.OP_NOT: "1.0 * np.logical_not({0})",
+    casadi.OP_AND: "1.0 * np.logical_and({0}, {1})",
+    casadi.OP_OR: "1.0 * np.logical_or({0}, {1})",
+    casadi.OP_IF_ELSE_ZERO: "np.where({0}, {1}, 0.0)",
+}
+
+
+def numpy_function(function: casadi.Function) -> Callable[..., tuple[NDArray, ...]]:
+    """Translates an SX CasADi function into a Python function
+    that evaluates the same operations with NumPy.
+
+    Calling a CasADi function from Python requires converting every input
+    to a CasADi matrix, which dominates the cost of evaluating small functions
+    such as the right-hand side of the dynamics, both for a single state
+    and for large batches of states. The translated function instead operates
+    directly on NumPy arrays and broadcasts over any trailing batch axes.
+
+    Inputs and outputs must be dense vectors. Each input is given as an array
+    of shape `(n,)` or `(n, ...)` and each output is returned with shape
+    `(m,)` or `(m, ...)` accordingly.
+
+    Args:
+        function: SX function to translate.
+
+    Returns:
+        Python function with the same inputs and outputs.
+    """
+    if not function.is_a("SXFunction"):
+        raise TypeError("Only SX functions can be translated to NumPy")
+    for sparsity in [function.sparsity_in(i) for i in range(function.n_in())] + [
+        function.sparsity_out(i) for i in range(function.n_out())
+    ]:
+        if not sparsity.is_dense() or not sparsity.is_column():
+            raise NotImplementedError("Only dense vector inputs and outputs")
+
+    inputs = [f"input_{i}" for i in range(function.n_in())]
+    outputs = [
+        ["0.0"] * function.sparsity_out(i).nnz() for i in range(function.n_out())
+    ]
+    lines = [f"def {function.name()}({', '.join(inputs)}):"]
+    for k in range(function.n_instructions()):
+        operation = function.instruction_id(k)
+        arguments = [f"w{i}" for i in function.instruction_input(k)]
+        result = function.instruction_output(k)
+        if operation == casadi.OP_INPUT:
+            input_index, nonzero = function.instruction_input(k)
+            lines.append(f"    w{result[0]} = {inputs[input_index]}[{nonzero}]")
+        elif operation == casadi.OP_OUTPUT:
+            output_index, nonzero = result
+            lines.append(f"    output_{output_index}_{nonzero} = {arguments[0]}")
+            outputs[output_index][nonzero] = f"output_{output_index}_{nonzero}"
+        elif operation == casadi.OP_CONST:
+            lines.append(f"    w{result[0]} = {function.instruction_constant(k)!r}")
+        elif operation in _NUMPY_OPERATIONS:
+            expression = _NUMPY_OPERATIONS[operation].format(*arguments)
+            lines.append(f"    w{result[0]} = {expression}")
+        else:
+            raise NotImplementedError(
+                f"Unsupported operation in instruction {k} of {function.name()}"
+            )
+    returned = [f"[{', '.join(output)}]" for output in outputs]
+    lines.append(f"    return {', '.join(returned)},")
+
+    namespace = {"np": np}
+    exec("\n".join(lines), namespace)
+    evaluate = namespace[function.name()]
+
+    def wrapper(*args: NDArray) -> tuple[NDArray, ...]:
+        args = [np.atleast_1d(np.asarray(arg, dtype=np.float64)) for arg in args]
+        if all(arg.ndim == 1 for arg in args):
+            # Operating on Python floats is much faster than on NumPy scalars
+            return tuple(
+                np.array(rows) for rows in evaluate(*(arg.tolist() for arg in args))
+            )
+        return tuple(np.stack(np.broadcast_arrays(*rows)) for rows in evaluate(*args))
+
+    return wrapper
+
+
+INTEGRATION_METHODS = ("euler", "semi-implicit euler", "rk4", "rk45")
+
+# Butcher tableau of the Dormand-Prince method
+_DOPRI_C = (0.0, 1 / 5, 3 / 10, 4 / 5, 8 / 9, 1.0, 1.0)
+_DOPRI_A = (
+    (),
+    (1 / 5,),
+    (3 / 40, 9 / 40),
+    (44 / 45, -56 / 15, 32 / 9),
+    (19372 / 6561, -25360 / 2187, 64448 / 6561, -212 / 729),
+    (9017 / 3168, -355 / 33, 46732 / 5247, 49 / 176, -5103 / 18656),
+    (35 / 384, 0.0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84),
+)
+# Difference between the 5th and 4th order solutions
+_DOPRI_E = (
+    71 / 57600,
+    0.0,
+    -71 / 16695,
+    71 / 1920,
+    -17253 / 339200,
+    22 / 525,
+    -1 / 40,
+)
+
+
+def integrate(
+    rhs: Callable[[NDArray, NDArray], NDArray],
+    state: NDArray,
+    control: NDArray,
+    dt: float,
+    *,
+    method: str = "euler",
+    n_substeps: int = 1,
+    rtol: float = 1e-6,
+    atol: float = 1e-9,
+    max_substeps: int = 10_000,
+) -> NDArray:
+    """Advances a state by `dt` with the control held constant over the step.
+
+    States have shape `(n,)` or `(n, ...)`, with any trailing batch axes,
+    and `rhs(state, control)` must return the time derivative of the state
+    with the same shape.
+
+    The available methods are:
+
+    - `"euler"`: explicit Euler.
+    - `"semi-implicit euler"`: symplectic Euler for mechanical systems whose
+      state alternates positions and velocities, e.g. `(x, x_dot, theta, theta_dot)`.
+      Velocities are updated first and the positions use the updated velocities.
+    - `"rk4"`: classical 4th order Runge-Kutta.
+    - `"rk45"`: adaptive Dormand-Prince method. `dt` is split into internal
+      sub-steps whose size is chosen to meet `rtol` and `atol`, starting from
+      `dt / n_substeps`. All instances of a batch share the same sub-steps.
+
+    Args:
+        rhs: Right-hand side of the dynamics.
+        state: Initial state.
+        control: Control input, held constant over the step.
+        dt: Length of the step.
+        method: Integration method, one of :data:`INTEGRATION_METHODS`.
+        n_substeps: Number of equal sub-steps for the fixed step methods,
+            and number of initial sub-steps for `"rk45"`.
+        rtol: Relative tolerance of `"rk45"`.
+        atol: Absolute tolerance of `"rk45"`.
+        max_substeps: Maximum number of sub-steps of `"rk45"`.
+
+    Returns:
+        State after `dt`.
+    """
+    if method not in INTEGRATION_METHODS:
+        raise ValueError(
+            f"Unknown integration method '{method}', "
+            f"should be one of {INTEGRATION_METHODS}"
+        )
+    if n_substeps < 1:
+        raise ValueError(f"Number of sub-steps should be positive, got {n_substeps}")
+    state = np.asarray(state, dtype=np.float64)
+    if method == "rk45":
+        return _integrate_rk45(
+            rhs, state, control, dt, dt / n_substeps, rtol, atol, max_substeps
+        )
+
+    h = dt / n_substeps
+    for _ in range(n_substeps):
+        if method == "euler":
+            state = state + h * rhs(state, control)
+        elif method == "semi-implicit euler":
+            state_dot = rhs(state, control)
+            state = state.copy()
+            state[1::2] = state[1::2] + h * state_dot[1::2]
+            state[0::2] = state[0::2] + h * state[1::2]
+        else:
+            k1 = rhs(state, control)
+            k2 = rhs(state + h / 2 * k1, control)
+            k3 = rhs(state + h / 2 * k2, control)
+            k4 = rhs(state + h * k3, control)
+            state = state + h / 6 * (k1 + 2 * k2 + 2 * k3 + k4)
+    return state
+
+
+def _integrate_rk45(
+    rhs: Callable[[NDArray, NDArray], NDArray],
+    state: NDArray,
+    control: NDArray,
+    dt: float,
+    h: float,
+    rtol: float,
+    atol: float,
+    max_substeps: int,
+) -> NDArray:
+    t = 0.0
+    k = [rhs(state, control)] + [None] * 6
+    for _ in range(max_substeps):
+        h = min(h, dt - t)
+        for i in range(1, 7):
+            increment = sum(a * k[j] for j, a in enumerate(_DOPRI_A[i]) if a != 0.0)
+            k[i] = rhs(state + h * increment, control)
+        # The last stage is evaluated at the 5th order solution
+        new_state = state + h * increment
+        error = h * sum(e * k[i] for i, e in enumerate(_DOPRI_E) if e != 0.0)
+        scale = atol + rtol * np.maximum(np.abs(state), np.abs(new_state))
+        # Worst instance of the batch
+        error_norm = np.max(np.sqrt(np.mean((error / scale) ** 2, axis=0)))
+        if error_norm <= 1.0:
+            t += h
+            state = new_state
+            # First same as last
+            k[0] = k[6]
+            if t >= dt * (1 - 1e-12):
+                return state
+        factor = 5.0 if error_norm == 0.0 else 0.9 * error_norm**-0.2
+        h = h * min(5.0, max(0.2, factor))
+    raise RuntimeError(f"Integration did not finish within {max_substeps} sub-steps")
@@ -1,2 +1,3 @@
 from .grid_world import *
+from .rendering import *
 from .utils import *
@@ -11,13 +11,17 @@ import math
 import gymnasium as gym
 import numpy as np
 from gymnasium import spaces
+from gymnasium.envs.classic_control import utils
 from gymnasium.envs.classic_control.continuous_mountain_car import (
     Continuous_MountainCarEnv,
 )
 from gymnasium.error import DependencyNotInstalled
 from numpy.typing import NDArray
 
-__all__ = ["CartEnv"]
+from training_ml_control.dynamics import INTEGRATION_METHODS, integrate
+from training_ml_control.environments.vector import ArrayVectorEnv
+
+__all__ = ["CartEnv", "VectorCartEnv"]
 
 logger = logging.getLogger(__name__)
 
@@ -38,6 +42,14 @@ class CartEnv(Continuous_MountainCarEnv):
 
     This class is a modified version of the `Continuous_MountainCarEnv`
     environment from gymnasium that modifies that environment to be flat.
+
+    :param dt: length of a step, over which the force is held constant.
+        Defaults to `1 / render_fps`.
+    :param kinematics_integrator: integration method, one of
+        `"semi-implicit euler"`, `"euler"`, `"rk4"` and `"rk45"`.
+        The velocity saturation and the walls are applied after each sub-step
+        for semi-implicit Euler and at the end of the step otherwise.
+    :param n_substeps: number of integration sub-steps per step.
     """
 
     def __init__(
@@ -49,6 +61,9 @@ class CartEnv(Continuous_MountainCarEnv):
         max_speed: float = 10,
         max_force: float = 10,
         goal_position: float = 9.0,
+        dt: float | None = None,
+        kinematics_integrator: str = "semi-implicit euler",
+        n_substeps: int = 1,
     ):
         self.min_position = -max_position
         self.max_position = max_position
@@ -62,7 +77,16 @@ class CartEnv(Continuous_MountainCarEnv):
             )
         self.goal_position = goal_position
         self.goal_velocity = goal_velocity
-        self.dt = 1 / self.metadata["render_fps"]
+        if dt is None:
+            dt = 1 / self.metadata["render_fps"]
+        self.dt = dt
+        if kinematics_integrator not in INTEGRATION_METHODS:
+            raise ValueError(
+                f"Unknown integrator '{kinematics_integrator}', "
+                f"should be one of {INTEGRATION_METHODS}"
+            )
+        self.kinematics_integrator = kinematics_integrator
+        self.n_substeps = n_substeps
 
         self.low_state = np.array([self.min_position, self.min_speed], dtype=np.float32)
         self.high_state = np.array(
@@ -93,18 +117,33 @@ class CartEnv(Continuous_MountainCarEnv):
         velocity = self.state[1]
         force = min(max(action[0], self.min_action), self.max_action)
 
-        velocity += force * self.dt
-        if velocity > self.max_speed:
-            velocity = self.max_speed
-        if velocity < self.min_speed:
-            velocity = self.min_speed
-        position += velocity * self.dt
-        if position > self.max_position:
-            position = self.max_position
-            velocity = 0
-        if position < self.min_position:
-            position = self.min_position
-            velocity = 0
+        if self.kinematics_integrator == "semi-implicit euler":
+            h = self.dt / self.n_substeps
+            for _ in range(self.n_substeps):
+                velocity += force * h
+                velocity = min(max(velocity, self.min_speed), self.max_speed)
+                position += velocity * h
+                if position > self.max_position:
+                    position = self.max_position
+                    velocity = 0
+                if position < self.min_position:
+                    position = self.min_position
+                    velocity = 0
+        else:
+            position, velocity = integrate(
+                lambda state, force: _cart_state_derivative(
+                    state, force, self.min_speed, self.max_speed
+                ),
+                self.state,
+                force,
+                self.dt,
+                method=self.kinematics_integrator,
+                n_substeps=self.n_substeps,
+            )
+            velocity = min(max(velocity, self.min_speed), self.max_speed)
+            if not self.min_position <= position <= self.max_position:
+                position = min(max(position, self.min_position), self.max_position)
+                velocity = 0
 
         # Convert a possible numpy bool to a Python bool.
         terminated = bool(
@@ -226,3 +265,128 @@ class CartEnv(Continuous_MountainCarEnv):
             return np.transpose(
                 np.array(pygame.surfarray.pixels3d(self.screen)), axes=(1, 0, 2)
             )
+
+
+def _cart_state_derivative(
+    state: NDArray, force: NDArray, min_speed: float, max_speed: float
+) -> NDArray:
+    """Double integrator whose acceleration vanishes at the speed limits."""
+    velocity = state[1]
+    saturated = ((velocity >= max_speed) & (force > 0)) | (
+        (velocity <= min_speed) & (force < 0)
+    )
+    acceleration = np.where(saturated, 0.0, force)
+    return np.stack(np.broadcast_arrays(velocity, acceleration))
+
+
+class VectorCartEnv(ArrayVectorEnv):
+    """Vectorized version of :class:`CartEnv` that advances many carts at once.
+
+    The state of all carts is stored in a single `(num_envs, 2)` array
+    and force clipping, velocity saturation, wall clamping, termination
+    and reward are computed for the whole batch with NumPy operations.
+    Each cart follows exactly the same dynamics as a single `CartEnv`.
+
+    :param num_envs: number of carts.
+    :param max_steps: maximum number of steps before truncation, if any.
+    :param dt: length of a step, see :class:`CartEnv`.
+    :param kinematics_integrator: integration method, see :class:`CartEnv`.
+    :param n_substeps: number of integration sub-steps per step.
+    """
+
+    metadata = {"render_modes": [], "render_fps": CartEnv.metadata["render_fps"]}
+
+    def __init__(
+        self,
+        num_envs: int,
+        *,
+        max_steps: int | None = None,
+        goal_velocity: float = 5,
+        max_position: float = 200,
+        max_speed: float = 10,
+        max_force: float = 10,
+        goal_position: float = 9.0,
+        dt: float | None = None,
+        kinematics_integrator: str = "semi-implicit euler",
+        n_substeps: int = 1,
+    ) -> None:
+        env = CartEnv(
+            goal_velocity=goal_velocity,
+            max_position=max_position,
+            max_speed=max_speed,
+            max_force=max_force,
+            goal_position=goal_position,
+            dt=dt,
+            kinematics_integrator=kinematics_integrator,
+            n_substeps=n_substeps,
+        )
+        super().__init__(
+            num_envs, env.observation_space, env.action_space, max_steps=max_steps
+        )
+        self.min_position = env.min_position
+        self.max_position = env.max_position
+        self.min_speed = env.min_speed
+        self.max_speed = env.max_speed
+        self.min_action = env.min_action
+        self.max_action = env.max_action
+        self.goal_position = env.goal_position
+        self.goal_velocity = env.goal_velocity
+        self.dt = env.dt
+        self.kinematics_integrator = env.kinematics_integrator
+        self.n_substeps = env.n_substeps
+
+        # The state is kept in double precision, like CartEnv does internally,
+        # but it is rounded to single precision after each step.
+        self.state = np.zeros((num_envs, 2), dtype=np.float64)
+
+    def _reset_envs(self, mask: NDArray, options: dict | None = None) -> None:
+        low, high = utils.maybe_parse_reset_bounds(options, -0.6, -0.4)
+        self.state[mask, 0] = self.np_random.uniform(
+            low=low, high=high, size=np.count_nonzero(mask)
+        )
+        self.state[mask, 1] = 0.0
+
+    def _get_observations(self) -> NDArray:
+        return self.state.astype(np.float32)
+
+    def _step_envs(self, actions: NDArray) -> tuple[NDArray, NDArray]:
+        position = self.state[:, 0]
+        velocity = self.state[:, 1]
+        force = np.clip(actions[:, 0], self.min_action, self.max_action)
+
+        if self.kinematics_integrator == "semi-implicit euler":
+            h = self.dt / self.n_substeps
+            for _ in range(self.n_substeps):
+                velocity = np.clip(velocity + force * h, self.min_speed, self.max_speed)
+                position = position + velocity * h
+                hit_wall = (position > self.max_position) | (
+                    position < self.min_position
+                )
+                position = np.clip(position, self.min_position, self.max_position)
+                velocity = np.where(hit_wall, 0.0, velocity)
+        else:
+            position, velocity = integrate(
+                lambda state, force: _cart_state_derivative(
+                    state, force, self.min_speed, self.max_speed
+                ),
+                self.state.T,
+                force,
+                self.dt,
+                method=self.kinematics_integrator,
+                n_substeps=self.n_substeps,
+            )
+            velocity = np.clip(velocity, self.min_speed, self.max_speed)
+            hit_wall = (position > self.max_position) | (position < self.min_position)
+            position = np.clip(position, self.min_position, self.max_position)
+            velocity = np.where(hit_wall, 0.0, velocity)
+
+        terminated = (np.abs(position) >= abs(self.goal_position)) & (
+            np.abs(velocity) >= self.goal_velocity
+        )
+
+        reward = np.where(terminated, 100.0, 0.0)
+        reward -= np.square(actions[:, 0]) * 0.1
+
+        self.state[:, 0] = position.astype(np.float32)
+        self.state[:, 1] = velocity.astype(np.float32)
+        return reward, terminated
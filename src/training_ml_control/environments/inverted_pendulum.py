@@ -13,9 +13,22 @@ import numpy as np
 from gymnasium import spaces
 from gymnasium.envs.classic_control import utils
 from gymnasium.envs.classic_control.cartpole import CartPoleEnv
-from numpy.typing import NDArray
+from numpy.typing import ArrayLike, NDArray
 
-__all__ = ["InvertedPendulumEnv"]
+from training_ml_control.dynamics import (
+    INTEGRATION_METHODS,
+    build_batched_inverted_pendulum_rhs,
+    build_inverted_pendulum_rhs,
+    integrate,
+    numpy_function,
+)
+from training_ml_control.environments.vector import ArrayVectorEnv
+
+__all__ = [
+    "InvertedPendulumEnv",
+    "BatchedInvertedPendulum",
+    "VectorInvertedPendulumEnv",
+]
 
 
 logger = logging.getLogger(__name__)
@@ -92,6 +105,11 @@ class InvertedPendulumEnv(CartPoleEnv):
     :param x_threshold: threshold for cart position.
     :param theta_threshold: threshold for pole angle.
     :param force_max: maximum absolute value for force applied to Cart.
+    :param dt: length of a step, over which the force is held constant.
+    :param kinematics_integrator: integration method, one of
+        `"euler"`, `"semi-implicit euler"`, `"rk4"` and `"rk45"`.
+    :param n_substeps: number of integration sub-steps per step.
+        For `"rk45"` it only sets the initial sub-step size.
 
     """
 
@@ -110,6 +128,9 @@ class InvertedPendulumEnv(CartPoleEnv):
         x_threshold: float = 3,
         theta_threshold: float = 24,
         force_max: float = 30.0,
+        dt: float = 0.02,
+        kinematics_integrator: str = "euler",
+        n_substeps: int = 1,
     ) -> None:
         super().__init__()
         self.gravity = 9.81
@@ -127,8 +148,16 @@ class InvertedPendulumEnv(CartPoleEnv):
         self.length = length
         self.half_length = self.length / 2
         self.polemass_length = self.masspole * self.half_length
-        self.dt = 0.02
-        self.kinematics_integrator = "euler"
+        if kinematics_integrator not in INTEGRATION_METHODS:
+            raise ValueError(
+                f"Unknown integrator '{kinematics_integrator}', "
+                f"should be one of {INTEGRATION_METHODS}"
+            )
+        self.dt = dt
+        self.kinematics_integrator = kinematics_integrator
+        self.n_substeps = n_substeps
+        # Right-hand side of the dynamics, shared with the do-mpc model
+        self.rhs = numpy_function(build_inverted_pendulum_rhs(self.gravity))
 
         # Initial angle
         self.theta_initial_radians = math.radians(theta_initial)
@@ -173,34 +202,16 @@ class InvertedPendulumEnv(CartPoleEnv):
     def step(self, action: float) -> tuple[NDArray, float, bool, bool, dict]:
         if self.state is None:
             raise RuntimeError("Call reset before using step method.")
-        x, x_dot, theta, theta_dot = self.state
         force = np.clip(action, -self.force_max, self.force_max).item()
-        costheta = math.cos(theta)
-        sintheta = math.sin(theta)
-
-        # For the interested reader:
-        # https://coneural.org/florian/papers/05_cart_pole.pdf
-        temp = (
-            force + self.polemass_length * theta_dot**2 * sintheta
-        ) / self.total_mass
-        thetaacc = (self.gravity * sintheta - costheta * temp) / (
-            self.half_length
-            * (4.0 / 3.0 - self.masspole * costheta**2 / self.total_mass)
+        self.state = integrate(
+            self._state_derivative,
+            self.state,
+            force,
+            self.dt,
+            method=self.kinematics_integrator,
+            n_substeps=self.n_substeps,
         )
-        xacc = temp - self.polemass_length * thetaacc * costheta / self.total_mass
-
-        if self.kinematics_integrator == "euler":
-            x = x + self.dt * x_dot
-            x_dot = x_dot + self.dt * xacc
-            theta = theta + self.dt * theta_dot
-            theta_dot = theta_dot + self.dt * thetaacc
-        else:  # semi-implicit euler
-            x_dot = x_dot + self.dt * xacc
-            x = x + self.dt * x_dot
-            theta_dot = theta_dot + self.dt * thetaacc
-            theta = theta + self.dt * theta_dot
-
-        self.state = (x, x_dot, theta, theta_dot)
+        x, theta = self.state[0], self.state[2]
 
         terminated = bool(
             x < -self.x_threshold
@@ -230,6 +241,11 @@ class InvertedPendulumEnv(CartPoleEnv):
             self.render()
         return np.asarray(self.state, dtype=np.float32), reward, terminated, False, {}
 
+    def _state_derivative(self, state: NDArray, force: float) -> NDArray:
+        parameters = (self.masspole, self.masscart, self.length)
+        (state_dot,) = self.rhs(state, force, parameters)
+        return state_dot
+
     def reset(
         self,
         *,
@@ -250,3 +266,232 @@ class InvertedPendulumEnv(CartPoleEnv):
         if self.render_mode == "human":
             self.render()
         return np.array(self.state, dtype=np.float32), {}
+
+
+class BatchedInvertedPendulum:
+    """Array-backed cart-pole dynamics of many inverted pendulums.
+
+    The states of all instances are stored in a `(N, 4)` array with columns
+    position, velocity, angle and angular velocity. Their physical parameters
+    are stored in a `(N, 3)` array with columns pole mass, cart mass and
+    pole length, which allows e.g. Monte Carlo sweeps over these parameters.
+    All instances are advanced, and checked for termination, in a single call
+    to the right-hand side that :class:`InvertedPendulumEnv` also uses,
+    either translated to NumPy or mapped and compiled to C code with CasADi.
+
+    :param parameters: array of shape `(N, 3)` with pole mass, cart mass
+        and pole length of each instance.
+    :param x_threshold: threshold for cart position.
+    :param theta_threshold: threshold for pole angle in degrees.
+    :param force_max: maximum absolute value for force applied to Cart.
+    :param kinematics_integrator: integration method, see :class:`InvertedPendulumEnv`.
+    :param n_substeps: number of integration sub-steps per step.
+    :param compiled: whether to evaluate the right-hand side with a compiled
+        CasADi function instead of its NumPy translation.
+    """
+
+    def __init__(
+        self,
+        parameters: NDArray,
+        *,
+        gravity: float = 9.81,
+        dt: float = 0.02,
+        x_threshold: float = 3,
+        theta_threshold: float = 24,
+        force_max: float = 30.0,
+        kinematics_integrator: str = "euler",
+        n_substeps: int = 1,
+        compiled: bool = False,
+    ) -> None:
+        parameters = np.asarray(parameters, dtype=np.float64)
+        if parameters.ndim != 2 or parameters.shape[1] != 3:
+            raise ValueError(
+                f"Parameters should have shape (N, 3), got {parameters.shape}"
+            )
+        if kinematics_integrator not in INTEGRATION_METHODS:
+            raise ValueError(
+                f"Unknown integrator '{kinematics_integrator}', "
+                f"should be one of {INTEGRATION_METHODS}"
+            )
+        self.parameters = parameters
+        self.gravity = gravity
+        self.dt = dt
+        self.x_threshold = x_threshold
+        self.theta_threshold_radians = math.radians(theta_threshold)
+        self.force_max = force_max
+        self.kinematics_integrator = kinematics_integrator
+        self.n_substeps = n_substeps
+        self.states = np.zeros((len(parameters), 4), dtype=np.float64)
+        if compiled:
+            self.rhs = build_batched_inverted_pendulum_rhs(
+                len(parameters), gravity, compiled=True
+            )
+        else:
+            self.rhs = numpy_function(build_inverted_pendulum_rhs(gravity))
+        self.compiled = compiled
+
+    @classmethod
+    def from_parameters(
+        cls,
+        n_instances: int,
+        *,
+        masspole: ArrayLike | None = None,
+        masscart: ArrayLike | None = None,
+        length: ArrayLike | None = None,
+        **kwargs,
+    ) -> "BatchedInvertedPendulum":
+        """Creates instances whose parameters are either shared scalars
+        or arrays of length `n_instances`. Missing parameters take the default
+        values of :class:`InvertedPendulumEnv`.
+        """
+        if masspole is None:
+            masspole = InvertedPendulumEnv.DEFAULT_MASSPOLE
+        if masscart is None:
+            masscart = InvertedPendulumEnv.DEFAULT_MASSCART
+        if length is None:
+            length = InvertedPendulumEnv.DEFAULT_LENGTH
+        parameters = np.empty((n_instances, 3), dtype=np.float64)
+        parameters[:, 0] = masspole
+        parameters[:, 1] = masscart
+        parameters[:, 2] = length
+        return cls(parameters, **kwargs)
+
+    @property
+    def n_instances(self) -> int:
+        return len(self.states)
+
+    @property
+    def masspole(self) -> NDArray:
+        return self.parameters[:, 0]
+
+    @property
+    def masscart(self) -> NDArray:
+        return self.parameters[:, 1]
+
+    @property
+    def length(self) -> NDArray:
+        return self.parameters[:, 2]
+
+    def state_derivatives(self, states: NDArray, force: NDArray) -> NDArray:
+        """Computes the time derivatives of the given `(N, 4)` states
+        for the given `(N,)` forces.
+        """
+        if self.compiled:
+            state_dot = self.rhs(states.T, force[np.newaxis], self.parameters.T)
+            return state_dot.full().T
+        (state_dot,) = self.rhs(states.T, force[np.newaxis], self.parameters.T)
+        return state_dot.T
+
+    def step(self, force: NDArray) -> NDArray:
+        """Advances all instances by one time step.
+
+        :param force: array of shape `(N,)` with the force applied to each cart.
+        :return: boolean array of shape `(N,)` that is True for
+            the instances that reached a terminal state.
+        """
+        force = np.clip(force, -self.force_max, self.force_max)
+        # The integrator expects the state variables along the first axis
+        states = integrate(
+            lambda states, force: self.state_derivatives(states.T, force).T,
+            self.states.T,
+            force,
+            self.dt,
+            method=self.kinematics_integrator,
+            n_substeps=self.n_substeps,
+        )
+        self.states = np.ascontiguousarray(states.T)
+        x, theta = self.states[:, 0], self.states[:, 2]
+
+        return (np.abs(x) > self.x_threshold) | (
+            np.abs(theta) > self.theta_threshold_radians
+        )
+
+
+class VectorInvertedPendulumEnv(ArrayVectorEnv):
+    """Vectorized version of :class:`InvertedPendulumEnv`
+    built on top of :class:`BatchedInvertedPendulum`.
+
+    Each of `masspole`, `masscart` and `length` can either be a scalar shared
+    by all sub-environments or an array with one value per sub-environment.
+
+    :param num_envs: number of pendulums.
+    :param max_steps: maximum number of steps before truncation, if any.
+    :param masspole: mass of the pole.
+    :param masscart: mass of the cart.
+    :param length: length of the pole.
+    :param x_threshold: threshold for cart position.
+    :param theta_threshold: threshold for pole angle.
+    :param force_max: maximum absolute value for force applied to Cart.
+    :param dt: length of a step.
+    :param kinematics_integrator: integration method, see :class:`InvertedPendulumEnv`.
+    :param n_substeps: number of integration sub-steps per step.
+    """
+
+    metadata = {
+        "render_modes": [],
+        "render_fps": InvertedPendulumEnv.metadata["render_fps"],
+    }
+
+    def __init__(
+        self,
+        num_envs: int,
+        *,
+        max_steps: int | None = None,
+        masspole: ArrayLike | None = None,
+        masscart: ArrayLike | None = None,
+        length: ArrayLike | None = None,
+        theta_initial: float = 0.0,
+        x_threshold: float = 3,
+        theta_threshold: float = 24,
+        force_max: float = 30.0,
+        dt: float = 0.02,
+        kinematics_integrator: str = "euler",
+        n_substeps: int = 1,
+    ) -> None:
+        env = InvertedPendulumEnv(
+            theta_initial=theta_initial,
+            x_threshold=x_threshold,
+            theta_threshold=theta_threshold,
+            force_max=force_max,
+            dt=dt,
+            kinematics_integrator=kinematics_integrator,
+            n_substeps=n_substeps,
+        )
+        super().__init__(
+            num_envs, env.observation_space, env.action_space, max_steps=max_steps
+        )
+        self.pendulum = BatchedInvertedPendulum.from_parameters(
+            num_envs,
+            masspole=masspole,
+            masscart=masscart,
+            length=length,
+            gravity=env.gravity,
+            dt=env.dt,
+            x_threshold=x_threshold,
+            theta_threshold=theta_threshold,
+            force_max=force_max,
+            kinematics_integrator=env.kinematics_integrator,
+            n_substeps=env.n_substeps,
+        )
+        self.dt = env.dt
+        self.init_state = env.init_state
+
+    @property
+    def state(self) -> NDArray:
+        return self.pendulum.states
+
+    def _reset_envs(self, mask: NDArray, options: dict | None = None) -> None:
+        low, high = utils.maybe_parse_reset_bounds(options, -0.01, 0.01)
+        self.pendulum.states[mask] = self.init_state + self.np_random.uniform(
+            low=low, high=high, size=(np.count_nonzero(mask), 4)
+        )
+
+    def _get_observations(self) -> NDArray:
+        return self.pendulum.states.astype(np.float32)
+
+    def _step_envs(self, actions: NDArray) -> tuple[NDArray, NDArray]:
+        terminated = self.pendulum.step(actions[:, 0])
+        # Terminated sub-environments are reset right away,
+        # so every step is rewarded.
+        rewards = np.ones(self.num_envs, dtype=np.float64)
+        return rewards, terminated
@@ -0,0 +1,230 @@
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Protocol, Sequence
+
+import gymnasium as gym
+import mediapy as media
+import numpy as np
+from numpy.typing import NDArray
+
+__all__ = [
+    "FrameSink",
+    "FrameListSink",
+    "MemmapFrameSink",
+    "VideoFrameSink",
+    "DecimatingFrameSink",
+    "RenderStream",
+]
+
+
+class FrameSink(Protocol):
+    def reset(self) -> None:
+        """Starts a new recording, discarding the frames of the previous one."""
+        ...
+
+    def add_frame(self, frame: NDArray) -> None:
+        ...
+
+    def output(self) -> Sequence[NDArray] | NDArray | Path:
+        """Finalizes the recording and returns the recorded frames,
+        or the path to the file in which they were written.
+        """
+        ...
+
+
+class FrameListSink:
+    """Keeps all frames in memory in a list."""
+
+    def __init__(self) -> None:
+        self.frames = []
+
+    def reset(self) -> None:
+        self.frames = []
+
+    def add_frame(self, frame: NDArray) -> None:
+        self.frames.append(frame)
+
+    def output(self) -> list[NDArray]:
+        return self.frames
+
+
+class MemmapFrameSink:
+    """Writes frames into a memory-mapped uint8 `.npy` file.
+
+    The file is allocated for `capacity` frames when the first frame arrives
+    and it is overwritten by the next recording. When a recording has more
+    frames, the file is replaced by one allocated for twice as many,
+    into which the frames are copied.
+
+    :param filename: path of the `.npy` file.
+    :param capacity: number of frames for which the file is first allocated.
+    """
+
+    def __init__(self, filename: str | os.PathLike, capacity: int) -> None:
+        if capacity < 1:
+            raise ValueError(f"Capacity should be positive, got {capacity}")
+        self.filename = Path(filename)
+        self.capacity = capacity
+        self.n_frames = 0
+        self._frames = None
+
+    def reset(self) -> None:
+        self.n_frames = 0
+
+    def add_frame(self, frame: NDArray) -> None:
+        if self._frames is None or self._frames.shape[1:] != frame.shape:
+            self._frames = np.lib.format.open_memmap(
+                self.filename,
+                mode="w+",
+                dtype=np.uint8,
+                shape=(self.capacity,) + frame.shape,
+            )
+        if self.n_frames == len(self._frames):
+            self._grow(2 * len(self._frames))
+        self._frames[self.n_frames] = frame
+        self.n_frames += 1
+
+    def _grow(self, capacity: int) -> None:
+        # Written to a new file that replaces the current one,
+        # since the shape in the header of a `.npy` file is fixed
+        with tempfile.NamedTemporaryFile(
+            dir=self.filename.parent, suffix=".npy", delete=False
+        ) as file:
+            pass
+        frames = np.lib.format.open_memmap(
+            file.name,
+            mode="w+",
+            dtype=np.uint8,
+            shape=(capacity,) + self._frames.shape[1:],
+        )
+        frames[: self.n_frames] = self._frames[: self.n_frames]
+        os.replace(file.name, self.filename)
+        self._frames = frames
+
+    def output(self) -> NDArray:
+        if self._frames is None:
+            return np.empty((0,), dtype=np.uint8)
+        self._frames.flush()
+        return self._frames[: self.n_frames]
+
+
+class VideoFrameSink:
+    """Encodes frames incrementally into a video file, e.g. a GIF or an MP4,
+    using mediapy's `VideoWriter`. Requires `ffmpeg`.
+
+    The file is overwritten by the next recording.
+
+    :param path: path of the video file.
+    :param fps: frames per second of the video.
+    :param codec: compression algorithm, e.g. `"gif"` or `"h264"`.
+    :param kwargs: additional keyword arguments passed to `VideoWriter`.
+    """
+
+    def __init__(
+        self,
+        path: str | os.PathLike,
+        fps: float,
+        *,
+        codec: str = "gif",
+        **kwargs: Any,
+    ) -> None:
+        self.path = Path(path)
+        self.fps = fps
+        self.codec = codec
+        self.kwargs = kwargs
+        self._writer = None
+
+    def reset(self) -> None:
+        self._close_writer()
+
+    def _close_writer(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def add_frame(self, frame: NDArray) -> None:
+        if self._writer is None:
+            self._writer = media.VideoWriter(
+                self.path,
+                shape=frame.shape[:2],
+                fps=self.fps,
+                codec=self.codec,
+                **self.kwargs,
+            )
+            self._writer.__enter__()
+        self._writer.add_image(frame)
+
+    def output(self) -> Path:
+        self._close_writer()
+        return self.path
+
+
+class DecimatingFrameSink:
+    """Forwards only every `every`-th frame to another sink.
+
+    The playback rate of the recorded frames is `every` times lower
+    than that of the environment.
+
+    :param sink: sink that receives the forwarded frames.
+    :param every: decimation factor.
+    """
+
+    def __init__(self, sink: FrameSink, every: int) -> None:
+        if every < 1:
+            raise ValueError(f"Decimation factor should be positive, got {every}")
+        self.sink = sink
+        self.every = every
+        self.n_frames = 0
+
+    def reset(self) -> None:
+        self.n_frames = 0
+        self.sink.reset()
+
+    def add_frame(self, frame: NDArray) -> None:
+        if self.n_frames % self.every == 0:
+            self.sink.add_frame(frame)
+        self.n_frames += 1
+
+    def output(self) -> Sequence[NDArray] | NDArray | Path:
+        return self.sink.output()
+
+
+class RenderStream(gym.Wrapper):
+    """Pushes each rendered frame into a sink as soon as it is produced,
+    instead of keeping all frames in a list like gymnasium's `RenderCollection`.
+
+    A new recording is started each time the environment is reset
+    and calling `render` returns the sink's output.
+
+    The recording grows with the number of steps of the episode, with one frame
+    per step: in memory with :class:`FrameListSink`, on disk with
+    :class:`MemmapFrameSink`, whose file is reallocated when it is full,
+    or :class:`VideoFrameSink`. For long episodes, :class:`DecimatingFrameSink`
+    keeps only every n-th frame.
+
+    :param env: environment to wrap. It should have a render mode
+        that returns frames, e.g. `"rgb_array"`.
+    :param sink: sink that receives the frames, defaults to a :class:`FrameListSink`.
+    """
+
+    def __init__(self, env: gym.Env, sink: FrameSink | None = None) -> None:
+        super().__init__(env)
+        assert env.render_mode is not None
+        if sink is None:
+            sink = FrameListSink()
+        self.sink = sink
+
+    def step(self, *args, **kwargs):
+        output = self.env.step(*args, **kwargs)
+        self.sink.add_frame(self.env.render())
+        return output
+
+    def reset(self, *args, **kwargs):
+        result = self.env.reset(*args, **kwargs)
+        self.sink.reset()
+        self.sink.add_frame(self.env.render())
+        return result
+
+    def render(self) -> Sequence[NDArray] | NDArray | Path:
+        return self.sink.output()
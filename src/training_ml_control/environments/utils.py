@@ -1,25 +1,39 @@
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
+from itertools import product
+from pathlib import Path
+from typing import Callable, Sequence
 
 import networkx as nx
 import numpy as np
-from gymnasium import Env
+from gymnasium import Env, Space, spaces
 from gymnasium.envs.classic_control.pendulum import PendulumEnv
 from gymnasium.wrappers import OrderEnforcing, PassiveEnvChecker, TimeLimit
-from gymnasium.wrappers.render_collection import RenderCollection
-from numpy.typing import NDArray
-
-from training_ml_control.control import FeedbackController, Observer, RandomController
-from training_ml_control.environments.cart import CartEnv
+from numpy.typing import DTypeLike, NDArray
+
+from training_ml_control.control import (
+    FeedbackController,
+    Observer,
+    OpenLoopController,
+    RandomController,
+)
+from training_ml_control.environments.cart import CartEnv, VectorCartEnv
 from training_ml_control.environments.grid_world import GridWorldEnv
-from training_ml_control.environments.inverted_pendulum import InvertedPendulumEnv
+from training_ml_control.environments.inverted_pendulum import (
+    InvertedPendulumEnv,
+    VectorInvertedPendulumEnv,
+)
+from training_ml_control.environments.rendering import FrameSink, RenderStream
 
 __all__ = [
     "create_inverted_pendulum_environment",
     "create_grid_world_environment",
     "create_cart_environment",
     "create_pendulum_environment",
+    "TrajectoryRecorder",
     "simulate_environment",
+    "simulate_many",
     "value_iteration",
     "compute_best_path_and_actions_from_values",
 ]
@@ -34,10 +48,38 @@ def create_cart_environment(
     max_speed: float = 10,
     max_force: float = 10,
     goal_position: float = 9.0,
-) -> Env:
+    dt: float | None = None,
+    kinematics_integrator: str = "semi-implicit euler",
+    n_substeps: int = 1,
+    num_envs: int | None = None,
+    frame_sink: FrameSink | None = None,
+) -> Env | VectorCartEnv:
     """Creates instance of CartEnv with some wrappers
     to ensure correctness, limit the number of steps and store rendered frames.
+
+    If `num_envs` is given, a VectorCartEnv that steps that many carts at once
+    is returned instead. Rendering is not supported in that case
+    and `render_mode` is ignored.
+
+    `dt`, `kinematics_integrator` and `n_substeps` select how the cart's
+    dynamics are integrated over a step, see CartEnv.
+
+    Rendered frames are pushed into `frame_sink`, which by default
+    keeps them in a list.
     """
+    if num_envs is not None:
+        return VectorCartEnv(
+            num_envs,
+            max_steps=max_steps,
+            goal_velocity=goal_velocity,
+            max_position=max_position,
+            max_speed=max_speed,
+            max_force=max_force,
+            goal_position=goal_position,
+            dt=dt,
+            kinematics_integrator=kinematics_integrator,
+            n_substeps=n_substeps,
+        )
     env = CartEnv(
         render_mode=render_mode,
         goal_velocity=goal_velocity,
@@ -45,12 +87,15 @@ def create_cart_environment(
         max_speed=max_speed,
         max_force=max_force,
         goal_position=goal_position,
+        dt=dt,
+        kinematics_integrator=kinematics_integrator,
+        n_substeps=n_substeps,
     )
     env = TimeLimit(env, max_steps)
     # env = PassiveEnvChecker(env)
     env = OrderEnforcing(env)
     if render_mode is not None:
-        env = RenderCollection(env)
+        env = RenderStream(env, frame_sink)
     return env
 
 
@@ -58,16 +103,20 @@ def create_pendulum_environment(
     render_mode: str | None = "rgb_array",
     *,
     max_steps: int = 200,
+    frame_sink: FrameSink | None = None,
 ) -> Env:
     """Creates instance of PendulumEnv with some wrappers
     to ensure correctness, limit the number of steps and store rendered frames.
+
+    Rendered frames are pushed into `frame_sink`, which by default
+    keeps them in a list.
     """
     env = PendulumEnv(render_mode=render_mode)
     env = TimeLimit(env, max_steps)
     # env = PassiveEnvChecker(env)
     env = OrderEnforcing(env)
     if render_mode is not None:
-        env = RenderCollection(env)
+        env = RenderStream(env, frame_sink)
     return env
 
 
@@ -75,15 +124,19 @@ def create_grid_world_environment(
     render_mode: str | None = "rgb_array",
     *,
     max_steps: int = 20,
+    frame_sink: FrameSink | None = None,
 ) -> Env:
     """Creates instance of GridWorldEnv with some wrappers
     to ensure correctness, limit the number of steps and store rendered frames.
+
+    Rendered frames are pushed into `frame_sink`, which by default
+    keeps them in a list.
     """
     env = GridWorldEnv(render_mode=render_mode, max_steps=max_steps)
     # env = PassiveEnvChecker(env)
     env = OrderEnforcing(env)
     if render_mode is not None:
-        env = RenderCollection(env)
+        env = RenderStream(env, frame_sink)
     return env
 
 
@@ -98,7 +151,12 @@ def create_inverted_pendulum_environment(
     theta_initial: float = 0.0,
     theta_threshold: float = 24,
     force_max: float = 10.0,
-) -> Env:
+    dt: float = 0.02,
+    kinematics_integrator: str = "euler",
+    n_substeps: int = 1,
+    num_envs: int | None = None,
+    frame_sink: FrameSink | None = None,
+) -> Env | VectorInvertedPendulumEnv:
     """Creates instance of InvertedPendulumEnv with some wrappers
     to ensure correctness, limit the number of steps and store rendered frames.
 
@@ -111,10 +169,35 @@ def create_inverted_pendulum_environment(
         force_max: maximum absolute value for force applied to Cart.
         x_threshold: Threshold value for cart position.
         theta_threshold: Threshold value for pole angle.
+        dt: Length of a step, over which the force is held constant.
+        kinematics_integrator: Integration method, one of "euler",
+            "semi-implicit euler", "rk4" and "rk45".
+        n_substeps: Number of integration sub-steps per step.
+        num_envs: If given, a VectorInvertedPendulumEnv that steps that many
+            pendulums at once is returned instead. In that case masspole, masscart
+            and length can also be arrays with one value per pendulum.
+            Rendering is not supported and render_mode is ignored.
+        frame_sink: Sink into which rendered frames are pushed.
+            Defaults to a FrameListSink that keeps them in a list.
 
     Returns:
         Instantiated and wrapped environment.
     """
+    if num_envs is not None:
+        return VectorInvertedPendulumEnv(
+            num_envs,
+            max_steps=max_steps,
+            masspole=masspole,
+            masscart=masscart,
+            length=length,
+            x_threshold=x_threshold,
+            theta_initial=theta_initial,
+            theta_threshold=theta_threshold,
+            force_max=force_max,
+            dt=dt,
+            kinematics_integrator=kinematics_integrator,
+            n_substeps=n_substeps,
+        )
     env = InvertedPendulumEnv(
         masspole=masspole,
         masscart=masscart,
@@ -123,24 +206,96 @@ def create_inverted_pendulum_environment(
         theta_threshold=theta_threshold,
         theta_initial=theta_initial,
         force_max=force_max,
+        dt=dt,
+        kinematics_integrator=kinematics_integrator,
+        n_substeps=n_substeps,
         render_mode=render_mode,
     )
     env = PassiveEnvChecker(env)
     env = OrderEnforcing(env)
     env = TimeLimit(env, max_steps)
     if render_mode is not None:
-        env = RenderCollection(env)
+        env = RenderStream(env, frame_sink)
     return env
 
 
 @dataclass
 class SimulationResults:
-    frames: list[NDArray]
+    frames: Sequence[NDArray] | NDArray | Path
     observations: NDArray
     estimated_observations: NDArray
     actions: NDArray
 
 
+class TrajectoryRecorder:
+    """Records the observations, estimated observations and actions of an episode
+    into buffers that are preallocated for `max_steps` steps.
+
+    Buffer shapes are derived from the environment's observation and action
+    spaces. Spaces other than `Box` and `Discrete` are stored in object arrays.
+    The buffer for estimated observations is allocated on the first record,
+    since its shape depends on the observer.
+
+    :param env: environment whose episode is recorded.
+    :param max_steps: maximum number of steps in the episode.
+    :param dtype: dtype used to store continuous values. Defaults to None,
+        i.e. the dtype of the spaces, and to that of the first estimated
+        observation for estimated observations.
+    """
+
+    def __init__(
+        self, env: Env, max_steps: int, *, dtype: DTypeLike | None = None
+    ) -> None:
+        self.max_steps = max_steps
+        self.dtype = dtype
+        self._observations = self._allocate(env.observation_space, max_steps + 1)
+        self._actions = self._allocate(env.action_space, max_steps)
+        self._estimated_observations = None
+        self.n_observations = 0
+        self.n_actions = 0
+        self.n_estimated_observations = 0
+
+    def _allocate(self, space: Space, capacity: int) -> NDArray:
+        if isinstance(space, spaces.Box):
+            return np.empty((capacity,) + space.shape, dtype=self.dtype or space.dtype)
+        if isinstance(space, spaces.Discrete):
+            return np.empty(capacity, dtype=space.dtype)
+        return np.empty(capacity, dtype=object)
+
+    def record_observation(self, observation: NDArray) -> None:
+        self._observations[self.n_observations] = observation
+        self.n_observations += 1
+
+    def record_action(self, action: NDArray) -> None:
+        self._actions[self.n_actions] = action
+        self.n_actions += 1
+
+    def record_estimated_observation(self, estimated_observation: NDArray) -> None:
+        if self._estimated_observations is None:
+            self._estimated_observations = np.empty(
+                (self.max_steps + 1,) + np.shape(estimated_observation),
+                dtype=self.dtype or np.asarray(estimated_observation).dtype,
+            )
+        self._estimated_observations[
+            self.n_estimated_observations
+        ] = estimated_observation
+        self.n_estimated_observations += 1
+
+    @property
+    def observations(self) -> NDArray:
+        return self._observations[: self.n_observations]
+
+    @property
+    def actions(self) -> NDArray:
+        return self._actions[: self.n_actions]
+
+    @property
+    def estimated_observations(self) -> NDArray:
+        if self._estimated_observations is None:
+            return np.empty(0, dtype=self.dtype or np.float64)
+        return self._estimated_observations[: self.n_estimated_observations]
+
+
 def simulate_environment(
     env: Env,
     *,
@@ -148,50 +303,175 @@ def simulate_environment(
     controller: FeedbackController | None = None,
     observer: Observer | None = None,
     seed: int = 16,
+    dtype: DTypeLike | None = None,
 ) -> SimulationResults:
+    """Simulates an episode of the environment in closed loop with the controller.
+
+    Observations, estimated observations and actions are recorded in
+    preallocated buffers (see :class:`TrajectoryRecorder`) and the returned
+    arrays are views on these buffers trimmed to the length of the episode.
+
+    Args:
+        env: Environment to simulate.
+        max_steps: Maximum number of steps in the episode.
+        controller: Controller, defaults to a random controller.
+        observer: Optional observer used to estimate the observations.
+        seed: Seed used to reset the environment and its action space.
+        dtype: Dtype used to store continuous observations and actions,
+            defaults to the dtype of the observation and action spaces.
+
+    Returns:
+        Output of the environment's frame sink (e.g. a list of frames
+        or the path to a video file), observations, estimated observations
+        and actions.
+    """
+    observation, _ = env.reset(seed=seed)
+    # Seed the action space as well so that random controllers are reproducible
+    env.action_space.seed(seed)
     if controller is None:
         controller = RandomController(env)
 
-    observation, _ = env.reset(seed=seed)
-    actions = []
-    observations = [observation]
-    estimated_observations = []
+    recorder = TrajectoryRecorder(env, max_steps, dtype=dtype)
+    recorder.record_observation(observation)
     frames = []
 
     if observer is not None:
         estimated_observation = observer.observe(observation)
-        estimated_observations.append(estimated_observation)
-
-    for _ in range(max_steps):
-        action = controller.act(observation)
+        recorder.record_estimated_observation(estimated_observation)
+
+    # The inputs of open-loop controllers do not depend on the observations,
+    # so they are generated all at once instead of calling act at each step.
+    open_loop_actions = None
+    if isinstance(controller, OpenLoopController):
+        open_loop_actions = controller.generate(max_steps)
+
+    for i in range(max_steps):
+        if open_loop_actions is not None:
+            action = open_loop_actions[i]
+        else:
+            action = controller.act(observation)
         observation, _, terminated, truncated, _ = env.step(action)
 
-        observations.append(observation)
-        actions.append(action)
+        recorder.record_observation(observation)
+        recorder.record_action(action)
 
         if observer is not None:
             estimated_observation = observer.observe(observation)
-            estimated_observations.append(estimated_observation)
+            recorder.record_estimated_observation(estimated_observation)
 
         # Check if we need to stop the simulation
         if terminated or truncated:
             break
 
+    if open_loop_actions is not None:
+        # Give back the inputs of the steps that were not taken,
+        # as if act had been called at each step
+        controller.rewind(max_steps - recorder.n_actions)
+
     if env.render_mode is not None:
         frames = env.render()
-    env.reset()
     env.close()
 
-    actions = np.stack(actions)
-    observations = np.stack(observations)
-    if estimated_observations:
-        estimated_observations = np.stack(estimated_observations)
-
     return SimulationResults(
         frames=frames,
+        observations=recorder.observations,
+        estimated_observations=recorder.estimated_observations,
+        actions=recorder.actions,
+    )
+
+
+@dataclass
+class MultiSimulationResults:
+    """Results of :func:`simulate_many`.
+
+    The first two axes of every array correspond to the controller factory
+    and the seed respectively. Observations and actions of episodes that
+    terminated early are padded with NaN after their last step.
+    """
+
+    observations: NDArray
+    actions: NDArray
+    episode_lengths: NDArray
+
+
+def _simulate_single(
+    task: tuple[Callable[[], Env], Callable[[Env], FeedbackController], int, int]
+) -> tuple[NDArray, NDArray]:
+    env_factory, controller_factory, seed, max_steps = task
+    env = env_factory()
+    controller = controller_factory(env)
+    results = simulate_environment(
+        env, max_steps=max_steps, controller=controller, seed=seed
+    )
+    return results.observations, results.actions
+
+
+def simulate_many(
+    env_factory: Callable[[], Env],
+    controller_factories: Sequence[Callable[[Env], FeedbackController]],
+    seeds: Sequence[int],
+    *,
+    max_steps: int = 500,
+    max_workers: int | None = None,
+    chunksize: int = 1,
+) -> MultiSimulationResults:
+    """Simulates every combination of controller and seed
+    in parallel using a pool of worker processes.
+
+    Each run creates a fresh environment and controller and then calls
+    :func:`simulate_environment`, so that the results are identical to
+    those of the corresponding serial runs. Rendered frames are discarded,
+    it is therefore best to pass an environment factory with `render_mode=None`.
+
+    Args:
+        env_factory: Callable that creates the environment,
+            e.g. `partial(create_cart_environment, render_mode=None)`.
+        controller_factories: Callables that create a controller
+            given the environment, e.g. `partial(SineController, frequency=2)`.
+        seeds: Seeds used to reset the environment.
+        max_steps: Maximum number of steps per episode.
+        max_workers: Maximum number of worker processes.
+            If set to 1, the simulations run serially in the current process.
+        chunksize: Number of runs sent to a worker process at once.
+
+    Returns:
+        Observations with shape `(n_controllers, n_seeds, max_steps + 1, obs_dim)`,
+        actions with shape `(n_controllers, n_seeds, max_steps, action_dim)`
+        and episode lengths, i.e. number of actions, with shape
+        `(n_controllers, n_seeds)`.
+    """
+    tasks = [
+        (env_factory, controller_factory, seed, max_steps)
+        for controller_factory, seed in product(controller_factories, seeds)
+    ]
+    if max_workers == 1:
+        runs = list(map(_simulate_single, tasks))
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            runs = list(executor.map(_simulate_single, tasks, chunksize=chunksize))
+
+    shape = (len(controller_factories), len(seeds))
+    first_observations, first_actions = runs[0]
+    observations = np.full(
+        shape + (max_steps + 1,) + first_observations.shape[1:],
+        np.nan,
+        dtype=np.result_type(first_observations, np.float32),
+    )
+    actions = np.full(
+        shape + (max_steps,) + first_actions.shape[1:],
+        np.nan,
+        dtype=np.result_type(first_actions, np.float32),
+    )
+    episode_lengths = np.zeros(shape, dtype=np.int64)
+    for index, (run_observations, run_actions) in zip(np.ndindex(shape), runs):
+        observations[index][: len(run_observations)] = run_observations
+        actions[index][: len(run_actions)] = run_actions
+        episode_lengths[index] = len(run_actions)
+
+    return MultiSimulationResults(
         observations=observations,
-        estimated_observations=estimated_observations,
         actions=actions,
+        episode_lengths=episode_lengths,
     )
 
 
@@ -0,0 +1,98 @@
+from abc import ABC, abstractmethod
+
+import numpy as np
+from gymnasium import Space
+from gymnasium.utils import seeding
+from gymnasium.vector import VectorEnv
+from numpy.typing import NDArray
+
+__all__ = ["ArrayVectorEnv"]
+
+
+class ArrayVectorEnv(VectorEnv, ABC):
+    """Base class for vectorized environments that keep the state
+    of all sub-environments in NumPy arrays and advance them in a single call.
+
+    Subclasses implement `_reset_envs`, `_step_envs` and `_get_observations`.
+    This class takes care of truncating sub-environments after `max_steps`
+    and of resetting finished sub-environments automatically. Just like in
+    gymnasium's `SyncVectorEnv`, the last observation and info of these are
+    stored in the info dictionary under `"final_observation"` and `"final_info"`.
+
+    Rendering is not supported.
+
+    :param num_envs: number of sub-environments.
+    :param observation_space: observation space of a single sub-environment.
+    :param action_space: action space of a single sub-environment.
+    :param max_steps: maximum number of steps before truncation, if any.
+    """
+
+    def __init__(
+        self,
+        num_envs: int,
+        observation_space: Space,
+        action_space: Space,
+        *,
+        max_steps: int | None = None,
+    ) -> None:
+        super().__init__(num_envs, observation_space, action_space)
+        self.max_steps = max_steps
+        self.render_mode = None
+        self.elapsed_steps = np.zeros(num_envs, dtype=np.int64)
+        self._actions = np.zeros((num_envs,) + action_space.shape, dtype=np.float64)
+
+    @abstractmethod
+    def _reset_envs(self, mask: NDArray, options: dict | None = None) -> None:
+        """Resets the sub-environments selected by the boolean `mask`."""
+
+    @abstractmethod
+    def _step_envs(self, actions: NDArray) -> tuple[NDArray, NDArray]:
+        """Advances all sub-environments and returns rewards and terminations."""
+
+    @abstractmethod
+    def _get_observations(self) -> NDArray:
+        """Returns the current observations of all sub-environments."""
+
+    def reset_wait(
+        self,
+        seed: int | None = None,
+        options: dict | None = None,
+    ) -> tuple[NDArray, dict]:
+        if seed is not None:
+            self._np_random, seed = seeding.np_random(seed)
+        self._reset_envs(np.ones(self.num_envs, dtype=bool), options)
+        self.elapsed_steps[:] = 0
+        return self._get_observations(), {}
+
+    def step_async(self, actions: NDArray) -> None:
+        actions = np.asarray(actions, dtype=np.float64)
+        self._actions = actions.reshape(self.num_envs, -1)
+
+    def step_wait(self) -> tuple[NDArray, NDArray, NDArray, NDArray, dict]:
+        rewards, terminated = self._step_envs(self._actions)
+        self.elapsed_steps += 1
+        if self.max_steps is None:
+            truncated = np.zeros(self.num_envs, dtype=bool)
+        else:
+            truncated = self.elapsed_steps >= self.max_steps
+
+        observations = self._get_observations()
+        infos = {}
+        done = terminated | truncated
+        if np.any(done):
+            final_observations = np.full(self.num_envs, None, dtype=object)
+            final_infos = np.full(self.num_envs, None, dtype=object)
+            for i in np.flatnonzero(done):
+                final_observations[i] = observations[i].copy()
+                final_infos[i] = {}
+            infos = {
+                "final_observation": final_observations,
+                "_final_observation": done.copy(),
+                "final_info": final_infos,
+                "_final_info": done.copy(),
+            }
+            self._reset_envs(done)
+            self.elapsed_steps[done] = 0
+            observations[done] = self._get_observations()[done]
+
+        return observations, rewards, terminated, truncated, infos
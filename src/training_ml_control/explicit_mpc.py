@@ -0,0 +1,405 @@
+import logging
+from collections import deque
+
+import casadi
+import numpy as np
+from do_mpc.model import LinearModel
+from numpy.typing import NDArray
+from scipy.linalg import solve_discrete_are
+from scipy.optimize import linprog
+
+from training_ml_control.models import limits_to_arrays
+
+__all__ = ["ExplicitMPCController", "build_explicit_mpc_controller"]
+
+logger = logging.getLogger(__name__)
+
+# Tolerance on constraint activity, multipliers and halfspace tests
+_TOLERANCE = 1e-8
+# Regions whose Chebyshev radius is smaller than this are lower-dimensional
+_MIN_RADIUS = 1e-7
+# Length of the step across a facet, relative to the size of the domain
+_RELATIVE_STEP = 1e-5
+
+
+class ExplicitMPCController:
+    """Explicit MPC controller, i.e. a piecewise affine feedback law
+    `u = K_i x + k_i` defined on polyhedral critical regions
+    `{x : H_i x <= h_i}` that were computed offline.
+
+    The region that contains the measurement is found by evaluating
+    all halfspaces at once, after checking the region of the previous call,
+    which usually still contains the state.
+    Outside of all regions, i.e. outside of the explored domain or where
+    the MPC problem is infeasible, the law of the region whose constraints
+    are the least violated is used and the inputs are clipped to their limits.
+
+    :param halfspaces: normals of the halfspaces of all regions, stacked.
+    :param offsets: offsets of the halfspaces of all regions, stacked.
+    :param region_starts: index of the first halfspace of each region.
+    :param gains: gain of each region, with shape (n_regions, n_u, n_x).
+    :param biases: bias of each region, with shape (n_regions, n_u).
+    :param u_lower: lower limits of the inputs.
+    :param u_upper: upper limits of the inputs.
+    """
+
+    def __init__(
+        self,
+        halfspaces: NDArray,
+        offsets: NDArray,
+        region_starts: NDArray,
+        gains: NDArray,
+        biases: NDArray,
+        u_lower: NDArray,
+        u_upper: NDArray,
+    ) -> None:
+        self.halfspaces = halfspaces
+        self.offsets = offsets
+        self.region_starts = region_starts
+        self.gains = gains
+        self.biases = biases
+        self.u_lower = u_lower
+        self.u_upper = u_upper
+        self.n_regions = len(gains)
+        # Views of the halfspaces of each region, for the check of the last region
+        region_stops = np.append(region_starts[1:], len(offsets))
+        self._regions = [
+            (halfspaces[start:stop], offsets[start:stop])
+            for start, stop in zip(region_starts, region_stops)
+        ]
+        self.region = 0
+
+    def locate(self, x: NDArray) -> int:
+        """Returns the index of the critical region that contains the state,
+        -1 if there is none."""
+        region_halfspaces, region_offsets = self._regions[self.region]
+        if (region_halfspaces @ x <= region_offsets).all():
+            return self.region
+        violations = self.halfspaces @ x - self.offsets
+        max_violations = np.maximum.reduceat(violations, self.region_starts)
+        region = int(np.argmin(max_violations))
+        self.region = region
+        return region if max_violations[region] <= _TOLERANCE else -1
+
+    def act(self, measurement: NDArray) -> NDArray:
+        x = np.ravel(measurement)
+        region = self.locate(x)
+        u = self.gains[self.region] @ x + self.biases[self.region]
+        if region == -1:
+            u = np.clip(u, self.u_lower, self.u_upper)
+        return u
+
+
+def build_explicit_mpc_controller(
+    model: LinearModel,
+    n_horizon: int,
+    setpoint: NDArray,
+    Q: NDArray,
+    R: NDArray,
+    x_limits: dict[str, NDArray],
+    u_limits: dict[str, NDArray] | None = None,
+) -> ExplicitMPCController:
+    """Computes the explicit solution of a linear MPC problem by
+    multiparametric quadratic programming.
+
+    The MPC problem minimizes, over `n_horizon` steps,
+    the quadratic costs `(x - setpoint)^T Q (x - setpoint) + (u - u_s)^T R (u - u_s)`
+    of the discrete-time linear model, with the solution of the discrete
+    algebraic Riccati equation as terminal cost, subject to box constraints
+    on the predicted states and inputs. `u_s` is the input that keeps
+    the system at the setpoint.
+
+    The solution is a piecewise affine function of the initial state, whose
+    critical regions are explored geometrically: starting from one region,
+    the problem is solved just across each of its facets to find the active
+    constraints of the neighbouring region, until the feasible part of
+    the domain is covered.
+
+    The limits of all states define the domain of the explicit solution,
+    so they must all be given. The number of regions grows quickly with
+    the horizon and the number of constraints, so only short horizons
+    are practical. The numbers of regions and of halfspaces that define them
+    are logged at the INFO level.
+
+    Args:
+        model: Discrete-time linear model.
+        n_horizon: Prediction horizon.
+        setpoint: Setpoint of the states.
+        Q: State cost matrix.
+        R: Input cost matrix.
+        x_limits: Lower and upper limits of every state.
+        u_limits: Lower and upper limits of the inputs.
+
+    Returns:
+        Explicit MPC controller.
+    """
+    if model.model_type != "discrete":
+        raise ValueError("The model should be discretized first")
+    A, B = np.asarray(model.sys_A), np.asarray(model.sys_B)
+    n_x, n_u = B.shape
+    x_lower, x_upper = limits_to_arrays(model._x, x_limits, n_x)
+    if not (np.isfinite(x_lower).all() and np.isfinite(x_upper).all()):
+        raise ValueError("Explicit MPC needs limits on all states")
+    u_lower, u_upper = limits_to_arrays(model._u, u_limits or {}, n_u)
+
+    x_s = np.ravel(setpoint).astype(float)
+    u_s, *_ = np.linalg.lstsq(B, x_s - A @ x_s, rcond=None)
+    if not np.allclose(A @ x_s + B @ u_s, x_s):
+        raise ValueError("The setpoint should be an equilibrium of the model")
+    P = solve_discrete_are(A, B, Q, R)
+
+    # Condensed problem in deviations from the setpoint, with the initial state
+    # as parameter: min 1/2 U^T H U + x0^T F U  s.t.  G U <= w + E x0
+    # Predicted deviations: x_{k+1} = A^{k+1} x_0 + sum_{j<=k} A^{k-j} B u_j
+    n_U = n_horizon * n_u
+    powers = [np.linalg.matrix_power(A, k) for k in range(n_horizon + 1)]
+    Sx = np.vstack(powers[1:])
+    Su = np.zeros((n_horizon * n_x, n_U))
+    for k in range(n_horizon):
+        for j in range(k + 1):
+            Su[k * n_x : (k + 1) * n_x, j * n_u : (j + 1) * n_u] = powers[k - j] @ B
+    Q_bar = np.kron(np.eye(n_horizon), Q)
+    Q_bar[-n_x:, -n_x:] = P
+    R_bar = np.kron(np.eye(n_horizon), R)
+    H = 2 * (Su.T @ Q_bar @ Su + R_bar)
+    F = 2 * Sx.T @ Q_bar @ Su
+
+    G = np.vstack([np.eye(n_U), -np.eye(n_U), Su, -Su])
+    w = np.concatenate(
+        [
+            np.tile(u_upper - u_s, n_horizon),
+            np.tile(u_s - u_lower, n_horizon),
+            np.tile(x_upper - x_s, n_horizon),
+            np.tile(x_s - x_lower, n_horizon),
+        ]
+    )
+    E = np.vstack([np.zeros((2 * n_U, n_x)), -Sx, Sx])
+    finite = np.isfinite(w)
+    G, w, E = G[finite], w[finite], E[finite]
+
+    regions = _solve_mpqp(H, F, G, w, E, x_lower - x_s, x_upper - x_s)
+    if not regions:
+        raise ValueError("The MPC problem is infeasible on the whole domain")
+
+    # Back to absolute coordinates, keeping only the first input
+    halfspaces = np.vstack([normals for normals, _, _, _ in regions])
+    offsets = np.concatenate(
+        [bounds + normals @ x_s for normals, bounds, _, _ in regions]
+    )
+    region_starts = np.cumsum([0] + [len(bounds) for _, bounds, _, _ in regions])[:-1]
+    gains = np.stack([gain[:n_u] for _, _, gain, _ in regions])
+    biases = np.stack(
+        [bias[:n_u] + u_s - gain[:n_u] @ x_s for *_, gain, bias in regions]
+    )
+    logger.info(
+        "Explicit MPC with %d critical regions defined by %d halfspaces",
+        len(regions),
+        len(offsets),
+    )
+    return ExplicitMPCController(
+        halfspaces, offsets, region_starts, gains, biases, u_lower, u_upper
+    )
+
+
+def _solve_mpqp(
+    H: NDArray,
+    F: NDArray,
+    G: NDArray,
+    w: NDArray,
+    E: NDArray,
+    lower: NDArray,
+    upper: NDArray,
+) -> list[tuple[NDArray, NDArray, NDArray, NDArray]]:
+    """Explores the critical regions of the multiparametric QP
+    `min 1/2 U^T H U + theta^T F U  s.t.  G U <= w + E theta`
+    for parameters `theta` in the box between `lower` and `upper`.
+
+    Returns:
+        List of regions `(normals, bounds, gain, bias)`, with the region
+        `{theta : normals theta <= bounds}` and the solution
+        `U = gain theta + bias` on it.
+    """
+    n_theta = len(lower)
+    H_inv = np.linalg.inv(H)
+    domain_normals = np.vstack([np.eye(n_theta), -np.eye(n_theta)])
+    domain_bounds = np.concatenate([upper, -lower])
+    step = _RELATIVE_STEP * np.max(upper - lower)
+    qp = casadi.conic(
+        "qp",
+        "qpoases",
+        {"h": casadi.DM(H).sparsity(), "a": casadi.DM(G).sparsity()},
+        {"printLevel": "none", "error_on_fail": False},
+    )
+
+    def critical_region(active: NDArray):
+        G_A = G[active]
+        if len(G_A) == 0:
+            multiplier_bias = np.zeros(0)
+            multiplier_gain = np.zeros((0, n_theta))
+        elif np.linalg.matrix_rank(G_A) < len(G_A):
+            return None
+        else:
+            # Multipliers as affine functions of the parameters
+            M_inv = np.linalg.inv(G_A @ H_inv @ G_A.T)
+            multiplier_bias = -M_inv @ w[active]
+            multiplier_gain = -M_inv @ (E[active] + G_A @ H_inv @ F.T)
+        bias = -H_inv @ G_A.T @ multiplier_bias
+        gain = -H_inv @ (F.T + G_A.T @ multiplier_gain)
+        inactive = ~active
+        normals = np.vstack(
+            [
+                -multiplier_gain,
+                G[inactive] @ gain - E[inactive],
+                domain_normals,
+            ]
+        )
+        bounds = np.concatenate(
+            [multiplier_bias, w[inactive] - G[inactive] @ bias, domain_bounds]
+        )
+        is_facet = np.arange(len(bounds)) < len(bounds) - 2 * n_theta
+        norms = np.linalg.norm(normals, axis=1)
+        degenerate = norms < _TOLERANCE
+        if (bounds[degenerate] < -_TOLERANCE).any():
+            return None
+        normals = normals[~degenerate] / norms[~degenerate, np.newaxis]
+        bounds = bounds[~degenerate] / norms[~degenerate]
+        is_facet = is_facet[~degenerate]
+        _, radius = _chebyshev_ball(normals, bounds)
+        if radius < _MIN_RADIUS:
+            return None
+        keep = _irredundant_halfspaces(normals, bounds)
+        return normals[keep], bounds[keep], is_facet[keep], gain, bias
+
+    regions = []
+    all_normals = np.empty((0, n_theta))
+    all_bounds = np.empty(0)
+    region_starts = []
+    queue = deque([_interior_parameter(G, w, E, domain_normals, domain_bounds)])
+    while queue:
+        theta = queue.popleft()
+        if theta is None:
+            continue
+        if region_starts:
+            violations = all_normals @ theta - all_bounds
+            if np.maximum.reduceat(violations, region_starts).min() <= 0:
+                continue
+        solution = qp(h=H, g=F.T @ theta, a=G, lba=-np.inf, uba=w + E @ theta)
+        if not qp.stats()["success"]:
+            continue
+        U = solution["x"].full().ravel()
+        slack = w + E @ theta - G @ U
+        if (slack < -1e3 * _TOLERANCE).any():
+            # Infeasible parameter
+            continue
+        region = critical_region(np.abs(slack) <= 1e3 * _TOLERANCE)
+        if region is None:
+            multipliers = solution["lam_a"].full().ravel()
+            region = critical_region(multipliers > _TOLERANCE)
+        if region is None:
+            continue
+        normals, bounds, is_facet, gain, bias = region
+        if (normals @ theta - bounds).max() > step:
+            # Numerical failure, the region should contain the parameter
+            continue
+        regions.append((normals, bounds, gain, bias))
+        region_starts.append(len(all_bounds))
+        all_normals = np.vstack([all_normals, normals])
+        all_bounds = np.concatenate([all_bounds, bounds])
+        for j in np.flatnonzero(is_facet):
+            center = _facet_center(normals, bounds, j)
+            if center is not None:
+                queue.append(center + step * normals[j])
+    return regions
+
+
+def _chebyshev_ball(normals: NDArray, bounds: NDArray) -> tuple[NDArray, float]:
+    """Center and radius of the largest ball inside `{x : normals x <= bounds}`,
+    whose normals have unit length."""
+    n = normals.shape[1]
+    result = linprog(
+        np.append(np.zeros(n), -1.0),
+        A_ub=np.hstack([normals, np.ones((len(bounds), 1))]),
+        b_ub=bounds,
+        bounds=[(None, None)] * n + [(0, None)],
+        method="highs",
+    )
+    if result.status != 0:
+        return np.zeros(n), 0.0
+    return result.x[:n], result.x[n]
+
+
+def _irredundant_halfspaces(normals: NDArray, bounds: NDArray) -> NDArray:
+    """Boolean mask of the halfspaces that define facets of the polytope."""
+    n = normals.shape[1]
+    # Cheap test against the bounding box of the polytope first
+    box = np.array(
+        [
+            linprog(
+                c, A_ub=normals, b_ub=bounds, bounds=[(None, None)] * n, method="highs"
+            ).fun
+            for c in np.vstack([np.eye(n), -np.eye(n)])
+        ]
+    )
+    minimum, maximum = box[:n], -box[n:]
+    center, half_width = (minimum + maximum) / 2, (maximum - minimum) / 2
+    keep = normals @ center + np.abs(normals) @ half_width > bounds - _TOLERANCE
+    for i in np.flatnonzero(keep):
+        others = keep.copy()
+        others[i] = False
+        result = linprog(
+            -normals[i],
+            A_ub=np.vstack([normals[others], normals[i]]),
+            b_ub=np.append(bounds[others], bounds[i] + 1.0),
+            bounds=[(None, None)] * n,
+            method="highs",
+        )
+        keep[i] = result.status == 0 and -result.fun > bounds[i] + _TOLERANCE
+    return keep
+
+
+def _facet_center(normals: NDArray, bounds: NDArray, j: int) -> NDArray | None:
+    """Center of the largest ball inside the j-th facet of the polytope."""
+    n = normals.shape[1]
+    others = np.arange(len(bounds)) != j
+    # Radius of the ball measured within the hyperplane of the facet
+    projected = normals[others] - np.outer(normals[others] @ normals[j], normals[j])
+    result = linprog(
+        np.append(np.zeros(n), -1.0),
+        A_ub=np.hstack([normals[others], np.linalg.norm(projected, axis=1)[:, None]]),
+        b_ub=bounds[others],
+        A_eq=np.append(normals[j], 0.0)[np.newaxis],
+        b_eq=bounds[j : j + 1],
+        bounds=[(None, None)] * n + [(0, None)],
+        method="highs",
+    )
+    if result.status != 0 or result.x[n] < _MIN_RADIUS:
+        return None
+    return result.x[:n]
+
+
+def _interior_parameter(
+    G: NDArray, w: NDArray, E: NDArray, domain_normals: NDArray, domain_bounds: NDArray
+) -> NDArray | None:
+    """Parameter in the domain for which the constraints are satisfied
+    with the largest margin."""
+    n_U, n_theta = G.shape[1], E.shape[1]
+    A_ub = np.block(
+        [
+            [-E, G, np.ones((len(w), 1))],
+            [
+                domain_normals,
+                np.zeros((len(domain_bounds), n_U)),
+                np.ones((len(domain_bounds), 1)),
+            ],
+        ]
+    )
+    result = linprog(
+        np.append(np.zeros(n_theta + n_U), -1.0),
+        A_ub=A_ub,
+        b_ub=np.concatenate([w, domain_bounds]),
+        bounds=[(None, None)] * (n_theta + n_U) + [(0, None)],
+        method="highs",
+    )
+    if result.status != 0:
+        return None
+    return result.x[:n_theta]
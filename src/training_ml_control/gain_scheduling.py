@@ -0,0 +1,281 @@
+import os
+from typing import Sequence
+
+import casadi
+import numpy as np
+from numpy.typing import ArrayLike, NDArray
+from scipy.interpolate import RegularGridInterpolator
+from scipy.linalg import expm
+
+from training_ml_control.control import LQRController
+from training_ml_control.dynamics import build_inverted_pendulum_rhs
+from training_ml_control.environments.inverted_pendulum import InvertedPendulumEnv
+
+__all__ = [
+    "linearize_inverted_pendulum",
+    "discretize_zoh",
+    "solve_discrete_are_batched",
+    "lqr_gains_batched",
+    "LQRGainTable",
+    "build_inverted_pendulum_lqr_gain_table",
+    "GainScheduledLQRController",
+]
+
+PENDULUM_PARAMETERS = ("masspole", "masscart", "length")
+
+# Indices of the angle and angular velocity in the state of the inverted pendulum
+ANGLE_INDICES = [2, 3]
+
+
+def linearize_inverted_pendulum(
+    gravity: float, masspole: ArrayLike, masscart: ArrayLike, length: ArrayLike
+) -> tuple[NDArray, NDArray]:
+    """Linearizes the right-hand side of
+    :func:`training_ml_control.dynamics.build_inverted_pendulum_rhs`,
+    which is simulated by the environment, around the upright position
+    without force.
+
+    The parameters are broadcast against each other, so that the matrices
+    of many pendulums are computed at once.
+
+    Args:
+        gravity: Gravitational acceleration.
+        masspole: Masses of the poles.
+        masscart: Masses of the carts.
+        length: Lengths of the poles.
+
+    Returns:
+        Matrices A and B of the continuous-time dynamics, with shapes
+        (..., 4, 4) and (..., 4, 1), of the states (position, velocity,
+        angle and angular velocity).
+    """
+    parameters = np.broadcast_arrays(
+        *(np.asarray(value, dtype=float) for value in (masspole, masscart, length))
+    )
+    shape = parameters[0].shape
+    n_instances = int(np.prod(shape))
+
+    state = casadi.SX.sym("state", 4)
+    force = casadi.SX.sym("force")
+    parameter = casadi.SX.sym("parameters", 3)
+    state_dot = build_inverted_pendulum_rhs(gravity)(state, force, parameter)
+    jacobians = casadi.Function(
+        "inverted_pendulum_jacobians",
+        [state, force, parameter],
+        [casadi.jacobian(state_dot, state), casadi.jacobian(state_dot, force)],
+    ).map(n_instances)
+    A, B = jacobians(
+        np.zeros((4, n_instances)),
+        np.zeros((1, n_instances)),
+        np.stack([value.ravel() for value in parameters]),
+    )
+    # The mapped outputs are stacked horizontally
+    A = A.full().reshape(4, n_instances, 4).transpose(1, 0, 2)
+    B = B.full().reshape(4, n_instances, 1).transpose(1, 0, 2)
+    return A.reshape(shape + (4, 4)), B.reshape(shape + (4, 1))
+
+
+def discretize_zoh(A: NDArray, B: NDArray, dt: float) -> tuple[NDArray, NDArray]:
+    """Discretizes continuous-time linear systems with a zero-order hold
+    on the inputs, like `LinearModel.discretize`, for batches of matrices
+    with shapes (..., n_x, n_x) and (..., n_x, n_u).
+    """
+    n_x, n_u = B.shape[-2:]
+    # exp([[A, B], [0, 0]] dt) = [[A_d, B_d], [0, I]]
+    M = np.zeros(A.shape[:-2] + (n_x + n_u, n_x + n_u))
+    M[..., :n_x, :n_x] = A * dt
+    M[..., :n_x, n_x:] = B * dt
+    M_d = expm(M)
+    return M_d[..., :n_x, :n_x], M_d[..., :n_x, n_x:]
+
+
+def solve_discrete_are_batched(
+    A: NDArray,
+    B: NDArray,
+    Q: NDArray,
+    R: NDArray,
+    *,
+    tol: float = 1e-12,
+    max_iterations: int = 100,
+) -> NDArray:
+    """Solves the discrete algebraic Riccati equations
+    `P = A^T P A - A^T P B (R + B^T P B)^{-1} B^T P A + Q` of a batch of systems.
+
+    Uses the structure-preserving doubling algorithm, whose iterations
+    are batched matrix products and solves and which converges
+    quadratically for stabilizable and detectable systems.
+
+    Args:
+        A: Dynamics matrices with shape (..., n_x, n_x).
+        B: Input matrices with shape (..., n_x, n_u).
+        Q: State cost matrix, or matrices broadcastable to A.
+        R: Input cost matrix, or matrices broadcastable to (..., n_u, n_u).
+        tol: Relative tolerance on the change of the solutions.
+        max_iterations: Maximum number of doubling iterations.
+
+    Returns:
+        Solutions P with shape (..., n_x, n_x).
+    """
+    n_x = A.shape[-1]
+    identity = np.eye(n_x)
+    G = B @ np.linalg.solve(R, np.swapaxes(B, -1, -2))
+    H = np.broadcast_to(Q, A.shape).copy()
+    for _ in range(max_iterations):
+        W = identity + G @ H
+        W_inv_A = np.linalg.solve(W, A)
+        W_inv_G = np.linalg.solve(W, G)
+        A_T = np.swapaxes(A, -1, -2)
+        H_next = H + A_T @ H @ W_inv_A
+        G = G + A @ W_inv_G @ A_T
+        A = A @ W_inv_A
+        change = np.linalg.norm(H_next - H, axis=(-2, -1))
+        H = H_next
+        if np.all(change <= tol * np.linalg.norm(H, axis=(-2, -1))):
+            return H
+    raise RuntimeError("Riccati iterations did not converge")
+
+
+def lqr_gains_batched(A: NDArray, B: NDArray, Q: NDArray, R: NDArray) -> NDArray:
+    """Computes the infinite-horizon LQR gains `K = (R + B^T P B)^{-1} B^T P A`
+    of a batch of discrete-time systems, such that `u = -K x`.
+
+    Returns:
+        Gains with shape (..., n_u, n_x).
+    """
+    P = solve_discrete_are_batched(A, B, Q, R)
+    B_T_P = np.swapaxes(B, -1, -2) @ P
+    return np.linalg.solve(R + B_T_P @ B, B_T_P @ A)
+
+
+class LQRGainTable:
+    """Table of LQR gains on a regular grid of physical parameters,
+    interpolated multilinearly in between.
+
+    :param parameter_names: names of the parameters, one per axis of the grid.
+    :param grid: values of the parameters along each axis, increasing.
+    :param gains: gains with shape (*grid_shape, n_u, n_x).
+    """
+
+    def __init__(
+        self,
+        parameter_names: tuple[str, ...],
+        grid: tuple[NDArray, ...],
+        gains: NDArray,
+    ) -> None:
+        self.parameter_names = tuple(parameter_names)
+        self.grid = tuple(np.asarray(axis, dtype=float) for axis in grid)
+        self.gains = gains
+        self._interpolator = RegularGridInterpolator(
+            self.grid, gains.reshape(gains.shape[: len(self.grid)] + (-1,))
+        )
+
+    def gain(self, **parameters: float) -> NDArray:
+        """Interpolates the gain for the given values of all parameters.
+
+        Raises:
+            ValueError: If a parameter is missing or outside of the grid.
+        """
+        missing = set(self.parameter_names) - set(parameters)
+        if missing:
+            raise ValueError(f"Missing parameters: {sorted(missing)}")
+        point = [parameters[name] for name in self.parameter_names]
+        return self._interpolator(point)[0].reshape(self.gains.shape[-2:])
+
+    def save(self, path: str | os.PathLike) -> None:
+        """Saves the table to a `.npz` file."""
+        np.savez_compressed(
+            path,
+            parameter_names=np.array(self.parameter_names),
+            gains=self.gains,
+            **{f"grid_{i}": axis for i, axis in enumerate(self.grid)},
+        )
+
+    @classmethod
+    def load(cls, path: str | os.PathLike) -> "LQRGainTable":
+        """Loads a table saved with :meth:`save`."""
+        with np.load(path) as data:
+            parameter_names = tuple(str(name) for name in data["parameter_names"])
+            grid = tuple(data[f"grid_{i}"] for i in range(len(parameter_names)))
+            return cls(parameter_names, grid, data["gains"])
+
+
+def build_inverted_pendulum_lqr_gain_table(
+    env: InvertedPendulumEnv,
+    Q: NDArray,
+    R: NDArray,
+    **parameter_grid: ArrayLike,
+) -> LQRGainTable:
+    """Computes the infinite-horizon LQR gains of the angle and angular velocity
+    of the inverted pendulum linearized with :func:`linearize_inverted_pendulum`
+    on a grid of physical parameters. Around the upright position,
+    their dynamics do not depend on the position and velocity of the cart.
+
+    The parameters that are not given keep the values of the environment,
+    whose gravity and time step are used as well.
+
+    Args:
+        env: Inverted pendulum environment.
+        Q: State cost matrix.
+        R: Input cost matrix.
+        parameter_grid: Increasing values of some of the parameters
+            "masspole", "masscart" and "length".
+
+    Returns:
+        Table of gains over the grid of the given parameters.
+
+    Example:
+        >>> table = build_inverted_pendulum_lqr_gain_table(  # doctest: +SKIP
+        ...     env, Q, R, masspole=np.linspace(0.05, 0.5, 10), length=[0.5, 1.0]
+        ... )
+    """
+    unknown = set(parameter_grid) - set(PENDULUM_PARAMETERS)
+    if unknown:
+        raise ValueError(f"Unknown parameters: {sorted(unknown)}")
+    names = tuple(name for name in PENDULUM_PARAMETERS if name in parameter_grid)
+    grid = tuple(np.asarray(parameter_grid[name], dtype=float) for name in names)
+    mesh = dict(zip(names, np.meshgrid(*grid, indexing="ij")))
+    values = {name: mesh.get(name, getattr(env, name)) for name in PENDULUM_PARAMETERS}
+    A, B = linearize_inverted_pendulum(
+        env.gravity, values["masspole"], values["masscart"], values["length"]
+    )
+    A = A[..., ANGLE_INDICES, :][..., ANGLE_INDICES]
+    B = B[..., ANGLE_INDICES, :]
+    A, B = discretize_zoh(A, B, env.dt)
+    return LQRGainTable(names, grid, lqr_gains_batched(A, B, Q, R))
+
+
+class GainScheduledLQRController(LQRController):
+    """LQR controller whose gain is interpolated from a table
+    for the current values of the physical parameters.
+
+    The gain is only interpolated when the parameters change,
+    so that computing the inputs is a single matrix product.
+
+    :param table: table of gains.
+    :param setpoint: setpoint of the states.
+    :param observation_indices: indices of the states in the measurements,
+        e.g. `[2, 3]` for the gains of
+        :func:`build_inverted_pendulum_lqr_gain_table` and the full
+        observations of the environment. Defaults to all of the measurements.
+    :param parameters: initial values of the parameters of the table.
+    """
+
+    def __init__(
+        self,
+        table: LQRGainTable,
+        setpoint: NDArray,
+        observation_indices: Sequence[int] | None = None,
+        **parameters: float,
+    ) -> None:
+        self.table = table
+        super().__init__(
+            table.gain(**parameters), setpoint, observation_indices=observation_indices
+        )
+        self.parameters = parameters
+
+    def set_parameters(self, **parameters: float) -> None:
+        """Updates the values of some or all of the parameters
+        and interpolates the gain for them."""
+        parameters = {**self.parameters, **parameters}
+        self.K = self.table.gain(**parameters)
+        self.parameters = parameters
@@ -0,0 +1,196 @@
+import hashlib
+import os
+import pickle
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import casadi
+import do_mpc
+import numpy as np
+from do_mpc.model import Model
+from numpy.typing import ArrayLike, NDArray
+
+from training_ml_control._files import atomic_write
+from training_ml_control.models import build_dmd_model, build_sindy_model
+
+__all__ = ["IdentifiedModel", "model_store_key", "fit_identified_model"]
+
+
+@dataclass
+class IdentifiedModel:
+    """Model identified from data, e.g. by SINDy or a Koopman model,
+    that can be stored and loaded without the estimator that identified it.
+
+    :param key: key of the model in the store, see :func:`model_store_key`.
+    :param model_type: "continuous" or "discrete".
+    :param state_names: names of the states of the do-mpc model.
+    :param input_names: names of the inputs of the do-mpc model.
+    :param feature_names: names of the features of the estimator.
+    :param coefficients: fitted coefficients of the estimator by name,
+        "coefficients" for SINDy and "A", "B", "C" and "ur" for Koopman models.
+    :param rhs: right-hand side of the model as a function of the states
+        and the inputs.
+    """
+
+    key: str
+    model_type: str
+    state_names: list[str]
+    input_names: list[str]
+    feature_names: list[str]
+    coefficients: dict[str, NDArray]
+    rhs: casadi.Function
+
+    def build_model(self) -> Model:
+        """Creates the do-mpc model, whose right-hand side is a call of `rhs`."""
+        model = Model(self.model_type)
+        x = casadi.vertcat(
+            *[
+                model.set_variable(var_type="_x", var_name=name)
+                for name in self.state_names
+            ]
+        )
+        u = casadi.vertcat(
+            *[
+                model.set_variable(var_type="_u", var_name=name)
+                for name in self.input_names
+            ]
+        )
+        rhs = self.rhs(x, u)
+        for i, name in enumerate(self.state_names):
+            model.set_rhs(name, rhs[i])
+        model.setup()
+        return model
+
+
+def model_store_key(estimator, x: ArrayLike, u: ArrayLike, t: ArrayLike) -> str:
+    """Computes a hash of everything that determines the model identified
+    by fitting `estimator` to the data.
+
+    The hash covers the class and hyperparameters of the estimator,
+    the training data, as well as the versions of the estimator's package,
+    CasADi and do-mpc. Hyperparameters without a stable representation,
+    e.g. custom functions, change the hash from one run to the next.
+
+    Args:
+        estimator: Unfitted SINDy or Koopman model.
+        x: States, or list of trajectories of states.
+        u: Inputs, or list of trajectories of inputs.
+        t: Time step or times of the samples.
+
+    Returns:
+        Hexadecimal digest.
+    """
+    estimator_type = type(estimator)
+    package = sys.modules[estimator_type.__module__.partition(".")[0]]
+    hasher = hashlib.sha256()
+    for part in [
+        casadi.__version__,
+        do_mpc.__version__,
+        getattr(package, "__version__", ""),
+        f"{estimator_type.__module__}.{estimator_type.__qualname__}",
+    ]:
+        hasher.update(part.encode())
+    for name, value in sorted(estimator.get_params(deep=True).items()):
+        hasher.update(name.encode())
+        if hasattr(value, "get_params"):
+            # Its hyperparameters are hashed on their own, as "name__parameter"
+            value_type = type(value)
+            hasher.update(f"{value_type.__module__}.{value_type.__qualname__}".encode())
+        else:
+            _update_hash(hasher, value)
+    for data in (x, u, t):
+        _update_hash(hasher, data)
+    return hasher.hexdigest()
+
+
+def _update_hash(hasher: "hashlib._Hash", value: Any) -> None:
+    if isinstance(value, (list, tuple)) and any(
+        isinstance(item, np.ndarray) for item in value
+    ):
+        hasher.update(f"{type(value).__name__}{len(value)}".encode())
+        for item in value:
+            _update_hash(hasher, item)
+    elif isinstance(value, np.ndarray):
+        array = np.ascontiguousarray(value)
+        hasher.update(f"{array.dtype}{array.shape}".encode())
+        hasher.update(array.tobytes())
+    else:
+        hasher.update(repr(value).encode())
+
+
+def fit_identified_model(
+    estimator,
+    x: ArrayLike,
+    u: ArrayLike,
+    t: ArrayLike,
+    store_dir: str | os.PathLike | None = None,
+) -> IdentifiedModel:
+    """Fits a SINDy or Koopman model to the data and builds its do-mpc model
+    with :func:`training_ml_control.models.build_sindy_model` or
+    :func:`training_ml_control.models.build_dmd_model`, reusing the model
+    stored in `store_dir` by a previous call with the same estimator and data.
+
+    On a store miss, the fitted coefficients, the feature names and the
+    serialized right-hand side are written to `store_dir` under the key
+    returned by :func:`model_store_key`. On a store hit they are loaded back
+    instead, without fitting the estimator, which is then left unfitted.
+
+    Args:
+        estimator: Unfitted SINDy or Koopman model.
+        x: States, or list of trajectories of states.
+        u: Inputs, or list of trajectories of inputs.
+        t: Time step or times of the samples, `t` of `SINDy.fit`
+            or `dt` of `Koopman.fit`.
+        store_dir: Directory of the store. If None, the model is
+            fitted and built without storing it.
+
+    Returns:
+        Identified model, whose `build_model` method creates the do-mpc model.
+
+    Example:
+        >>> identified = fit_identified_model(  # doctest: +SKIP
+        ...     ps.SINDy(feature_library=ps.PolynomialLibrary(degree=3)),
+        ...     X_train, U_train, dt, store_dir="models",
+        ... )
+        >>> model = identified.build_model()  # doctest: +SKIP
+    """
+    key = model_store_key(estimator, x, u, t)
+    path = None if store_dir is None else Path(store_dir) / f"model-{key}.pkl"
+    if path is not None and path.is_file():
+        with path.open("rb") as file:
+            entries = pickle.load(file)
+        entries["rhs"] = casadi.Function.deserialize(entries["rhs"])
+        return IdentifiedModel(key=key, **entries)
+
+    # Koopman models of pykoopman, which is not imported to check the type
+    if hasattr(estimator, "observables"):
+        estimator.fit(x, u=u, dt=t)
+        model = build_dmd_model(estimator)
+        coefficients = {
+            name: np.asarray(getattr(estimator, name)) for name in ("A", "B", "C", "ur")
+        }
+    else:
+        estimator.fit(x, u=u, t=t)
+        model = build_sindy_model(estimator)
+        coefficients = {"coefficients": estimator.coefficients()}
+    identified = IdentifiedModel(
+        key=key,
+        model_type=model.model_type,
+        state_names=[name for name in model.x.keys() if name != "default"],
+        input_names=[name for name in model.u.keys() if name != "default"],
+        feature_names=list(estimator.get_feature_names()),
+        coefficients=coefficients,
+        rhs=casadi.Function("rhs", [model.x.cat, model.u.cat], [model._rhs]),
+    )
+
+    if path is not None:
+        entries = {
+            name: value for name, value in vars(identified).items() if name != "key"
+        }
+        entries["rhs"] = identified.rhs.serialize()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with atomic_write(path) as file:
+            pickle.dump(entries, file)
+    return identified
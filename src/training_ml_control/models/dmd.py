@@ -1,60 +1,124 @@
-import re
-
 import numpy as np
-from casadi import constpow
+from casadi import DM, SX, cos, mtimes, sin, sparsify, vertcat
 from do_mpc.model import Model
+from numpy.typing import NDArray
+
+from .sindy import _polynomial_features
 
 __all__ = ["build_dmd_model"]
 
+SUPPORTED_OBSERVABLES = (
+    "Identity",
+    "Polynomial",
+    "RandomFourierFeatures",
+    "TimeDelay",
+)
+
 
 def build_dmd_model(dmd_model) -> Model:
-    model = Model("continuous")
-
-    variable_regex = re.compile(r"x\d+")
-    feature_regex = re.compile(r"([xu]\d+)(\^(\d+))?")
-
-    # Declare model state variables
-    variables = dict()
-    for feature_name in dmd_model.get_feature_names():
-        for match in re.finditer(variable_regex, feature_name):
-            variable_name = match.group()
-            if variable_name in variables:
-                continue
-            variables[variable_name] = model.set_variable(
-                var_type="_x", var_name=variable_name
+    """Builds a discrete-time do-mpc model from a Koopman model of pykoopman
+    fitted with inputs, e.g. with the EDMDc or DMDc regressor.
+
+    The states of the model are "x0", "x1", ... and its inputs "u0", "u1", ...
+    Like `Koopman.simulate`, the next states are `C (A phi(x) + B u)`, where
+    `phi(x)` are the observables of the states reduced by the regressor.
+    The matrices are multiplied beforehand, so that the observables are only
+    multiplied by `C A` and the inputs by `C B`, and zero entries are skipped.
+
+    The supported observables are `Identity`, `Polynomial`,
+    `RandomFourierFeatures` and `TimeDelay`. With time-delay observables,
+    the past states are additional states of the model, named "x0_delay1",
+    "x1_delay1", ... for the previous step and so on.
+
+    Args:
+        dmd_model: Fitted Koopman model.
+
+    Returns:
+        Model with the states, past states and inputs of the Koopman model.
+    """
+    C = dmd_model.C
+    return _build_observables_model(
+        dmd_model.observables,
+        dmd_model.n_input_features_,
+        C @ dmd_model.A @ dmd_model.ur.T,
+        C @ dmd_model.B,
+    )
+
+
+def _build_observables_model(
+    observables, n_states: int, state_matrix: NDArray, input_matrix: NDArray
+) -> Model:
+    """Builds the discrete-time do-mpc model whose next states are
+    `state_matrix phi(x) + input_matrix u`, see :func:`build_dmd_model`.
+
+    Args:
+        observables: Fitted observables `phi` of pykoopman.
+        n_states: Number of states.
+        state_matrix: Matrix applied to the observables, with shape
+            (n_states, n_observables).
+        input_matrix: Matrix applied to the inputs, with shape (n_states, n_inputs).
+
+    Returns:
+        Model with the states, past states and inputs.
+    """
+    observables_name = type(observables).__name__
+    if observables_name not in SUPPORTED_OBSERVABLES:
+        raise ValueError(
+            f"Unsupported observables {observables_name}, "
+            f"expected one of {SUPPORTED_OBSERVABLES}"
+        )
+
+    model = Model("discrete")
+
+    # Declare model variables
+    states = [
+        model.set_variable(var_type="_x", var_name=f"x{i}") for i in range(n_states)
+    ]
+    x = vertcat(*states)
+    if observables_name == "TimeDelay":
+        n_past = observables.delay * observables.n_delays
+        history = [x]
+        for k in range(1, n_past + 1):
+            history.append(
+                vertcat(
+                    *[
+                        model.set_variable(var_type="_x", var_name=f"x{i}_delay{k}")
+                        for i in range(len(states))
+                    ]
+                )
             )
+    inputs = vertcat(
+        *[
+            model.set_variable(var_type="_u", var_name=f"u{i}")
+            for i in range(input_matrix.shape[1])
+        ]
+    )
+
+    if observables_name == "Identity":
+        features = x
+    elif observables_name == "Polynomial":
+        features = vertcat(*_polynomial_features(states, observables.powers_))
+    elif observables_name == "RandomFourierFeatures":
+        # The products are shared by the cosine and sine features
+        wx = mtimes(DM(observables.w.T), x)
+        features = vertcat(cos(wx), sin(wx)) / np.sqrt(observables.D)
+        if observables.include_state:
+            features = vertcat(x, features)
+    else:
+        features = vertcat(
+            *[history[k * observables.delay] for k in range(observables.n_delays + 1)]
+        )
+
+    next_states = mtimes(sparsify(DM(state_matrix)), features) + mtimes(
+        sparsify(DM(input_matrix)), inputs
+    )
 
-    # Declare model input variables
-    inputs = []
-    for i in range(dmd_model.B.shape[1]):
-        variable_name = f"u{i}"
-        inputs.append(model.set_variable(var_type="_u", var_name=variable_name))
-
-    inputs = np.asarray(inputs)
-
-    features = []
-    for feature in dmd_model.get_feature_names():
-        if feature == "1":
-            features.append(1.0)
-            continue
-
-        matches = feature_regex.findall(feature)
-        feature_expression = 1.0
-        for match in matches:
-            variable_name, _, power = match
-            if not power:
-                feature_expression *= variables[variable_name]
-            else:
-                feature_expression *= constpow(variables[variable_name], int(power))
-        features.append(feature_expression)
-
-    features = np.asarray(features)
-
-    equations = dmd_model.A @ features + dmd_model.B @ inputs
-    equations = dmd_model.C @ equations
-
-    for i, equation in enumerate(equations):
-        model.set_rhs(f"x{i}", equation)
+    for i in range(len(states)):
+        model.set_rhs(f"x{i}", next_states[i])
+    if observables_name == "TimeDelay":
+        for k in range(1, n_past + 1):
+            for i in range(len(states)):
+                model.set_rhs(f"x{i}_delay{k}", history[k - 1][i])
 
     model.setup()
     return model
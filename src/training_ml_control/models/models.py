@@ -1,7 +1,9 @@
 import casadi
 import numpy as np
 from do_mpc.model import LinearModel, Model
+from numpy.typing import NDArray
 
+from training_ml_control.dynamics import build_inverted_pendulum_rhs
 from training_ml_control.environments.cart import CartEnv
 from training_ml_control.environments.inverted_pendulum import InvertedPendulumEnv
 
@@ -9,6 +11,7 @@ __all__ = [
     "build_cart_model",
     "build_inverted_pendulum_linear_model",
     "build_inverted_pendulum_nonlinear_model",
+    "limits_to_arrays",
 ]
 
 
@@ -89,26 +92,15 @@ def build_inverted_pendulum_nonlinear_model(
         # Uncertain parameters
         m_p = model.set_variable("_p", "m_p")
 
-    total_mass = m_c + m_p
-    half_length = l / 2
-    polemass_length = m_p * half_length
+    # Use the same right-hand side as the environment
+    rhs = build_inverted_pendulum_rhs(g)
+    state = casadi.vertcat(pos, dpos, theta, dtheta)
+    state_dot = rhs(state, force, casadi.vertcat(m_p, m_c, l))
 
-    numerator = (total_mass) * g * casadi.sin(theta) - casadi.cos(theta) * (
-        force + m_p * l * dtheta**2 * casadi.sin(theta)
-    )
-    denominator = (4 / 3) * (total_mass) * l - m_p * l * casadi.cos(theta) ** 2
-    ddtheta = numerator / denominator
-
-    numerator = m_c * g * casadi.cos(theta) * casadi.sin(theta) - (4 / 3) * (
-        force + m_c * l * dtheta**2 * casadi.sin(theta)
-    )
-    denominator = m_c * casadi.cos(theta) ** 2 - (4 / 3) * (total_mass)
-    ddpos = numerator / denominator
-
-    model.set_rhs("position", dpos)
-    model.set_rhs("velocity", ddpos)
-    model.set_rhs("theta", dtheta)
-    model.set_rhs("dtheta", ddtheta)
+    model.set_rhs("position", state_dot[0])
+    model.set_rhs("velocity", state_dot[1])
+    model.set_rhs("theta", state_dot[2])
+    model.set_rhs("dtheta", state_dot[3])
 
     # Inertia
     J = (m_p * l**2) / 3
@@ -129,3 +121,23 @@ def build_inverted_pendulum_nonlinear_model(
     model.set_expression("E_potential", E_pot)
     model.setup()
     return model
+
+
+def limits_to_arrays(
+    variables, limits: dict[str, NDArray], n: int
+) -> tuple[NDArray, NDArray]:
+    """Converts limits of model variables given by name to arrays.
+
+    Args:
+        variables: Variables of a do-mpc model, e.g. `model._x` or `model._u`.
+        limits: Lower and upper limits of some of the variables, by name.
+        n: Number of variables.
+
+    Returns:
+        Lower and upper limits of all variables, infinite for those without limits.
+    """
+    lower, upper = np.full(n, -np.inf), np.full(n, np.inf)
+    for name, value in limits.items():
+        lower[variables.f[name]] = value[0]
+        upper[variables.f[name]] = value[1]
+    return lower, upper
@@ -1,49 +1,138 @@
+import logging
 import re
 
 import numpy as np
-from casadi import constpow
+from casadi import SX, cse, n_nodes, vertcat
 from do_mpc.model import Model
+from numpy.typing import NDArray
 
 __all__ = ["build_sindy_model"]
 
+logger = logging.getLogger(__name__)
+
 
 def build_sindy_model(
     sindy_model,
 ) -> Model:
+    """Builds a continuous-time do-mpc model from a SINDy model
+    with a polynomial feature library.
+
+    The right-hand side is kept compact, since its size determines
+    the time it takes to set up and solve an MPC's optimization problem:
+
+    - Terms whose coefficient is zero, e.g. those removed by sparse regression,
+      are skipped.
+    - Each monomial is the product of a lower-degree monomial and a variable,
+      so that monomials share their common factors and are only built once.
+    - Common subexpressions of the equations are eliminated.
+
+    The number of nodes of the right-hand side before and after the elimination
+    is logged at the INFO level.
+
+    Args:
+        sindy_model: Fitted SINDy model, with states named "x0", "x1", ...
+            and inputs named "u0", "u1", ...
+
+    Returns:
+        Model with the states and inputs of the SINDy model.
+    """
+    powers = _feature_powers(sindy_model.feature_library, sindy_model.feature_names)
+    return _build_polynomial_model(
+        sindy_model.feature_names, powers, sindy_model.coefficients()
+    )
+
+
+def _build_polynomial_model(
+    variable_names: list[str], powers: NDArray, coefficients: NDArray
+) -> Model:
+    """Builds a continuous-time do-mpc model whose right-hand side
+    is a linear combination of monomials of its states and inputs,
+    as described in :func:`build_sindy_model`.
+
+    Args:
+        variable_names: Names of the states, "x0", "x1", ...
+            followed by those of the inputs, "u0", "u1", ...
+        powers: Powers of the variables in each monomial,
+            with shape (n_monomials, n_variables).
+        coefficients: Coefficients of the monomials in the time derivative
+            of each state, with shape (n_states, n_monomials).
+
+    Returns:
+        Model with the given states and inputs.
+    """
     model = Model("continuous")
 
     # Declare model variables
-    variables = dict()
-    for variable_name in sindy_model.feature_names:
+    variables = []
+    for variable_name in variable_names:
         if variable_name.startswith("x"):
             variable = model.set_variable(var_type="_x", var_name=variable_name)
         else:
             variable = model.set_variable(var_type="_u", var_name=variable_name)
-        variables[variable_name] = variable
+        variables.append(variable)
 
-    feature_regex = re.compile(r"([xu]\d+)(\^(\d+))?")
+    features = _polynomial_features(variables, powers)
+    equations = []
+    for row in coefficients:
+        equation = SX(0)
+        for coefficient, feature in zip(row, features):
+            if coefficient != 0:
+                equation += float(coefficient) * feature
+        equations.append(equation)
 
-    features = []
-    for feature in sindy_model.get_feature_names():
-        if feature == "1":
-            features.append(1.0)
-            continue
+    equations = vertcat(*equations)
+    n_nodes_before = n_nodes(equations)
+    equations = cse(equations)
+    logger.info(
+        "Right-hand side with %d nodes, %d after common subexpression elimination",
+        n_nodes_before,
+        n_nodes(equations),
+    )
+    for i in range(equations.shape[0]):
+        model.set_rhs(f"x{i}", equations[i])
 
-        matches = feature_regex.findall(feature)
-        feature_expression = 1.0
-        for match in matches:
-            variable_name, _, power = match
-            if not power:
-                feature_expression *= variables[variable_name]
-            else:
-                feature_expression *= constpow(variables[variable_name], int(power))
-        features.append(feature_expression)
+    model.setup()
+    return model
 
-    features = np.asarray(features)
-    equations = sindy_model.coefficients() @ features
 
-    for i, equation in enumerate(equations):
-        model.set_rhs(f"x{i}", equation)
+def _polynomial_features(variables: list[SX], powers: NDArray) -> list[SX]:
+    """Monomials of the variables with the given powers, each built as the product
+    of a lower-degree monomial and a variable, so that they share common factors.
 
-    model.setup()
-    return model
+    Args:
+        variables: Scalar variables.
+        powers: Powers of the variables in each monomial,
+            with shape (n_monomials, n_variables).
+
+    Returns:
+        Monomials, in the order of `powers`.
+    """
+    monomials = {(0,) * len(variables): SX(1)}
+
+    def monomial(powers: tuple[int, ...]) -> SX:
+        if powers not in monomials:
+            i = max(i for i, power in enumerate(powers) if power > 0)
+            lower = powers[:i] + (powers[i] - 1,) + powers[i + 1 :]
+            monomials[powers] = monomial(lower) * variables[i]
+        return monomials[powers]
+
+    return [monomial(tuple(int(power) for power in row)) for row in powers]
+
+
+def _feature_powers(library, variable_names: list[str]) -> NDArray:
+    """Powers of the variables in each feature of a fitted feature library,
+    with shape (n_features, n_variables)."""
+    if hasattr(library, "powers_"):
+        # Fitted PolynomialLibrary
+        return library.powers_
+
+    feature_regex = re.compile(r"([xu]\d+)(\^(\d+))?")
+    variable_names = list(variable_names)
+    feature_names = library.get_feature_names(variable_names)
+    powers = np.zeros((len(feature_names), len(variable_names)), dtype=int)
+    for i, feature in enumerate(feature_names):
+        if feature == "1":
+            continue
+        for variable_name, _, power in feature_regex.findall(feature):
+            powers[i, variable_names.index(variable_name)] += int(power or 1)
+    return powers
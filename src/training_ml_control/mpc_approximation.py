@@ -0,0 +1,294 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Callable
+
+import numpy as np
+from do_mpc.controller import MPC
+from numpy.typing import NDArray
+from scipy.stats import qmc
+from sklearn.base import RegressorMixin
+from sklearn.neural_network import MLPRegressor
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+
+from training_ml_control._workers import get_worker_context, silence_stdout
+
+__all__ = [
+    "MPCDataset",
+    "PolicyApproximationReport",
+    "ApproximateMPCController",
+    "generate_mpc_dataset",
+    "approximate_mpc_policy",
+]
+
+
+@dataclass
+class MPCDataset:
+    states: NDArray
+    inputs: NDArray
+    success: NDArray
+    solve_times: NDArray
+
+
+@dataclass
+class PolicyApproximationReport:
+    n_train: int
+    n_test: int
+    n_failed: int
+    rmse: float
+    max_error: float
+    mpc_latency: float
+    approximation_latency: float
+
+    @property
+    def speedup(self) -> float:
+        return self.mpc_latency / self.approximation_latency
+
+
+class ApproximateMPCController:
+    """Controller that evaluates a regressor fitted to the inputs computed
+    by an MPC controller, clipped to the limits of the inputs.
+
+    :param regressor: fitted regressor mapping states to inputs.
+    :param u_lower: lower limits of the inputs.
+    :param u_upper: upper limits of the inputs.
+    """
+
+    def __init__(
+        self, regressor: RegressorMixin, u_lower: NDArray, u_upper: NDArray
+    ) -> None:
+        self.regressor = regressor
+        self.u_lower = u_lower
+        self.u_upper = u_upper
+
+    def act(self, measurement: NDArray) -> NDArray:
+        return self.act_batch(np.reshape(measurement, (1, -1)))[0]
+
+    def act_batch(self, measurements: NDArray) -> NDArray:
+        """Computes the inputs for a batch of measurements with shape (N, n_x)."""
+        u = self.regressor.predict(measurements).reshape(len(measurements), -1)
+        return np.clip(u, self.u_lower, self.u_upper)
+
+
+# MPC controller of each worker process, created once by the initializer
+_worker_mpc: MPC | None = None
+
+
+def _initialize_worker(controller_factory: Callable[[], MPC]) -> None:
+    global _worker_mpc
+    silence_stdout()
+    _worker_mpc = controller_factory()
+
+
+def _solve(mpc: MPC, x0: NDArray) -> tuple[NDArray, bool, float]:
+    x0 = x0.reshape(-1, 1)
+    # Solve each state from the same initial guess, independently of the others,
+    # as the previous input is penalized by the input rate penalty
+    mpc.reset_history()
+    mpc.x0 = x0
+    mpc.u0 = np.zeros((mpc.model.n_u, 1))
+    mpc.set_initial_guess()
+    start = time.perf_counter()
+    u0 = mpc.make_step(x0)
+    solve_time = time.perf_counter() - start
+    return u0.ravel(), bool(mpc.solver_stats["success"]), solve_time
+
+
+def _solve_in_worker(x0: NDArray) -> tuple[NDArray, bool, float]:
+    return _solve(_worker_mpc, x0)
+
+
+def _limits(mpc: MPC, var_type: str) -> tuple[NDArray, NDArray]:
+    """Lower and upper limits of the states ("_x") or inputs ("_u")
+    of an MPC controller, flattened in the order of the model's variables."""
+    variables = mpc.model.x if var_type == "_x" else mpc.model.u
+    names = [name for name in variables.keys() if name != "default"]
+    return tuple(
+        np.concatenate(
+            [np.ravel(mpc.bounds[bound, var_type, name].full()) for name in names]
+        )
+        for bound in ("lower", "upper")
+    )
+
+
+def _state_limits(
+    mpc: MPC, sample_limits: dict[str, NDArray] | None
+) -> tuple[NDArray, NDArray]:
+    lower, upper = _limits(mpc, "_x")
+    for name, value in (sample_limits or {}).items():
+        lower[mpc.model._x.f[name]] = value[0]
+        upper[mpc.model._x.f[name]] = value[1]
+    if not (np.isfinite(lower).all() and np.isfinite(upper).all()):
+        raise ValueError(
+            "All states need limits to be sampled, "
+            "either in the MPC's x_limits or in sample_limits"
+        )
+    return lower, upper
+
+
+def generate_mpc_dataset(
+    controller_factory: Callable[[], MPC],
+    n_samples: int,
+    sample_limits: dict[str, NDArray] | None = None,
+    *,
+    n_workers: int | None = None,
+    seed: int = 16,
+) -> MPCDataset:
+    """Samples states within the state limits of an MPC controller
+    and computes the MPC's inputs for them in parallel.
+
+    The states are drawn by Latin hypercube sampling within the limits of the
+    states of the MPC controller, which can be overridden, or completed for
+    the states without limits, with `sample_limits`.
+    Each state is solved from the same cold start in one of `n_workers`
+    worker processes, each of which creates its own controller by calling
+    `controller_factory` once. Combined with the `cache_dir` of
+    :func:`training_ml_control.control.build_mpc_controller`, only
+    the first of them has to build the optimization problem.
+
+    On platforms that support it, the workers are forked, so that
+    `controller_factory` can be any callable, e.g. a closure over a model.
+    Otherwise it has to be picklable.
+
+    Args:
+        controller_factory: Function that creates the MPC controller.
+        n_samples: Number of states.
+        sample_limits: Lower and upper limits of the sampled states.
+        n_workers: Number of worker processes, defaults to the number of CPUs.
+            If 0, the states are solved in the current process.
+        seed: Seed of the sampling.
+
+    Returns:
+        Sampled states, inputs, success of the solver and solve times.
+    """
+    return _generate_mpc_dataset(
+        controller_factory(),
+        controller_factory,
+        n_samples,
+        sample_limits,
+        n_workers,
+        seed,
+    )
+
+
+def _generate_mpc_dataset(
+    mpc: MPC,
+    controller_factory: Callable[[], MPC],
+    n_samples: int,
+    sample_limits: dict[str, NDArray] | None,
+    n_workers: int | None,
+    seed: int,
+) -> MPCDataset:
+    lower, upper = _state_limits(mpc, sample_limits)
+    sampler = qmc.LatinHypercube(d=len(lower), seed=seed)
+    states = qmc.scale(sampler.random(n_samples), lower, upper)
+
+    if n_workers == 0:
+        results = [_solve(mpc, x0) for x0 in states]
+    else:
+        n_workers = n_workers or os.cpu_count()
+        context = get_worker_context()
+        with ProcessPoolExecutor(
+            max_workers=n_workers,
+            mp_context=context,
+            initializer=_initialize_worker,
+            initargs=(controller_factory,),
+        ) as executor:
+            chunksize = max(1, n_samples // (4 * n_workers))
+            results = list(executor.map(_solve_in_worker, states, chunksize=chunksize))
+
+    inputs, success, solve_times = zip(*results)
+    return MPCDataset(
+        states=states,
+        inputs=np.stack(inputs),
+        success=np.array(success),
+        solve_times=np.array(solve_times),
+    )
+
+
+def approximate_mpc_policy(
+    controller_factory: Callable[[], MPC],
+    n_samples: int,
+    sample_limits: dict[str, NDArray] | None = None,
+    *,
+    regressor: RegressorMixin | None = None,
+    test_size: float = 0.2,
+    n_workers: int | None = None,
+    seed: int = 16,
+) -> tuple[ApproximateMPCController, PolicyApproximationReport]:
+    """Fits a regressor to the inputs of an MPC controller, to replace it
+    by a controller that is much faster to evaluate.
+
+    The data is generated with :func:`generate_mpc_dataset` and states for which
+    the solver failed are discarded. The regressor is fitted on part of the
+    remaining states and evaluated on the others, and its outputs are clipped
+    to the input limits of the MPC controller.
+
+    Args:
+        controller_factory: Function that creates the MPC controller.
+        n_samples: Number of sampled states, for training and test.
+        sample_limits: Lower and upper limits of the sampled states.
+        regressor: Regressor from scikit-learn, defaults to a multi-layer
+            perceptron on standardized states.
+        test_size: Fraction of the states used to evaluate the approximation,
+            which should contain at least one state.
+        n_workers: Number of worker processes used to solve the MPC.
+        seed: Seed of the sampling, of the split and of the default regressor.
+
+    Returns:
+        Approximate controller and report with the approximation error
+        on the test states, as well as the median time it takes to compute
+        an input with the MPC and with the approximation.
+
+    Raises:
+        ValueError: If the solver failed for all states or if the training
+            or the test states are empty.
+    """
+    mpc = controller_factory()
+    dataset = _generate_mpc_dataset(
+        mpc, controller_factory, n_samples, sample_limits, n_workers, seed
+    )
+    u_lower, u_upper = _limits(mpc, "_u")
+
+    states = dataset.states[dataset.success]
+    inputs = dataset.inputs[dataset.success]
+    if len(states) == 0:
+        raise ValueError(f"The MPC solver failed for all {n_samples} sampled states")
+    permutation = np.random.default_rng(seed).permutation(len(states))
+    n_test = int(round(test_size * len(states)))
+    if not 1 <= n_test < len(states):
+        raise ValueError(
+            f"Splitting the {len(states)} successfully solved states with "
+            f"test_size={test_size} should leave at least one state "
+            "for training and one for test"
+        )
+    test, train = permutation[:n_test], permutation[n_test:]
+
+    if regressor is None:
+        regressor = make_pipeline(
+            StandardScaler(),
+            MLPRegressor(hidden_layer_sizes=(64, 64), max_iter=2000, random_state=seed),
+        )
+    # Single outputs are fitted as 1-D targets, as expected by most regressors
+    targets = inputs[train] if inputs.shape[1] > 1 else inputs[train, 0]
+    regressor.fit(states[train], targets)
+    controller = ApproximateMPCController(regressor, u_lower, u_upper)
+
+    errors = controller.act_batch(states[test]) - inputs[test]
+    latencies = []
+    for x in states[test]:
+        start = time.perf_counter()
+        controller.act(x)
+        latencies.append(time.perf_counter() - start)
+    report = PolicyApproximationReport(
+        n_train=len(train),
+        n_test=n_test,
+        n_failed=int(np.sum(~dataset.success)),
+        rmse=float(np.sqrt(np.mean(errors**2))),
+        max_error=float(np.max(np.abs(errors))),
+        mpc_latency=float(np.median(dataset.solve_times)),
+        approximation_latency=float(np.median(latencies)),
+    )
+    return controller, report
@@ -0,0 +1,301 @@
+import dataclasses
+import hashlib
+import os
+import pickle
+import subprocess
+import tempfile
+from pathlib import Path
+from typing import Any
+
+import casadi
+import do_mpc
+from casadi.tools import structure3
+from do_mpc.controller import MPC
+
+from training_ml_control._files import atomic_write
+
+__all__ = ["mpc_cache_key", "setup_mpc", "is_qp", "compile_mpc_solver"]
+
+# Options of the QP solvers that make them as accurate as IPOPT and record
+# the solver time reported in `solver_stats`, like IPOPT does by default
+_QP_SOLVER_OPTIONS = {
+    "osqp": {"osqp": {"verbose": 0, "polish": True, "eps_abs": 1e-6, "eps_rel": 1e-6}},
+    "qpoases": {"printLevel": "none"},
+}
+
+# Operations whose derivatives are piecewise constant, e.g. the absolute value
+# to which `casadi.norm_2` of a scalar simplifies. Expressions with them
+# can pass `casadi.is_quadratic` without being quadratic.
+_NONSMOOTH_OPERATIONS = {
+    casadi.OP_FABS,
+    casadi.OP_SIGN,
+    casadi.OP_COPYSIGN,
+    casadi.OP_FMIN,
+    casadi.OP_FMAX,
+    casadi.OP_FLOOR,
+    casadi.OP_CEIL,
+    casadi.OP_FMOD,
+    casadi.OP_REMAINDER,
+    casadi.OP_IF_ELSE_ZERO,
+    casadi.OP_LT,
+    casadi.OP_LE,
+    casadi.OP_EQ,
+    casadi.OP_NE,
+    casadi.OP_NOT,
+    casadi.OP_AND,
+    casadi.OP_OR,
+}
+
+# Attributes created by MPC.setup that are only needed to build the NLP
+# or that cannot be pickled. They are not stored in the cache.
+_UNCACHED_ATTRIBUTES = {
+    "nlp",
+    "_nlp_obj",
+    "_nlp_cons",
+    "slack_cost",
+    "opt_x_unscaled",
+    "tvp_fun",
+    "p_fun",
+    "data",
+    "flags",
+}
+
+
+def mpc_cache_key(mpc: MPC) -> str:
+    """Computes a hash of everything that determines the optimization problem
+    created by `mpc.setup()`.
+
+    The hash covers the model equations, the objective, the nonlinear
+    constraints, the settings (horizon, discretization, solver options, ...),
+    the bounds and scaling of the variables, the number of uncertain
+    parameter combinations, as well as the versions of CasADi and do-mpc.
+
+    Args:
+        mpc: MPC controller that was configured but not yet set up.
+
+    Returns:
+        Hexadecimal digest.
+    """
+    model = mpc.model
+    nl_cons_function = casadi.Function(
+        "nl_cons",
+        [model._x, model._u, model._z, model._tvp, model._p],
+        [nl_cons["expr"] for nl_cons in mpc.nl_cons_list],
+    )
+    parts = [
+        casadi.__version__,
+        do_mpc.__version__,
+        model._rhs_fun.serialize(),
+        model._alg_fun.serialize(),
+        model._aux_expression_fun.serialize(),
+        mpc.mterm_fun.serialize(),
+        mpc.lterm_fun.serialize(),
+        mpc.rterm_fun.serialize() if hasattr(mpc, "rterm_fun") else "",
+        nl_cons_function.serialize(),
+        repr([(c["expr_name"], c["ub"]) for c in mpc.nl_cons_list]),
+        repr(mpc.slack_vars_list),
+        repr(sorted(dataclasses.asdict(mpc.settings).items())),
+        repr(getattr(mpc, "n_combinations", 1)),
+    ]
+    hasher = hashlib.sha256()
+    for part in parts:
+        hasher.update(part.encode())
+    for values in [
+        mpc.rterm_factor,
+        mpc._x_lb,
+        mpc._x_ub,
+        mpc._u_lb,
+        mpc._u_ub,
+        mpc._z_lb,
+        mpc._z_ub,
+        mpc._x_terminal_lb,
+        mpc._x_terminal_ub,
+        mpc._x_scaling,
+        mpc._u_scaling,
+        mpc._z_scaling,
+    ]:
+        hasher.update(values.cat.full().tobytes())
+    return hasher.hexdigest()
+
+
+def setup_mpc(
+    mpc: MPC,
+    cache_dir: str | os.PathLike | None = None,
+    qp_solver: str | None = None,
+) -> bool:
+    """Sets up the MPC controller, reusing the optimization problem stored
+    in `cache_dir` by a previous setup with the same configuration.
+
+    Setting up an MPC builds the discretized NLP and the IPOPT solver
+    from scratch, which can take seconds, especially with robust scenarios.
+    On a cache miss, the attributes created by `mpc.setup()`, including
+    the serialized solver, are written to `cache_dir` under the key returned
+    by :func:`mpc_cache_key`. On a cache hit they are loaded back instead,
+    without building the NLP.
+
+    If `qp_solver` is given and the optimization problem is a quadratic program,
+    see :func:`is_qp`, IPOPT is replaced by that QP solver from CasADi's
+    `qpsol` interface, e.g. "osqp" or "qpoases". It is warm-started with the
+    previous solution and multipliers like IPOPT.
+
+    After a cache hit the symbolic NLP (e.g. `mpc.nlp`) is not available.
+
+    Args:
+        mpc: MPC controller that was configured but not yet set up.
+        cache_dir: Directory of the cache. If None, `mpc.setup()` is called
+            without caching.
+        qp_solver: Name of the QP solver plugin used for quadratic programs.
+
+    Returns:
+        True if the optimization problem was loaded from the cache.
+    """
+    if cache_dir is None:
+        mpc.setup()
+        _use_qp_solver(mpc, qp_solver)
+        return False
+    key = mpc_cache_key(mpc)
+    if qp_solver is not None:
+        key = f"{key}-{qp_solver}"
+    path = Path(cache_dir) / f"mpc-{key}.pkl"
+    if path.is_file():
+        _load_setup(mpc, path)
+        return True
+    attribute_ids = {name: id(value) for name, value in vars(mpc).items()}
+    mpc.setup()
+    _use_qp_solver(mpc, qp_solver)
+    state = {
+        name: value
+        for name, value in vars(mpc).items()
+        if name not in _UNCACHED_ATTRIBUTES and attribute_ids.get(name) != id(value)
+    }
+    _save_setup(state, path)
+    return False
+
+
+def is_qp(mpc: MPC) -> bool:
+    """Checks whether the optimization problem of a set-up MPC controller
+    is a quadratic program, i.e. whether its objective is quadratic and its
+    constraints are linear in the optimization variables.
+
+    This is the case for linear models, including the discretized `LinearModel`,
+    with quadratic costs and without nonlinear constraints.
+    """
+    nlp = mpc.nlp
+    function = casadi.Function("nlp", [nlp["x"], nlp["p"]], [nlp["f"], nlp["g"]])
+    if function.is_a("MXFunction"):
+        function = function.expand()
+    operations = {function.instruction_id(k) for k in range(function.n_instructions())}
+    return (
+        not operations & _NONSMOOTH_OPERATIONS
+        and casadi.is_quadratic(nlp["f"], nlp["x"])
+        and casadi.is_linear(nlp["g"], nlp["x"])
+    )
+
+
+def _use_qp_solver(mpc: MPC, qp_solver: str | None) -> None:
+    if qp_solver is None or not is_qp(mpc):
+        return
+    options = {"error_on_fail": False, "record_time": True}
+    options.update(_QP_SOLVER_OPTIONS.get(qp_solver, {}))
+    mpc.S = casadi.qpsol("S", qp_solver, mpc.nlp, options)
+
+
+def _save_setup(state: dict[str, Any], path: Path) -> None:
+    # Structured values that share their structure with a symbolic structure,
+    # e.g. the bounds of the optimization variables, are stored as plain vectors
+    # because rebuilding the structure of each of them when unpickling is slow.
+    templates = {
+        value.struct: name
+        for name, value in state.items()
+        if isinstance(value, structure3.ssymStruct)
+    }
+    entries = {}
+    for name, value in state.items():
+        if isinstance(value, structure3.DMStruct) and value.struct in templates:
+            entries[name] = ("values", templates[value.struct], value.cat)
+        else:
+            # Pickled one by one, as CasADi structures that share state
+            # cannot always be unpickled from a single pickle.
+            entries[name] = ("pickle", pickle.dumps(value))
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with atomic_write(path) as file:
+        pickle.dump(entries, file)
+
+
+def _load_setup(mpc: MPC, path: Path) -> None:
+    with path.open("rb") as file:
+        entries = pickle.load(file)
+    state = {
+        name: pickle.loads(entry[1])
+        for name, entry in entries.items()
+        if entry[0] == "pickle"
+    }
+    for name, entry in entries.items():
+        if entry[0] == "values":
+            _, template, values = entry
+            state[name] = state[template](values)
+    vars(mpc).update(state)
+
+    # Mirror what MPC.setup does besides building the NLP.
+    if "tvp_fun" not in vars(mpc):
+        tvp_template = mpc.get_tvp_template()
+        mpc.set_tvp_fun(lambda t_now: tvp_template)
+    if "p_fun" not in vars(mpc):
+        p_template = mpc.get_p_template(1)
+        mpc.set_p_fun(lambda t_now: p_template)
+    meta_data = {
+        key: getattr(mpc.settings, key) for key in dataclasses.asdict(mpc.settings)
+    }
+    meta_data["structure_scenario"] = mpc.scenario_tree["structure_scenario"]
+    mpc.data.set_meta(**meta_data)
+    mpc._prepare_data()
+    mpc.flags["prepare_nlp"] = True
+    mpc.flags["setup"] = True
+
+
+def compile_mpc_solver(
+    mpc: MPC,
+    directory: str | os.PathLike,
+    compiler_flags: tuple[str, ...] = ("-O1",),
+) -> Path:
+    """Replaces the solver of a set-up MPC controller by one whose NLP functions
+    (objective, constraints and their derivatives) are compiled C code.
+
+    The C code of the NLP is generated by CasADi and compiled with the C compiler
+    given by the `CC` environment variable, `cc` by default, into a shared library
+    in `directory`. The library is named after :func:`mpc_cache_key`, so later
+    calls with the same configuration load it without compiling again.
+
+    Args:
+        mpc: MPC controller that was set up.
+        directory: Directory in which the shared library is stored.
+        compiler_flags: Additional flags passed to the compiler.
+
+    Returns:
+        Path of the shared library.
+    """
+    if not mpc.flags["setup"]:
+        raise RuntimeError("MPC controller should be set up before compiling it")
+    directory = Path(directory)
+    library = directory / f"mpc-{mpc_cache_key(mpc)}.so"
+    if not library.is_file():
+        directory.mkdir(parents=True, exist_ok=True)
+        with tempfile.TemporaryDirectory(dir=directory) as build_dir:
+            # The same functions as those of generate_dependencies, which only
+            # writes to the working directory: the NLP and its derivatives
+            code_generator = casadi.CodeGenerator("nlp.c")
+            code_generator.add(mpc.S.oracle())
+            for name in mpc.S.get_function():
+                code_generator.add(mpc.S.get_function(name))
+            code_generator.generate(f"{build_dir}{os.sep}")
+            source = Path(build_dir) / "nlp.c"
+            compiled = Path(build_dir) / library.name
+            compiler = os.environ.get("CC", "cc")
+            subprocess.run(
+                [compiler, "-fPIC", "-shared", *compiler_flags, source, "-o", compiled],
+                check=True,
+            )
+            os.replace(compiled, library)
+    mpc.S = casadi.nlpsol("S", "ipopt", str(library), mpc.settings.nlpsol_opts)
+    return library
@@ -0,0 +1,146 @@
+import time
+from typing import Any, Sequence
+
+import numpy as np
+import pandas as pd
+from do_mpc.controller import MPC
+from numpy.typing import NDArray
+
+__all__ = ["SOLVER_PHASES", "MPCTelemetry"]
+
+# CasADi function evaluations timed by nlpsol, see `S.stats()`
+SOLVER_PHASES = ("nlp_f", "nlp_g", "nlp_grad_f", "nlp_jac_g", "nlp_hess_l")
+
+
+class MPCTelemetry:
+    """Wrapper around an MPC controller that records timings and solver
+    statistics of every call to `make_step`.
+
+    The statistics are read from the solver's `stats()` after each step
+    and written into a preallocated ring buffer that holds the last `capacity`
+    steps, so that recording costs a few microseconds per step and the memory
+    stays bounded.
+
+    For each step the following fields are recorded (times in seconds):
+
+    - `wall_time`: duration of `make_step`.
+    - `solver_time`: wall time spent in the NLP solver.
+    - `overhead_time`: `wall_time - solver_time`, i.e. do-mpc's bookkeeping.
+    - `t_<phase>`: wall time spent evaluating the CasADi functions of the NLP
+      for each phase in :data:`SOLVER_PHASES` (objective, constraints,
+      their derivatives and the Hessian of the Lagrangian).
+    - `ipopt_time`: the rest of `solver_time`, spent inside IPOPT itself,
+      which is dominated by the factorizations of the linear solver (MUMPS).
+    - `iter_count`, `success` and `return_status` of the solver.
+
+    CasADi only reports the total solver time if the solver was created
+    with the option `print_time` (the default) or `record_time`. Otherwise
+    `solver_time`, `overhead_time` and `ipopt_time` are NaN.
+
+    All other attributes are read from and assigned to the wrapped controller,
+    e.g. `telemetry.x0 = x0` sets the initial state of the controller.
+
+    :param mpc: MPC controller that was set up.
+    :param capacity: number of most recent steps that are kept.
+    """
+
+    DTYPE = np.dtype(
+        [
+            ("step", np.int64),
+            ("wall_time", np.float64),
+            ("solver_time", np.float64),
+            ("overhead_time", np.float64),
+            ("ipopt_time", np.float64),
+            *[(f"t_{phase}", np.float64) for phase in SOLVER_PHASES],
+            ("iter_count", np.int32),
+            ("success", np.bool_),
+            ("return_status", "U32"),
+        ]
+    )
+
+    # Attributes of the wrapper, all others are those of the controller
+    _ATTRIBUTES = frozenset({"mpc", "capacity", "_buffer", "n_steps", "n_failures"})
+
+    def __init__(self, mpc: MPC, capacity: int = 10_000) -> None:
+        if capacity < 1:
+            raise ValueError("Capacity should be at least 1")
+        self.mpc = mpc
+        self.capacity = capacity
+        self._buffer = np.zeros(capacity, dtype=self.DTYPE)
+        self.n_steps = 0
+        self.n_failures = 0
+
+    def __getattr__(self, name: str) -> Any:
+        # Only called for attributes that are not found on the wrapper
+        if name == "mpc":
+            raise AttributeError(name)
+        return getattr(self.mpc, name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        if name in self._ATTRIBUTES:
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self.mpc, name, value)
+
+    def make_step(self, x0: NDArray) -> NDArray:
+        start = time.perf_counter()
+        u0 = self.mpc.make_step(x0)
+        wall_time = time.perf_counter() - start
+        self._record(wall_time, self.mpc.solver_stats)
+        return u0
+
+    def _record(self, wall_time: float, stats: dict[str, Any]) -> None:
+        solver_time = stats.get("t_wall_total", np.nan)
+        phase_times = [stats.get(f"t_wall_{phase}", 0.0) for phase in SOLVER_PHASES]
+        success = stats["success"]
+        self._buffer[self.n_steps % self.capacity] = (
+            self.n_steps,
+            wall_time,
+            solver_time,
+            wall_time - solver_time,
+            solver_time - sum(phase_times),
+            *phase_times,
+            stats.get("iter_count", -1),
+            success,
+            stats.get("return_status", ""),
+        )
+        self.n_steps += 1
+        self.n_failures += not success
+
+    @property
+    def records(self) -> NDArray:
+        """Structured array with the recorded steps, oldest first."""
+        if self.n_steps <= self.capacity:
+            return self._buffer[: self.n_steps].copy()
+        split = self.n_steps % self.capacity
+        return np.concatenate([self._buffer[split:], self._buffer[:split]])
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Returns the recorded steps as a DataFrame indexed by step."""
+        return pd.DataFrame(self.records).set_index("step")
+
+    def latency_percentiles(
+        self,
+        percentiles: Sequence[float] = (50, 90, 99),
+        field: str = "wall_time",
+    ) -> dict[float, float]:
+        """Computes percentiles of a timing field over the recorded steps.
+
+        Args:
+            percentiles: Percentiles to compute, between 0 and 100.
+            field: Name of the field, e.g. "wall_time" or "solver_time".
+
+        Returns:
+            Dictionary mapping each percentile to its value,
+            NaN if no step was recorded yet.
+        """
+        values = self._buffer[field][: min(self.n_steps, self.capacity)]
+        if len(values) == 0:
+            return {q: np.nan for q in percentiles}
+        return dict(zip(percentiles, np.percentile(values, percentiles)))
+
+    def reset(self) -> None:
+        """Discards all recorded steps."""
+        self._buffer[:] = np.zeros(1, dtype=self.DTYPE)
+        self.n_steps = 0
+        self.n_failures = 0
@@ -1,6 +1,7 @@
 import os
 import random
-from typing import Any
+from pathlib import Path
+from typing import Any, Sequence
 
 import mediapy as media
 import numpy as np
@@ -93,7 +94,7 @@ def display_array(name: str, array: NDArray) -> None:
 
 
 def show_video(
-    frames: list[NDArray],
+    frames: Sequence[NDArray] | NDArray | str | os.PathLike,
     fps: float,
     *,
     title: str | None = None,
@@ -102,8 +103,28 @@ def show_video(
 ) -> None:
     """Renders the given frames as a video.
 
+    The frames can also be given as the path to an already encoded
+    video file, e.g. the output of a `VideoFrameSink`, in which case
+    the file is displayed as is and `fps`, `codec` and `kwargs` are ignored.
+
     If no frames are passed, then it simply returns without doing anything.
     """
+    if isinstance(frames, (str, os.PathLike)):
+        _show_video_file(Path(frames), title=title)
+        return
     if len(frames) == 0:
         return
     media.show_video(frames, fps=fps, title=title, codec=codec, **kwargs)
+
+
+def _show_video_file(path: Path, *, title: str | None = None) -> None:
+    with media.VideoReader(path) as reader:
+        height, width = reader.shape
+    data = path.read_bytes()
+    if path.suffix == ".gif":
+        html = media.html_from_compressed_image(
+            data, width, height, title=title, fmt="gif"
+        )
+    else:
+        html = media.html_from_compressed_video(data, width, height, title=title)
+    display(HTML(html))
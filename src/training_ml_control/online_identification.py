@@ -0,0 +1,354 @@
+from abc import ABC, abstractmethod
+from collections import deque
+
+import numpy as np
+import pysindy as ps
+from do_mpc.model import Model
+from numpy.typing import NDArray
+
+from training_ml_control.models.dmd import _build_observables_model
+from training_ml_control.models.sindy import _build_polynomial_model, _feature_powers
+
+__all__ = ["RecursiveLeastSquares", "OnlineSINDy", "OnlineEDMDc"]
+
+
+class RecursiveLeastSquares:
+    """Least-squares fit of targets as linear combinations of features,
+    `targets ≈ features @ coefficients.T`, updated with batches of samples.
+
+    Only the sufficient statistics of the fit are kept: the Gram matrix of the
+    features and their products with the targets, so that an update costs
+    the same whatever the number of samples seen so far.
+
+    With a forgetting factor below 1, the weight of each sample is multiplied
+    by the factor for every newer sample, so that the fit tracks dynamics that
+    change over time. With a window, only the samples of the last `window`
+    updates are used.
+
+    The coefficients are computed like pysindy's `STLSQ` optimizer:
+    ridge regression whose coefficients below `threshold` are set to zero,
+    repeated until the remaining ones do not change, followed by a fit of the
+    remaining coefficients without regularization. With a threshold of 0,
+    this is ordinary least squares.
+
+    :param n_features: number of features.
+    :param n_targets: number of targets.
+    :param forgetting_factor: factor in (0, 1] applied to the weight of past samples
+        for each new sample.
+    :param window: number of most recent updates whose samples are used,
+        or None to use all of them.
+    :param threshold: smallest absolute value of the coefficients.
+    :param alpha: regularization of the ridge regressions.
+    :param max_iterations: maximum number of thresholding iterations.
+    """
+
+    def __init__(
+        self,
+        n_features: int,
+        n_targets: int,
+        *,
+        forgetting_factor: float = 1.0,
+        window: int | None = None,
+        threshold: float = 0.0,
+        alpha: float = 0.0,
+        max_iterations: int = 20,
+    ) -> None:
+        if not 0 < forgetting_factor <= 1:
+            raise ValueError("The forgetting factor should be in (0, 1]")
+        if window is not None and window < 1:
+            raise ValueError("The window should contain at least 1 update")
+        self.n_features = n_features
+        self.n_targets = n_targets
+        self.forgetting_factor = forgetting_factor
+        self.window = window
+        self.threshold = threshold
+        self.alpha = alpha
+        self.max_iterations = max_iterations
+        # Statistics of each update in the window, or of all updates without one
+        self._statistics: deque[tuple[NDArray, NDArray]] = deque(maxlen=window or 1)
+        self.n_samples = 0
+
+    def update(self, features: NDArray, targets: NDArray) -> None:
+        """Adds samples, in the order in which they were observed.
+
+        Args:
+            features: Features with shape (n_samples, n_features).
+            targets: Targets with shape (n_samples, n_targets).
+        """
+        n_samples = len(features)
+        weights = self.forgetting_factor ** np.arange(n_samples - 1, -1, -1)
+        weighted_features = features.T * weights
+        gram = weighted_features @ features
+        moments = weighted_features @ targets
+        decay = self.forgetting_factor**n_samples
+        statistics = [(decay * G, decay * H) for G, H in self._statistics]
+        if self.window is None and statistics:
+            G, H = statistics.pop()
+            gram, moments = G + gram, H + moments
+        self._statistics.clear()
+        self._statistics.extend(statistics)
+        self._statistics.append((gram, moments))
+        self.n_samples += n_samples
+
+    def coefficients(self) -> NDArray:
+        """Computes the coefficients from the samples seen so far.
+
+        Returns:
+            Coefficients with shape (n_targets, n_features).
+        """
+        gram = sum(G for G, _ in self._statistics)
+        moments = sum(H for _, H in self._statistics)
+        coefficients = np.zeros((self.n_targets, self.n_features))
+        for j in range(self.n_targets):
+            active = np.ones(self.n_features, dtype=bool)
+            for _ in range(self.max_iterations):
+                xi = _solve(
+                    gram[np.ix_(active, active)], moments[active, j], self.alpha
+                )
+                still_active = np.zeros_like(active)
+                still_active[active] = np.abs(xi) >= self.threshold
+                if np.array_equal(still_active, active):
+                    break
+                active = still_active
+            if active.any():
+                coefficients[j, active] = _solve(
+                    gram[np.ix_(active, active)], moments[active, j], 0.0
+                )
+        return coefficients
+
+
+def _solve(gram: NDArray, moments: NDArray, alpha: float) -> NDArray:
+    # Least squares, like a pseudo-inverse, as the Gram matrix can be singular
+    # until enough samples have been seen
+    regularized = gram + alpha * np.eye(len(gram))
+    return np.linalg.lstsq(regularized, moments, rcond=None)[0]
+
+
+class _OnlineModel(ABC):
+    """Base class of the online identification of models whose coefficients
+    are fitted by :class:`RecursiveLeastSquares` and which are republished
+    as do-mpc models when their coefficients drift."""
+
+    def __init__(
+        self,
+        *,
+        forgetting_factor: float,
+        window: int | None,
+        threshold: float,
+        alpha: float,
+        drift_tolerance: float,
+    ) -> None:
+        self.drift_tolerance = drift_tolerance
+        self._rls_options = dict(
+            forgetting_factor=forgetting_factor,
+            window=window,
+            threshold=threshold,
+            alpha=alpha,
+        )
+        self.rls: RecursiveLeastSquares | None = None
+        self.model: Model | None = None
+        self.published_coefficients: NDArray | None = None
+        self.n_published = 0
+
+    def update(self, observations: NDArray, actions: NDArray) -> bool:
+        """Updates the coefficients with a trajectory and republishes the model
+        if they drifted from those of the published model.
+
+        The trajectory is given as recorded by
+        :func:`training_ml_control.environments.simulate_environment`, e.g.
+        `online.update(results.observations, results.actions)`.
+
+        Args:
+            observations: States with shape (n_steps + 1, n_x).
+            actions: Inputs with shape (n_steps, n_u).
+
+        Returns:
+            True if the model was republished.
+        """
+        observations = np.asarray(observations, dtype=float)
+        actions = np.asarray(actions, dtype=float).reshape(len(actions), -1)
+        if self.rls is None:
+            self._initialize(observations, actions)
+        features, targets = self._regression_data(observations, actions)
+        if self.rls is None:
+            self.rls = RecursiveLeastSquares(
+                features.shape[1], targets.shape[1], **self._rls_options
+            )
+        self.rls.update(features, targets)
+
+        coefficients = self.rls.coefficients()
+        if self.published_coefficients is not None:
+            drift = np.linalg.norm(coefficients - self.published_coefficients)
+            scale = np.linalg.norm(self.published_coefficients)
+            if drift <= self.drift_tolerance * scale:
+                return False
+        self._set_coefficients(coefficients)
+        self.model = self._build_model()
+        self.published_coefficients = coefficients
+        self.n_published += 1
+        return True
+
+    @abstractmethod
+    def _initialize(self, observations: NDArray, actions: NDArray) -> None:
+        """Sets up the features from the first trajectory."""
+
+    @abstractmethod
+    def _regression_data(
+        self, observations: NDArray, actions: NDArray
+    ) -> tuple[NDArray, NDArray]:
+        """Features and targets of the fit, with one row per sample."""
+
+    @abstractmethod
+    def _set_coefficients(self, coefficients: NDArray) -> None:
+        """Sets the coefficients of the model that is published."""
+
+    @abstractmethod
+    def _build_model(self) -> Model:
+        """Builds the do-mpc model with the coefficients that were set."""
+
+
+class OnlineSINDy(_OnlineModel):
+    """SINDy model identified online from trajectories, whose do-mpc model
+    built like with :func:`training_ml_control.models.build_sindy_model`
+    is republished in `model` when its coefficients drift.
+
+    The feature library is fitted to the first trajectory, with the states
+    named "x0", "x1", ... and the inputs "u0", "u1", ... The coefficients
+    are then those of a :class:`RecursiveLeastSquares` fit of the time
+    derivatives of the states, or of the next states for discrete-time models,
+    to the features of all trajectories. The model is built from the library
+    and the coefficients directly, so that no SINDy model of pysindy is fitted.
+
+    :param feature_library: unfitted polynomial feature library of pysindy.
+    :param dt: time step of the trajectories.
+    :param differentiation_method: differentiation method of pysindy,
+        defaults to finite differences.
+    :param discrete_time: whether the next states are fitted
+        instead of the time derivatives.
+    :param forgetting_factor: forgetting factor of the fit.
+    :param window: number of most recent trajectories used in the fit,
+        or None to use all of them.
+    :param threshold: smallest absolute value of the coefficients,
+        like the threshold of pysindy's `STLSQ`.
+    :param alpha: regularization, like the alpha of pysindy's `STLSQ`.
+    :param drift_tolerance: change of the coefficients, relative to the norm
+        of the published ones, above which the model is republished.
+    """
+
+    def __init__(
+        self,
+        feature_library,
+        dt: float,
+        *,
+        differentiation_method=None,
+        discrete_time: bool = False,
+        forgetting_factor: float = 1.0,
+        window: int | None = None,
+        threshold: float = 0.1,
+        alpha: float = 0.05,
+        drift_tolerance: float = 0.01,
+    ) -> None:
+        super().__init__(
+            forgetting_factor=forgetting_factor,
+            window=window,
+            threshold=threshold,
+            alpha=alpha,
+            drift_tolerance=drift_tolerance,
+        )
+        self.feature_library = feature_library
+        self.dt = dt
+        self.differentiation_method = differentiation_method or ps.FiniteDifference()
+        self.discrete_time = discrete_time
+        self.feature_names: list[str] | None = None
+        self.coefficients: NDArray | None = None
+
+    def _initialize(self, observations: NDArray, actions: NDArray) -> None:
+        self.feature_names = [f"x{i}" for i in range(observations.shape[1])] + [
+            f"u{i}" for i in range(actions.shape[1])
+        ]
+        self.feature_library.fit(np.hstack([observations[:-1], actions]))
+
+    def _regression_data(
+        self, observations: NDArray, actions: NDArray
+    ) -> tuple[NDArray, NDArray]:
+        features = np.asarray(
+            self.feature_library.transform(np.hstack([observations[:-1], actions]))
+        )
+        if self.discrete_time:
+            targets = observations[1:]
+        else:
+            # Differentiated with the last state, which has no input
+            derivatives = self.differentiation_method(observations, t=self.dt)
+            targets = np.asarray(derivatives)[:-1]
+        return features, targets
+
+    def _set_coefficients(self, coefficients: NDArray) -> None:
+        self.coefficients = coefficients
+
+    def _build_model(self) -> Model:
+        powers = _feature_powers(self.feature_library, self.feature_names)
+        return _build_polynomial_model(self.feature_names, powers, self.coefficients)
+
+
+class OnlineEDMDc(_OnlineModel):
+    """Koopman model identified online from trajectories like pykoopman's EDMDc
+    regressor, whose do-mpc model built like with
+    :func:`training_ml_control.models.build_dmd_model` is republished
+    in `model` when its matrices drift.
+
+    The observables are fitted to the first trajectory. The matrices `A`
+    and `B`, whose next observables are `A phi(x) + B u`, are then those of a
+    :class:`RecursiveLeastSquares` fit of the next observables to the
+    observables and inputs of all trajectories. The model is built from these
+    matrices directly, so that no Koopman model of pykoopman is fitted.
+
+    :param observables: unfitted observables of pykoopman, see
+        :func:`training_ml_control.models.build_dmd_model` for those supported.
+    :param forgetting_factor: forgetting factor of the fit.
+    :param window: number of most recent trajectories used in the fit,
+        or None to use all of them.
+    :param drift_tolerance: change of the matrices, relative to the norm
+        of the published ones, above which the model is republished.
+    """
+
+    def __init__(
+        self,
+        observables,
+        *,
+        forgetting_factor: float = 1.0,
+        window: int | None = None,
+        drift_tolerance: float = 0.01,
+    ) -> None:
+        super().__init__(
+            forgetting_factor=forgetting_factor,
+            window=window,
+            threshold=0.0,
+            alpha=0.0,
+            drift_tolerance=drift_tolerance,
+        )
+        self.observables = observables
+        self.A: NDArray | None = None
+        self.B: NDArray | None = None
+
+    def _initialize(self, observations: NDArray, actions: NDArray) -> None:
+        self.observables.fit(observations)
+
+    def _regression_data(
+        self, observations: NDArray, actions: NDArray
+    ) -> tuple[NDArray, NDArray]:
+        lifted = self.observables.transform(observations)
+        # Time-delay observables consume the first samples
+        inputs = actions[len(observations) - len(lifted) :]
+        return np.hstack([lifted[:-1], inputs]), lifted[1:]
+
+    def _set_coefficients(self, coefficients: NDArray) -> None:
+        n_lifted = coefficients.shape[0]
+        self.A = coefficients[:, :n_lifted]
+        self.B = coefficients[:, n_lifted:]
+
+    def _build_model(self) -> Model:
+        # The states are measured from the observables, as in Koopman.simulate
+        C = self.observables.measurement_matrix_
+        return _build_observables_model(
+            self.observables, self.observables.n_input_features_, C @ self.A, C @ self.B
+        )
@@ -0,0 +1,226 @@
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable
+
+import numpy as np
+from do_mpc.controller import MPC
+from numpy.typing import ArrayLike, NDArray
+
+from training_ml_control._workers import get_worker_context, silence_stdout
+
+__all__ = [
+    "SCENARIO_REDUCTIONS",
+    "reduce_scenarios",
+    "set_uncertainty_scenarios",
+    "ScenarioConfigurationReport",
+    "evaluate_scenario_configurations",
+]
+
+SCENARIO_REDUCTIONS = ("full", "extreme", "representative")
+
+
+def reduce_scenarios(
+    uncertainty_values: dict[str, ArrayLike],
+    method: str = "full",
+    max_branches: int | None = None,
+) -> dict[str, NDArray]:
+    """Selects the combinations of uncertain parameter values that make up
+    the branches of each node of the scenario tree of a robust MPC.
+
+    As in `MPC.set_uncertainty_values` of do-mpc, the first value of each
+    parameter is its nominal value. The methods are:
+
+    - "full": all combinations of the values, like do-mpc.
+    - "extreme": the nominal combination and the combinations of the smallest
+      and largest values of each parameter, i.e. the vertices of the box
+      of uncertain parameters.
+    - "representative": the nominal combination and `max_branches - 1`
+      combinations that cover all combinations as evenly as possible.
+
+    If there are more than `max_branches` combinations, the nominal one
+    is kept and the others are chosen one at a time as the combination
+    farthest from those already chosen, with each parameter normalized
+    by the range of its values.
+
+    Args:
+        uncertainty_values: Possible values of each uncertain parameter,
+            the nominal value first.
+        method: Method used to select the combinations.
+        max_branches: Maximum number of combinations.
+
+    Returns:
+        Values of each parameter in the selected combinations,
+        the nominal combination first.
+    """
+    if method not in SCENARIO_REDUCTIONS:
+        raise ValueError(
+            f"Unknown scenario reduction {method}, expected one of {SCENARIO_REDUCTIONS}"
+        )
+    if method == "representative" and max_branches is None:
+        raise ValueError("Representative scenarios need a maximum number of branches")
+    if max_branches is not None and max_branches < 1:
+        raise ValueError("The maximum number of branches should be at least 1")
+    names = list(uncertainty_values)
+    values = [np.asarray(uncertainty_values[name], dtype=float) for name in names]
+    if method == "extreme":
+        nominal = [v[0] for v in values]
+        vertices = itertools.product(*[(v.min(), v.max()) for v in values])
+        combinations = np.array([nominal, *vertices])
+        # Without duplicates, e.g. if a nominal value is also the smallest one
+        _, indices = np.unique(combinations, axis=0, return_index=True)
+        combinations = combinations[np.sort(indices)]
+    else:
+        combinations = np.array(list(itertools.product(*values)))
+    if max_branches is not None and len(combinations) > max_branches:
+        combinations = combinations[_farthest_points(combinations, max_branches)]
+    return {name: combinations[:, i] for i, name in enumerate(names)}
+
+
+def _farthest_points(points: NDArray, n_points: int) -> NDArray:
+    """Indices of `n_points` points chosen greedily, starting from the first one,
+    each as far as possible from those already chosen."""
+    ranges = np.ptp(points, axis=0)
+    normalized = points / np.where(ranges > 0, ranges, 1)
+    chosen = [0]
+    distances = np.linalg.norm(normalized - normalized[0], axis=1)
+    for _ in range(n_points - 1):
+        index = int(np.argmax(distances))
+        chosen.append(index)
+        distances = np.minimum(
+            distances, np.linalg.norm(normalized - normalized[index], axis=1)
+        )
+    return np.array(chosen)
+
+
+def set_uncertainty_scenarios(mpc: MPC, scenarios: dict[str, NDArray]) -> None:
+    """Sets the combinations of uncertain parameter values of the scenario tree,
+    e.g. those returned by :func:`reduce_scenarios`.
+
+    Unlike `MPC.set_uncertainty_values`, which uses all combinations
+    of the values of each parameter, the combinations are used as given:
+    the i-th branch uses the i-th value of every parameter.
+    """
+    names = list(scenarios)
+    combinations = np.column_stack([np.ravel(scenarios[name]) for name in names])
+    p_template = mpc.get_p_template(len(combinations))
+    p_template["_p", :, names] = [tuple(row) for row in combinations]
+    mpc.set_p_fun(lambda t_now: p_template)
+
+
+@dataclass
+class ScenarioConfigurationReport:
+    name: str
+    n_scenarios: int
+    n_variables: int
+    n_constraints: int
+    setup_time: float
+    latencies: NDArray
+    n_failures: int
+
+    def latency_percentiles(
+        self, percentiles: tuple[float, ...] = (50, 90, 99)
+    ) -> dict[float, float]:
+        return dict(zip(percentiles, np.percentile(self.latencies, percentiles)))
+
+
+# Factory of the MPC controllers in each worker process, set by the initializer
+_worker_factory: Callable[..., MPC] | None = None
+
+
+def _initialize_worker(controller_factory: Callable[..., MPC]) -> None:
+    global _worker_factory
+    silence_stdout()
+    _worker_factory = controller_factory
+
+
+def _evaluate(
+    controller_factory: Callable[..., MPC],
+    name: str,
+    configuration: dict[str, Any],
+    states: NDArray,
+) -> ScenarioConfigurationReport:
+    start = time.perf_counter()
+    mpc = controller_factory(**configuration)
+    setup_time = time.perf_counter() - start
+    mpc.x0 = states[0].reshape(-1, 1)
+    mpc.set_initial_guess()
+    latencies = np.zeros(len(states))
+    n_failures = 0
+    for i, x0 in enumerate(states):
+        start = time.perf_counter()
+        mpc.make_step(x0.reshape(-1, 1))
+        latencies[i] = time.perf_counter() - start
+        n_failures += not mpc.solver_stats["success"]
+    return ScenarioConfigurationReport(
+        name=name,
+        n_scenarios=mpc.n_combinations**mpc.settings.n_robust,
+        n_variables=mpc.n_opt_x,
+        n_constraints=mpc.n_opt_lagr,
+        setup_time=setup_time,
+        latencies=latencies,
+        n_failures=n_failures,
+    )
+
+
+def _evaluate_in_worker(
+    name: str, configuration: dict[str, Any], states: NDArray
+) -> ScenarioConfigurationReport:
+    return _evaluate(_worker_factory, name, configuration, states)
+
+
+def evaluate_scenario_configurations(
+    controller_factory: Callable[..., MPC],
+    configurations: dict[str, dict[str, Any]],
+    states: NDArray,
+    *,
+    n_workers: int | None = None,
+) -> list[ScenarioConfigurationReport]:
+    """Builds a robust MPC controller for each configuration of the scenario tree
+    and measures its setup time, the size of its NLP and its per-step latency.
+
+    The configurations are independent of each other and are evaluated in
+    parallel in `n_workers` worker processes, which are forked on platforms
+    that support it, so that `controller_factory` can be any callable.
+    The timings are only representative if each worker has a CPU of its own.
+
+    Args:
+        controller_factory: Function that creates the MPC controller from
+            the keyword arguments of a configuration, e.g. a partial application
+            of :func:`training_ml_control.control.build_mpc_controller`.
+        configurations: Keyword arguments of `controller_factory` by name of
+            the configuration, e.g.
+            `{"extreme": {"scenario_reduction": "extreme", "n_robust": 2}}`.
+        states: States with shape (n_steps, n_x) for which the controllers
+            compute an input in turn, e.g. a recorded trajectory.
+        n_workers: Number of worker processes, defaults to the number of
+            configurations or CPUs, whichever is smaller.
+            If 0, the configurations are evaluated in the current process.
+
+    Returns:
+        Report of each configuration, in order.
+    """
+    names = list(configurations)
+    if n_workers == 0:
+        return [
+            _evaluate(controller_factory, name, configurations[name], states)
+            for name in names
+        ]
+    n_workers = n_workers or min(len(names), os.cpu_count())
+    context = get_worker_context()
+    with ProcessPoolExecutor(
+        max_workers=n_workers,
+        mp_context=context,
+        initializer=_initialize_worker,
+        initargs=(controller_factory,),
+    ) as executor:
+        return list(
+            executor.map(
+                _evaluate_in_worker,
+                names,
+                [configurations[name] for name in names],
+                [states] * len(names),
+            )
+        )
@@ -0,0 +1,331 @@
+import time
+from typing import Any
+
+import casadi
+import numpy as np
+from do_mpc.model import Model
+from numpy.typing import NDArray
+
+from training_ml_control.models import limits_to_arrays
+
+__all__ = ["RTIMPCController", "build_rti_mpc_controller"]
+
+
+class RTIMPCController:
+    """Nonlinear MPC controller with the real-time iteration (RTI) scheme.
+
+    Instead of solving the nonlinear program to convergence at every step,
+    a single Gauss-Newton SQP iteration is carried out per step. The dynamics
+    are linearized around the previous solution shifted by one step, which
+    is a good initial guess when the system follows the predictions,
+    and the resulting quadratic program (QP) is solved once.
+
+    Each step is split in two phases:
+
+    - :meth:`prepare` shifts the previous solution and linearizes the problem
+      around it. It does not depend on the next measurement and can be done
+      while waiting for it.
+    - :meth:`feedback` inserts the measurement into the initial state
+      constraint, solves the QP and returns the first input.
+
+    :meth:`make_step` runs both phases, like `MPC.make_step` of do-mpc.
+    The compute time of a step is thus bounded by one linearization and
+    one QP solve, whose number of iterations is limited by the QP solver
+    options.
+
+    The problem minimizes `sum_k (x_k - x_s)^T Q (x_k - x_s)
+    + (u_k - u_s)^T R (u_k - u_s) + (x_N - x_s)^T Q_N (x_N - x_s)`
+    subject to the discrete dynamics `x_{k+1} = F(x_k, u_k)`
+    and box constraints on the states and inputs.
+
+    :param dynamics: discrete dynamics, CasADi function `(x, u) -> x_next`.
+    :param n_horizon: prediction horizon.
+    :param setpoint: setpoint of the states.
+    :param Q: state cost matrix.
+    :param R: input cost matrix.
+    :param terminal_Q: terminal state cost matrix, defaults to `Q`.
+    :param u_setpoint: setpoint of the inputs, defaults to zero.
+    :param x_lower: lower limits of the states.
+    :param x_upper: upper limits of the states.
+    :param u_lower: lower limits of the inputs.
+    :param u_upper: upper limits of the inputs.
+    :param qp_solver: name of the CasADi QP solver plugin.
+    :param max_qp_iterations: maximum number of iterations of the QP solver.
+    :param qp_options: options of the QP solver.
+    """
+
+    def __init__(
+        self,
+        dynamics: casadi.Function,
+        n_horizon: int,
+        setpoint: NDArray,
+        Q: NDArray,
+        R: NDArray,
+        terminal_Q: NDArray | None = None,
+        u_setpoint: NDArray | None = None,
+        x_lower: NDArray | None = None,
+        x_upper: NDArray | None = None,
+        u_lower: NDArray | None = None,
+        u_upper: NDArray | None = None,
+        qp_solver: str = "qrqp",
+        max_qp_iterations: int = 100,
+        qp_options: dict[str, Any] | None = None,
+    ) -> None:
+        n_x, n_u = dynamics.size1_in(0), dynamics.size1_in(1)
+        self.n_x, self.n_u, self.n_horizon = n_x, n_u, n_horizon
+        if terminal_Q is None:
+            terminal_Q = Q
+        if u_setpoint is None:
+            u_setpoint = np.zeros(n_u)
+        self.setpoint = np.ravel(setpoint).astype(float)
+        self.u_setpoint = np.ravel(u_setpoint).astype(float)
+
+        # Decision variables w = (x_0, u_0, x_1, u_1, ..., u_{N-1}, x_N),
+        # interleaved so that the QP matrices are banded
+        n_w = n_horizon * (n_x + n_u) + n_x
+        w = casadi.SX.sym("w", n_w)
+        self._x_indices = np.array(
+            [np.arange(n_x) + k * (n_x + n_u) for k in range(n_horizon + 1)]
+        )
+        self._u_indices = np.array(
+            [np.arange(n_u) + k * (n_x + n_u) + n_x for k in range(n_horizon)]
+        )
+        xs = [w[indices] for indices in self._x_indices]
+        us = [w[indices] for indices in self._u_indices]
+        # Shooting gaps, which the linearization closes to first order.
+        # The initial state is fixed by the bounds of the QP.
+        constraints = casadi.vertcat(
+            *[dynamics(xs[k], us[k]) - xs[k + 1] for k in range(n_horizon)]
+        )
+        self._linearize = casadi.Function(
+            "linearize",
+            [w],
+            [constraints, casadi.jacobian(constraints, w)],
+        )
+
+        # Gauss-Newton Hessian, which is exact for the quadratic costs
+        blocks = [Q, R] * n_horizon + [terminal_Q]
+        self._H = casadi.diagcat(*[casadi.DM(block) for block in blocks])
+        self._H_array = self._H.full()
+        self._w_reference = np.zeros(n_w)
+        self._w_reference[self._x_indices] = self.setpoint
+        self._w_reference[self._u_indices] = self.u_setpoint
+
+        self._w_lower = np.full(n_w, -np.inf)
+        self._w_upper = np.full(n_w, np.inf)
+        for indices in self._x_indices[1:]:
+            self._w_lower[indices] = -np.inf if x_lower is None else x_lower
+            self._w_upper[indices] = np.inf if x_upper is None else x_upper
+        for indices in self._u_indices:
+            self._w_lower[indices] = -np.inf if u_lower is None else u_lower
+            self._w_upper[indices] = np.inf if u_upper is None else u_upper
+
+        options = _qp_solver_options(qp_solver, max_qp_iterations)
+        options.update(qp_options or {})
+        self._qp = casadi.conic(
+            "rti_qp",
+            qp_solver,
+            {"h": self._H.sparsity(), "a": self._linearize.sparsity_out(1)},
+            options,
+        )
+        self.reset()
+
+    def reset(self, x0: NDArray | None = None) -> None:
+        """Resets the initial guess to the state `x0`, or to the setpoint,
+        over the whole horizon, with the inputs at their setpoint."""
+        self.w = self._w_reference.copy()
+        if x0 is not None:
+            self.w[self._x_indices] = np.ravel(x0)
+        self._lam_x = np.zeros(len(self.w))
+        self._lam_a = np.zeros(self.n_horizon * self.n_x)
+        self.solver_stats: dict[str, Any] = {}
+        self._qp_data: dict[str, Any] | None = None
+
+    def prepare(self) -> None:
+        """Linearizes the problem around the current initial guess."""
+        residuals, jacobian = self._linearize(self.w)
+        residuals = residuals.full().ravel()
+        self._qp_data = {
+            "h": self._H,
+            "a": jacobian,
+            "g": self._H_array @ (self.w - self._w_reference),
+            "lba": -residuals,
+            "uba": -residuals,
+            "lbx": self._w_lower - self.w,
+            "ubx": self._w_upper - self.w,
+            # Active-set solvers start from the constraints active
+            # in the previous solution
+            "lam_x0": self._lam_x,
+            "lam_a0": self._lam_a,
+        }
+
+    def feedback(self, x0: NDArray) -> NDArray:
+        """Solves the QP prepared by :meth:`prepare` for the initial state `x0`
+        and returns the first input, with shape (n_u, 1).
+
+        The solution, shifted by one step, is the initial guess of the next step.
+        """
+        if self._qp_data is None:
+            self.prepare()
+        start = time.perf_counter()
+        qp_data = self._qp_data
+        # Steps of the initial state from the linearization point to x0
+        delta_x0 = np.ravel(x0) - self.w[self._x_indices[0]]
+        qp_data["lbx"][self._x_indices[0]] = delta_x0
+        qp_data["ubx"][self._x_indices[0]] = delta_x0
+        solution = self._qp(**qp_data)
+        stats = self._qp.stats()
+        self.solver_stats = {
+            "success": stats["success"],
+            "return_status": stats["return_status"],
+            "iter_count": stats.get("iter_count", -1),
+            "t_wall_total": time.perf_counter() - start,
+        }
+        step = solution["x"].full().ravel()
+        if np.isfinite(step).all():
+            self._lam_x = solution["lam_x"].full().ravel()
+            self._lam_a = solution["lam_a"].full().ravel()
+        else:
+            # Keep the previous guess, only moved to the measured initial state
+            step = np.zeros_like(self.w)
+            step[self._x_indices[0]] = delta_x0
+        self.w = self.w + step
+        u0 = self.w[self._u_indices[0]].copy()
+        self._shift()
+        return u0.reshape(-1, 1)
+
+    def _shift(self) -> None:
+        n_x, n_u = self.n_x, self.n_u
+        # Drop the first stage and repeat the last input and state
+        self.w[: -(n_x + n_u)] = self.w[n_x + n_u :]
+        self._lam_x[: -(n_x + n_u)] = self._lam_x[n_x + n_u :]
+        self._lam_a[:-n_x] = self._lam_a[n_x:]
+        self._qp_data = None
+
+    def make_step(self, x0: NDArray) -> NDArray:
+        """Computes the input for the state `x0` with one real-time iteration.
+
+        Returns:
+            Input with shape (n_u, 1).
+        """
+        if self._qp_data is None:
+            self.prepare()
+        return self.feedback(x0)
+
+    def act(self, measurement: NDArray) -> NDArray:
+        return self.make_step(measurement).ravel()
+
+
+def build_rti_mpc_controller(
+    model: Model,
+    t_step: float,
+    n_horizon: int,
+    setpoint: NDArray,
+    Q: NDArray,
+    R: NDArray,
+    terminal_Q: NDArray | None = None,
+    x_limits: dict[str, NDArray] | None = None,
+    u_limits: dict[str, NDArray] | None = None,
+    *,
+    u_setpoint: NDArray | None = None,
+    n_substeps: int = 1,
+    qp_solver: str = "qrqp",
+    max_qp_iterations: int = 100,
+    qp_options: dict[str, Any] | None = None,
+) -> RTIMPCController:
+    """Creates a nonlinear MPC controller that carries out one real-time
+    iteration per step instead of solving the problem to convergence
+    like :func:`training_ml_control.control.build_mpc_controller`.
+
+    Continuous-time models are discretized with `n_substeps` steps of the
+    explicit Runge-Kutta method of order 4 per time step, i.e. with
+    multiple shooting instead of the orthogonal collocation of
+    `build_mpc_controller`.
+
+    The QP is solved with `qp_solver`, by default CasADi's active-set solver
+    qrqp, whose iterations are limited with its option `max_iter` to bound
+    the compute time of a step. If the QP solver stops before convergence,
+    its iterate is used anyway and `solver_stats["success"]` is False.
+
+    Args:
+        model: Model without algebraic states or parameters.
+        t_step: Time step.
+        n_horizon: Prediction horizon.
+        setpoint: Setpoint of the states.
+        Q: State cost matrix.
+        R: Input cost matrix.
+        terminal_Q: Terminal state cost matrix, defaults to `Q`.
+        x_limits: Lower and upper limits of the states.
+        u_limits: Lower and upper limits of the inputs.
+        u_setpoint: Setpoint of the inputs, defaults to zero.
+        n_substeps: Number of integration steps per time step.
+        qp_solver: Name of the CasADi QP solver plugin, e.g. "qrqp",
+            "qpoases" or "osqp".
+        max_qp_iterations: Maximum number of iterations of the QP solver,
+            set with the iteration limit option of `qp_solver`, e.g. `max_iter`
+            for qrqp or `nWSR` for qpOASES.
+        qp_options: Options of the QP solver, which take precedence
+            over those set from `max_qp_iterations`.
+
+    Returns:
+        RTI MPC controller.
+    """
+    if model.n_z > 0 or model.n_p > 0 or model.n_tvp > 0:
+        raise ValueError("Models with algebraic states or parameters are not supported")
+    x, u = casadi.SX.sym("x", model.n_x), casadi.SX.sym("u", model.n_u)
+    empty = casadi.DM.zeros(0, 1)
+    rhs = model._rhs_fun(x, u, empty, empty, empty, empty)
+    if model.model_type == "discrete":
+        x_next = rhs
+    else:
+        f = casadi.Function("f", [x, u], [rhs])
+        h = t_step / n_substeps
+        x_next = x
+        for _ in range(n_substeps):
+            k1 = f(x_next, u)
+            k2 = f(x_next + h / 2 * k1, u)
+            k3 = f(x_next + h / 2 * k2, u)
+            k4 = f(x_next + h * k3, u)
+            x_next = x_next + h / 6 * (k1 + 2 * k2 + 2 * k3 + k4)
+    dynamics = casadi.Function("dynamics", [x, u], [x_next])
+
+    x_lower, x_upper = limits_to_arrays(model._x, x_limits or {}, model.n_x)
+    u_lower, u_upper = limits_to_arrays(model._u, u_limits or {}, model.n_u)
+    return RTIMPCController(
+        dynamics,
+        n_horizon,
+        setpoint,
+        Q,
+        R,
+        terminal_Q,
+        u_setpoint,
+        x_lower,
+        x_upper,
+        u_lower,
+        u_upper,
+        qp_solver,
+        max_qp_iterations,
+        qp_options,
+    )
+
+
+def _qp_solver_options(qp_solver: str, max_iterations: int) -> dict[str, Any]:
+    """Options that silence the QP solver and limit its iterations."""
+    # The iterate is used even if the solver did not converge
+    options: dict[str, Any] = {"error_on_fail": False}
+    if qp_solver == "qrqp":
+        options.update(
+            {
+                "max_iter": max_iterations,
+                "print_iter": False,
+                "print_header": False,
+                "print_info": False,
+            }
+        )
+    elif qp_solver == "qpoases":
+        options.update({"nWSR": max_iterations, "printLevel": "none"})
+    elif qp_solver == "osqp":
+        options["osqp"] = {"max_iter": max_iterations, "verbose": 0}
+    elif qp_solver == "hpipm":
+        options["hpipm"] = {"iter_max": max_iterations}
+    return options
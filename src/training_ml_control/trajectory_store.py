@@ -0,0 +1,282 @@
+import json
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Iterator, Sequence
+
+import numpy as np
+from gymnasium import Env
+from numpy.typing import DTypeLike, NDArray
+
+from training_ml_control._files import atomic_write
+from training_ml_control.control import FeedbackController
+from training_ml_control.environments import simulate_environment
+
+__all__ = ["Episode", "TrajectoryDatasetWriter", "TrajectoryDataset"]
+
+_INDEX_FILE = "index.json"
+
+# Attributes of the environments that only concern rendering
+_RENDERING_ATTRIBUTES = {"render_mode", "screen_width", "screen_height", "isopen"}
+
+
+@dataclass
+class Episode:
+    observations: NDArray
+    actions: NDArray
+    metadata: dict[str, Any]
+
+
+def _chunk_path(path: Path, name: str, chunk: int) -> Path:
+    return path / f"{name}-{chunk:05d}.npy"
+
+
+def _to_json(value: Any) -> Any:
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return repr(value)
+
+
+class TrajectoryDatasetWriter:
+    """Appends episodes to a dataset of trajectories stored in a directory,
+    e.g. those simulated with
+    :func:`training_ml_control.environments.simulate_environment`.
+
+    The observations and actions are stored in chunks, `.npy` files holding
+    up to `chunk_size` steps of consecutive episodes that are written through
+    memory maps. An episode is never split across chunks, so that it can be
+    read back as a view of a memory-mapped chunk. An index in `index.json`
+    records the chunk and the offsets of each episode, as well as its
+    metadata. It is rewritten after each episode, so that the dataset can be
+    read while it is being written.
+
+    Opening a directory that already contains a dataset appends to it.
+
+    :param path: directory of the dataset.
+    :param chunk_size: number of steps per chunk. Longer episodes
+        are stored in chunks of their own.
+    :param dtype: dtype used to store continuous observations and actions,
+        defaults to their own dtype.
+    """
+
+    def __init__(
+        self,
+        path: str | os.PathLike,
+        *,
+        chunk_size: int = 100_000,
+        dtype: DTypeLike | None = None,
+    ) -> None:
+        self.path = Path(path)
+        index_path = self.path / _INDEX_FILE
+        if index_path.is_file():
+            self.index = json.loads(index_path.read_text())
+        else:
+            self.index = {
+                "chunk_size": chunk_size,
+                "dtype": None if dtype is None else np.dtype(dtype).str,
+                "arrays": {},
+                "chunks": [],
+                "episodes": [],
+            }
+        # Memory maps of the chunk that is written to
+        self._chunk: int | None = None
+        self._chunks: dict[str, NDArray] = {}
+
+    def __len__(self) -> int:
+        return len(self.index["episodes"])
+
+    def append(
+        self,
+        observations: NDArray,
+        actions: NDArray,
+        metadata: dict[str, Any] | None = None,
+    ) -> int:
+        """Appends an episode.
+
+        Args:
+            observations: Observations with shape (n_steps + 1, ...).
+            actions: Actions with shape (n_steps, ...).
+            metadata: JSON-serializable metadata of the episode.
+
+        Returns:
+            Index of the episode in the dataset.
+        """
+        arrays = {
+            "observations": np.asarray(observations),
+            "actions": np.asarray(actions),
+        }
+        for name, array in arrays.items():
+            if array.dtype.kind == "f":
+                if self.index["dtype"] is not None:
+                    arrays[name] = array = array.astype(self.index["dtype"], copy=False)
+            elif array.dtype.kind not in "biu":
+                raise ValueError(f"Unsupported dtype {array.dtype} of the {name}")
+            layout = {"dtype": array.dtype.str, "shape": list(array.shape[1:])}
+            expected = self.index["arrays"].setdefault(name, layout)
+            if expected != layout:
+                raise ValueError(
+                    f"The {name} should have dtype {expected['dtype']} and shape "
+                    f"(n, {', '.join(map(str, expected['shape']))}), "
+                    f"got {array.dtype.str} and {array.shape}"
+                )
+
+        n_rows = len(arrays["observations"])
+        chunks = self.index["chunks"]
+        if not chunks or chunks[-1]["n_observations"] + n_rows > chunks[-1]["capacity"]:
+            self._create_chunk(max(self.index["chunk_size"], n_rows))
+        chunk = len(chunks) - 1
+        episode = {"chunk": chunk, "n_steps": len(arrays["actions"])}
+        for name, array in arrays.items():
+            offset = chunks[chunk][f"n_{name}"]
+            self._open_chunk(name, chunk)[offset : offset + len(array)] = array
+            self._chunks[name].flush()
+            chunks[chunk][f"n_{name}"] = offset + len(array)
+            episode[f"{name}_offset"] = offset
+        episode["metadata"] = metadata or {}
+        self.index["episodes"].append(episode)
+        self._write_index()
+        return len(self) - 1
+
+    def record(
+        self,
+        env: Env,
+        *,
+        max_steps: int = 500,
+        controller: FeedbackController | None = None,
+        seed: int = 16,
+        metadata: dict[str, Any] | None = None,
+    ) -> int:
+        """Simulates an episode with
+        :func:`training_ml_control.environments.simulate_environment`
+        and appends it, with the name of the controller, the seed, the time step
+        and the parameters of the environment as metadata.
+
+        Args:
+            env: Environment to simulate.
+            max_steps: Maximum number of steps in the episode.
+            controller: Controller, defaults to a random controller.
+            seed: Seed used to reset the environment and its action space.
+            metadata: Additional metadata of the episode.
+
+        Returns:
+            Index of the episode in the dataset.
+        """
+        results = simulate_environment(
+            env, max_steps=max_steps, controller=controller, seed=seed
+        )
+        unwrapped = env.unwrapped
+        parameters = {
+            name: value
+            for name, value in vars(unwrapped).items()
+            if not name.startswith("_")
+            and name not in _RENDERING_ATTRIBUTES
+            and isinstance(value, (bool, int, float, str))
+        }
+        episode_metadata = {
+            "controller": type(controller).__name__
+            if controller
+            else "RandomController",
+            "seed": seed,
+            "dt": getattr(unwrapped, "dt", None),
+            "env": type(unwrapped).__name__,
+            "env_parameters": parameters,
+        }
+        episode_metadata.update(metadata or {})
+        return self.append(results.observations, results.actions, episode_metadata)
+
+    def _create_chunk(self, capacity: int) -> None:
+        chunk = len(self.index["chunks"])
+        self.path.mkdir(parents=True, exist_ok=True)
+        for name, layout in self.index["arrays"].items():
+            self._chunks[name] = np.lib.format.open_memmap(
+                _chunk_path(self.path, name, chunk),
+                mode="w+",
+                dtype=np.dtype(layout["dtype"]),
+                shape=(capacity, *layout["shape"]),
+            )
+        self._chunk = chunk
+        self.index["chunks"].append(
+            {"capacity": capacity, "n_observations": 0, "n_actions": 0}
+        )
+
+    def _open_chunk(self, name: str, chunk: int) -> NDArray:
+        if self._chunk != chunk:
+            # The last chunk of a dataset that is appended to
+            self._chunks = {
+                array_name: np.load(
+                    _chunk_path(self.path, array_name, chunk), mmap_mode="r+"
+                )
+                for array_name in self.index["arrays"]
+            }
+            self._chunk = chunk
+        return self._chunks[name]
+
+    def _write_index(self) -> None:
+        with atomic_write(self.path / _INDEX_FILE, "w") as file:
+            json.dump(self.index, file, default=_to_json)
+
+
+class TrajectoryDataset:
+    """Dataset of trajectories written by :class:`TrajectoryDatasetWriter`,
+    whose episodes are read as views of memory-mapped chunks, so that
+    they are only loaded into memory when they are used.
+
+    :param path: directory of the dataset.
+    :param indices: indices of the episodes of the dataset that are used,
+        defaults to all of them.
+    """
+
+    def __init__(
+        self, path: str | os.PathLike, indices: Sequence[int] | None = None
+    ) -> None:
+        self.path = Path(path)
+        self.index = json.loads((self.path / _INDEX_FILE).read_text())
+        if indices is None:
+            indices = range(len(self.index["episodes"]))
+        self.indices = list(indices)
+        self._chunks: dict[tuple[str, int], NDArray] = {}
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    def __getitem__(self, i: int) -> Episode:
+        episode = self.index["episodes"][self.indices[i]]
+        n_steps = episode["n_steps"]
+        arrays = {}
+        for name, n_rows in [("observations", n_steps + 1), ("actions", n_steps)]:
+            key = (name, episode["chunk"])
+            if key not in self._chunks:
+                self._chunks[key] = np.load(_chunk_path(self.path, *key), mmap_mode="r")
+            offset = episode[f"{name}_offset"]
+            arrays[name] = self._chunks[key][offset : offset + n_rows]
+        return Episode(metadata=episode["metadata"], **arrays)
+
+    def __iter__(self) -> Iterator[Episode]:
+        for i in range(len(self)):
+            yield self[i]
+
+    @property
+    def n_steps(self) -> int:
+        return sum(self.index["episodes"][i]["n_steps"] for i in self.indices)
+
+    def train_test_split(
+        self, test_size: float = 0.2, seed: int = 16
+    ) -> tuple["TrajectoryDataset", "TrajectoryDataset"]:
+        """Splits the episodes at random into a training and a test dataset.
+
+        Args:
+            test_size: Fraction of the episodes in the test dataset.
+            seed: Seed of the split.
+
+        Returns:
+            Training and test datasets, whose episodes keep their order.
+        """
+        permutation = np.random.default_rng(seed).permutation(len(self))
+        n_test = int(round(test_size * len(self)))
+        test, train = np.sort(permutation[:n_test]), np.sort(permutation[n_test:])
+        return (
+            TrajectoryDataset(self.path, [self.indices[i] for i in train]),
+            TrajectoryDataset(self.path, [self.indices[i] for i in test]),
+        )
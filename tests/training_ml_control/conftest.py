@@ -0,0 +1,23 @@
+import casadi
+import numpy as np
+import pytest
+
+from training_ml_control.environments import create_cart_environment
+from training_ml_control.models import build_cart_model
+
+
+@pytest.fixture
+def cart_mpc_kwargs() -> dict:
+    """Keyword arguments of `build_mpc_controller` for a small cart MPC."""
+    env = create_cart_environment(render_mode=None)
+    model = build_cart_model(env)
+    distance_cost = casadi.norm_2(model.x["position"] - env.goal_position)
+    return dict(
+        model=model,
+        t_step=env.dt,
+        n_horizon=10,
+        stage_cost=distance_cost,
+        terminal_cost=distance_cost,
+        u_penalty={"force": 1e-2},
+        u_limits={"force": np.array([-10, 10])},
+    )
@@ -0,0 +1,56 @@
+import numpy as np
+
+from training_ml_control.environments.cart import CartEnv, VectorCartEnv
+
+
+def test_vector_cart_env_step_matchesCartEnv():
+    num_envs = 8
+    vector_env = VectorCartEnv(
+        num_envs, goal_velocity=0, max_position=10, goal_position=9.0
+    )
+    vector_env.reset(seed=16)
+    envs = []
+    for i in range(num_envs):
+        env = CartEnv(goal_velocity=0, max_position=10, goal_position=9.0)
+        env.reset(seed=i)
+        env.state = vector_env.state[i].copy()
+        envs.append(env)
+
+    rng = np.random.default_rng(16)
+    n_terminations = 0
+    for _ in range(300):
+        actions = rng.uniform(-10, 15, size=(num_envs, 1)).astype(np.float32)
+        observations, rewards, terminated, _, infos = vector_env.step(actions)
+        for i, env in enumerate(envs):
+            observation, reward, env_terminated, _, _ = env.step(actions[i])
+            if env_terminated:
+                n_terminations += 1
+                np.testing.assert_array_equal(
+                    infos["final_observation"][i], observation
+                )
+                env.state = vector_env.state[i].copy()
+            else:
+                np.testing.assert_array_equal(observations[i], observation)
+            assert rewards[i] == reward
+            assert terminated[i] == env_terminated
+    assert n_terminations > 0
+
+
+def test_vector_cart_env_reset_matchesCartEnvWithSameSeed():
+    vector_env = VectorCartEnv(1)
+    env = CartEnv()
+    vector_observations, _ = vector_env.reset(seed=42)
+    observation, _ = env.reset(seed=42)
+    np.testing.assert_array_equal(vector_observations[0], observation)
+
+
+def test_vector_cart_env_step_truncatesAfterMaxSteps():
+    vector_env = VectorCartEnv(4, max_steps=5)
+    vector_env.reset(seed=16)
+    for _ in range(4):
+        *_, truncated, _ = vector_env.step(np.zeros((4, 1)))
+        assert not truncated.any()
+    *_, truncated, infos = vector_env.step(np.zeros((4, 1)))
+    assert truncated.all()
+    assert infos["_final_observation"].all()
+    np.testing.assert_array_equal(vector_env.elapsed_steps, 0)
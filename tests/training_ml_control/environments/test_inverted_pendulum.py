@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from training_ml_control.environments.inverted_pendulum import (
+    InvertedPendulumEnv,
+    VectorInvertedPendulumEnv,
+)
+
+
+@pytest.mark.parametrize("kinematics_integrator", ["euler", "rk4"])
+def test_vector_inverted_pendulum_env_step_matchesInvertedPendulumEnv(
+    kinematics_integrator,
+):
+    masspole = np.array([0.1, 0.5, 1.0, 0.5])
+    masscart = np.array([1.0, 1.0, 2.0, 0.5])
+    length = np.array([0.7, 0.5, 1.0, 1.5])
+    num_envs = len(masspole)
+    vector_env = VectorInvertedPendulumEnv(
+        num_envs,
+        masspole=masspole,
+        masscart=masscart,
+        length=length,
+        kinematics_integrator=kinematics_integrator,
+    )
+    vector_env.reset(seed=16)
+    envs = []
+    for i in range(num_envs):
+        env = InvertedPendulumEnv(
+            masspole=masspole[i],
+            masscart=masscart[i],
+            length=length[i],
+            kinematics_integrator=kinematics_integrator,
+        )
+        env.reset(seed=i)
+        env.state = vector_env.state[i].copy()
+        envs.append(env)
+
+    rng = np.random.default_rng(16)
+    n_terminations = 0
+    for _ in range(200):
+        actions = rng.uniform(-40, 40, size=(num_envs, 1)).astype(np.float32)
+        observations, rewards, terminated, _, infos = vector_env.step(actions)
+        for i, env in enumerate(envs):
+            observation, reward, env_terminated, _, _ = env.step(actions[i])
+            assert terminated[i] == env_terminated
+            assert rewards[i] == reward
+            if env_terminated:
+                n_terminations += 1
+                np.testing.assert_allclose(
+                    infos["final_observation"][i], observation, rtol=1e-6
+                )
+                env.reset()
+                env.state = vector_env.state[i].copy()
+            else:
+                np.testing.assert_allclose(observations[i], observation, rtol=1e-6)
+    assert n_terminations > 0
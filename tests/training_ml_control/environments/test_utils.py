@@ -0,0 +1,111 @@
+from functools import partial
+
+import numpy as np
+
+from training_ml_control.control import (
+    ConstantController,
+    PRBSController,
+    RandomController,
+)
+from training_ml_control.environments import (
+    DecimatingFrameSink,
+    FrameListSink,
+    MemmapFrameSink,
+    create_cart_environment,
+    create_inverted_pendulum_environment,
+    simulate_environment,
+    simulate_many,
+)
+
+
+def create_constant_controller(env, u):
+    # Controller factories have to be picklable to be sent to worker processes
+    return ConstantController(u)
+
+
+def test_simulate_many_matchesSerialRuns():
+    env_factory = partial(create_inverted_pendulum_environment, render_mode=None)
+    controller_factories = [
+        RandomController,
+        partial(create_constant_controller, u=np.asarray([1.0])),
+    ]
+    seeds = [16, 17, 18]
+    max_steps = 50
+
+    results = simulate_many(
+        env_factory, controller_factories, seeds, max_steps=max_steps, max_workers=2
+    )
+
+    assert results.observations.shape == (2, 3, max_steps + 1, 4)
+    assert results.actions.shape == (2, 3, max_steps, 1)
+    for i, controller_factory in enumerate(controller_factories):
+        for j, seed in enumerate(seeds):
+            env = env_factory()
+            serial_results = simulate_environment(
+                env,
+                max_steps=max_steps,
+                controller=controller_factory(env),
+                seed=seed,
+            )
+            n_steps = results.episode_lengths[i, j]
+            assert n_steps == len(serial_results.actions)
+            np.testing.assert_array_equal(
+                results.observations[i, j, : n_steps + 1], serial_results.observations
+            )
+            np.testing.assert_array_equal(
+                results.actions[i, j, :n_steps], serial_results.actions
+            )
+            assert np.isnan(results.actions[i, j, n_steps:]).all()
+
+
+def test_simulate_environment_openLoopControllerContinuesAfterEarlyTermination():
+    env = create_inverted_pendulum_environment(render_mode=None)
+    controller = PRBSController(u_max=np.asarray([10.0]), order=5)
+    first = simulate_environment(env, max_steps=500, controller=controller)
+    second = simulate_environment(env, max_steps=20, controller=controller)
+    assert len(first.actions) < 500
+    # The same inputs as when calling act at each step
+    reference = PRBSController(u_max=np.asarray([10.0]), order=5)
+    expected = reference.generate(len(first.actions) + len(second.actions))
+    np.testing.assert_array_equal(
+        np.concatenate([first.actions, second.actions]), expected
+    )
+
+
+def test_simulate_environment_trimsBuffersOnEarlyTermination():
+    env = create_inverted_pendulum_environment(render_mode=None)
+    results = simulate_environment(
+        env,
+        max_steps=500,
+        controller=ConstantController(np.asarray([10.0])),
+    )
+    assert len(results.actions) < 500
+    assert len(results.observations) == len(results.actions) + 1
+    # The dtype of the observation space is kept
+    assert results.observations.dtype == np.float32
+    # Results are views on the preallocated buffers
+    assert results.observations.base is not None
+
+
+def test_simulate_environment_streamsFramesIntoMemmapSink(tmp_path):
+    # The file is reallocated twice for the 11 frames
+    sink = MemmapFrameSink(tmp_path / "frames.npy", capacity=3)
+    env = create_cart_environment(frame_sink=sink)
+    results = simulate_environment(env, max_steps=10)
+    assert results.frames.shape == (11, 400, 600, 3)
+    assert results.frames.dtype == np.uint8
+    frames = np.load(tmp_path / "frames.npy", mmap_mode="r")
+    assert len(frames) == 12
+    np.testing.assert_array_equal(frames[:11], results.frames)
+    # The first frames are kept when the file is reallocated
+    env = create_cart_environment(frame_sink=FrameListSink())
+    expected = simulate_environment(env, max_steps=10).frames
+    np.testing.assert_array_equal(results.frames, np.stack(expected))
+    assert list(tmp_path.iterdir()) == [tmp_path / "frames.npy"]
+
+
+def test_decimating_frame_sink_add_frame_forwardsEveryNthFrame():
+    sink = DecimatingFrameSink(FrameListSink(), every=3)
+    for i in range(10):
+        sink.add_frame(np.full((2, 2, 3), i, dtype=np.uint8))
+    assert [frame[0, 0, 0] for frame in sink.output()] == [0, 3, 6, 9]
@@ -0,0 +1,70 @@
+import time
+
+import numpy as np
+import pytest
+
+from training_ml_control.async_mpc import DeadlineMPCController
+from training_ml_control.control import build_lqr_controller, build_mpc_controller
+
+
+@pytest.fixture
+def cart_lqr(cart_mpc_kwargs):
+    return build_lqr_controller(
+        cart_mpc_kwargs["model"],
+        cart_mpc_kwargs["t_step"],
+        None,
+        np.array([[9.0], [0.0]]),
+        np.diag([100, 1]),
+        np.diag([1e-2]),
+    )
+
+
+def test_make_step_matchesMPCWithinDeadline(cart_mpc_kwargs, cart_lqr):
+    mpc = build_mpc_controller(**cart_mpc_kwargs)
+    x0 = np.array([[0.5], [0.0]])
+    mpc.x0 = x0
+    mpc.set_initial_guess()
+    with DeadlineMPCController(
+        lambda: build_mpc_controller(**cart_mpc_kwargs), 10.0, cart_lqr
+    ) as controller:
+        for _ in range(3):
+            np.testing.assert_allclose(
+                controller.make_step(x0), mpc.make_step(x0), atol=1e-6
+            )
+    assert controller.counts == {"mpc": 3, "shifted": 0, "fallback": 0}
+
+
+def test_make_step_usesShiftedSolutionAndFallbackAfterDeadline(
+    cart_mpc_kwargs, cart_lqr
+):
+    x0 = np.array([[0.5], [0.0]])
+    with DeadlineMPCController(
+        lambda: build_mpc_controller(**cart_mpc_kwargs), 0.0, cart_lqr
+    ) as controller:
+        # No solution yet
+        u0 = controller.make_step(x0)
+        assert controller.last_path == "fallback"
+        np.testing.assert_allclose(u0, cart_lqr.make_step(x0))
+        # The solution for the first step arrives in the meantime
+        time.sleep(1.0)
+        controller.make_step(x0)
+        assert controller.last_path == "shifted"
+    assert controller.counts == {"mpc": 0, "shifted": 1, "fallback": 1}
+
+
+def test_make_step_restartsWorkerAfterItDies(cart_mpc_kwargs, cart_lqr):
+    x0 = np.array([[0.5], [0.0]])
+    with DeadlineMPCController(
+        lambda: build_mpc_controller(**cart_mpc_kwargs), 10.0, cart_lqr
+    ) as controller:
+        controller.make_step(x0)
+        assert controller.last_path == "mpc"
+        controller._worker.kill()
+        controller._worker.join()
+        # The inputs of the last solution are used while the worker restarts
+        controller.make_step(x0)
+        assert controller.last_path == "shifted"
+        assert controller.n_restarts == 1
+        controller.make_step(x0)
+        assert controller.last_path == "mpc"
+    assert controller.counts == {"mpc": 2, "shifted": 1, "fallback": 0}
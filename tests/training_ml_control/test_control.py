@@ -0,0 +1,108 @@
+import numpy as np
+import pytest
+
+from training_ml_control.control import (
+    LQRController,
+    PRBSController,
+    SchroederSweepController,
+    SineController,
+    SumOfSineController,
+    build_lqr_controller,
+    build_mpc_controller,
+)
+from training_ml_control.environments import create_cart_environment
+from training_ml_control.models import build_cart_model
+from training_ml_control.mpc_cache import is_qp
+
+
+@pytest.mark.parametrize(
+    "controller_cls, kwargs",
+    [
+        (SineController, {"frequency": 2.0}),
+        (SumOfSineController, {"frequencies": [0.5, 1.0, 3.0]}),
+        (SchroederSweepController, {"n_harmonics": 5}),
+    ],
+)
+def test_generate_matchesRepeatedAct(controller_cls, kwargs):
+    env = create_cart_environment(render_mode=None)
+    controller = controller_cls(env, **kwargs)
+    other_controller = controller_cls(env, **kwargs)
+    measurement = np.zeros(2)
+    expected = np.stack([controller.act(measurement) for _ in range(50)])
+    np.testing.assert_allclose(other_controller.generate(50), expected, atol=1e-12)
+    # generate advances the controller just like act does
+    np.testing.assert_allclose(
+        other_controller.generate(1)[0], controller.act(measurement), atol=1e-12
+    )
+
+
+def test_prbs_controller_generate_isMaximumLengthSequence():
+    order = 7
+    controller = PRBSController(u_max=np.asarray([2.0]), order=order)
+    period = 2**order - 1
+    u = controller.generate(2 * period)
+    assert u.shape == (2 * period, 1)
+    np.testing.assert_array_equal(u[:period], u[period:])
+    # A maximum-length sequence has one more 1 than 0 per period
+    assert np.count_nonzero(u[:period] > 0) == 2 ** (order - 1)
+    # No shorter period
+    for shift in range(1, period):
+        assert not np.array_equal(u[:period], np.roll(u[:period], shift))
+
+
+def test_lqr_controller_actBatchMatchesMakeStep():
+    env = create_cart_environment(render_mode=None, goal_position=9)
+    setpoint = np.array([[env.goal_position], [0.0]])
+    lqr = build_lqr_controller(
+        build_cart_model(env),
+        env.dt,
+        None,
+        setpoint,
+        np.diag([100, 1]),
+        np.diag([1e-2]),
+    )
+    controller = LQRController.from_lqr(lqr)
+    assert controller.K.shape == (1, 2)
+    rng = np.random.default_rng(16)
+    states = rng.uniform(-10, 10, size=(20, 2))
+    expected = np.stack([lqr.make_step(x.reshape(-1, 1)).ravel() for x in states])
+    np.testing.assert_allclose(controller.act_batch(states), expected, rtol=1e-12)
+    np.testing.assert_allclose(controller.act(states[0]), expected[0], rtol=1e-12)
+
+    # Closed loop with a vectorized environment, towards a setpoint
+    # before the goal, where the episodes would end
+    controller = LQRController(controller.K, setpoint=np.array([3.0, 0.0]))
+    vector_env = create_cart_environment(num_envs=8, goal_position=9, max_steps=1000)
+    observations, _ = vector_env.reset(seed=16)
+    for _ in range(200):
+        actions = np.clip(controller.act_batch(observations), -10, 10)
+        observations, *_ = vector_env.step(actions)
+    np.testing.assert_allclose(observations[:, 0], 3.0, atol=1e-2)
+
+
+def test_build_mpc_controller_solvesQuadraticProgramsWithQPSolver(cart_mpc_kwargs):
+    model = cart_mpc_kwargs["model"]
+    quadratic_cost = (model.x["position"] - 5.0) ** 2
+    kwargs = dict(
+        cart_mpc_kwargs, stage_cost=quadratic_cost, terminal_cost=quadratic_cost
+    )
+    qp_mpc = build_mpc_controller(**kwargs, qp_solver="osqp")
+    nlp_mpc = build_mpc_controller(**kwargs)
+    assert is_qp(qp_mpc)
+    for mpc in (qp_mpc, nlp_mpc):
+        mpc.x0 = np.zeros((2, 1))
+        mpc.set_initial_guess()
+    for x0 in [np.array([[0.0], [0.0]]), np.array([[4.5], [3.0]])]:
+        u_qp = qp_mpc.make_step(x0)
+        u_nlp = nlp_mpc.make_step(x0)
+        assert qp_mpc.solver_stats["success"]
+        np.testing.assert_allclose(u_qp, u_nlp, atol=1e-4)
+
+    # The distance cost of the fixture is an absolute value
+    mpc = build_mpc_controller(**cart_mpc_kwargs, qp_solver="osqp")
+    assert not is_qp(mpc)
+    mpc.x0 = np.zeros((2, 1))
+    mpc.set_initial_guess()
+    mpc.make_step(np.zeros((2, 1)))
+    # Statistics of IPOPT
+    assert "iterations" in mpc.solver_stats
@@ -0,0 +1,78 @@
+import shutil
+
+import casadi
+import numpy as np
+import pytest
+
+from training_ml_control.dynamics import (
+    build_batched_inverted_pendulum_rhs,
+    build_inverted_pendulum_rhs,
+    integrate,
+    numpy_function,
+)
+
+
+def test_numpy_function_matchesCasadiFunction():
+    x = casadi.SX.sym("x", 3)
+    y = casadi.SX.sym("y")
+    function = casadi.Function(
+        "f",
+        [x, y],
+        [
+            casadi.vertcat(
+                casadi.sin(x[0]) * y**2,
+                casadi.fmax(x[1], y) / casadi.exp(x[2]),
+                casadi.if_else(x[0] < y, casadi.atan2(x[1], y), 1.0),
+            ),
+            casadi.sqrt(casadi.fabs(x[2] - y)),
+        ],
+    )
+    translated = numpy_function(function)
+    rng = np.random.default_rng(16)
+    xs, ys = rng.normal(size=(3, 20)), rng.normal(size=(1, 20))
+    for expected, output in zip(function.map(20)(xs, ys), translated(xs, ys)):
+        np.testing.assert_allclose(output, expected.full(), rtol=1e-12)
+    # Single vectors
+    for expected, output in zip(
+        function(xs[:, 0], ys[0, 0]), translated(xs[:, 0], ys[0, 0])
+    ):
+        np.testing.assert_allclose(output, expected.full().ravel(), rtol=1e-12)
+
+
+@pytest.mark.skipif(shutil.which("cc") is None, reason="No C compiler available")
+def test_build_batched_inverted_pendulum_rhs_compiledMatchesMapped():
+    rng = np.random.default_rng(16)
+    states = rng.normal(size=(4, 10))
+    forces = rng.normal(size=(1, 10))
+    parameters = rng.uniform(0.1, 2.0, size=(3, 10))
+    expected = build_batched_inverted_pendulum_rhs(10)(states, forces, parameters)
+    compiled = build_batched_inverted_pendulum_rhs(10, compiled=True)
+    np.testing.assert_allclose(
+        compiled(states, forces, parameters).full(), expected.full(), rtol=1e-12
+    )
+    (translated,) = numpy_function(build_inverted_pendulum_rhs())(
+        states, forces, parameters
+    )
+    np.testing.assert_allclose(translated, expected.full(), rtol=1e-12)
+
+
+@pytest.mark.parametrize(
+    "method, n_substeps, atol",
+    [
+        ("euler", 1000, 1e-2),
+        ("semi-implicit euler", 1000, 1e-2),
+        ("rk4", 20, 1e-5),
+        ("rk45", 1, 1e-5),
+    ],
+)
+def test_integrate_harmonicOscillatorMatchesExactSolution(method, n_substeps, atol):
+    def rhs(state, control):
+        return np.stack([state[1], control - state[0]])
+
+    # Batch of two initial states, with the control held constant
+    state = np.array([[1.0, 2.0], [0.0, 0.0]])
+    result = integrate(rhs, state, 0.5, 2.0, method=method, n_substeps=n_substeps)
+    expected = np.array(
+        [0.5 + (state[0] - 0.5) * np.cos(2.0), -(state[0] - 0.5) * np.sin(2.0)]
+    )
+    np.testing.assert_allclose(result, expected, atol=atol)
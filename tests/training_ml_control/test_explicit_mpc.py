@@ -0,0 +1,95 @@
+import casadi
+import numpy as np
+import pytest
+from scipy.linalg import solve_discrete_are
+
+from training_ml_control.environments import create_cart_environment
+from training_ml_control.explicit_mpc import build_explicit_mpc_controller
+from training_ml_control.models import build_cart_model
+
+N_HORIZON = 3
+Q = np.diag([100.0, 1.0])
+R = np.diag([1e-2])
+X_LIMITS = {"position": np.array([-20.0, 20.0]), "velocity": np.array([-10.0, 10.0])}
+U_LIMITS = {"force": np.array([-10.0, 10.0])}
+
+
+@pytest.fixture(scope="module")
+def cart_model():
+    env = create_cart_environment(render_mode=None)
+    return build_cart_model(env), np.array([env.goal_position, 0.0])
+
+
+@pytest.fixture(scope="module")
+def explicit_mpc(cart_model):
+    model, setpoint = cart_model
+    return build_explicit_mpc_controller(
+        model, N_HORIZON, setpoint, Q, R, x_limits=X_LIMITS, u_limits=U_LIMITS
+    )
+
+
+def solve_mpc(model, setpoint: np.ndarray, x0: np.ndarray) -> float | None:
+    A, B = np.asarray(model.sys_A), np.asarray(model.sys_B)
+    opti = casadi.Opti()
+    X = opti.variable(2, N_HORIZON + 1)
+    U = opti.variable(1, N_HORIZON)
+    opti.subject_to(X[:, 0] == x0)
+    cost = casadi.bilin(solve_discrete_are(A, B, Q, R), X[:, -1] - setpoint)
+    for k in range(N_HORIZON):
+        opti.subject_to(X[:, k + 1] == A @ X[:, k] + B @ U[:, k])
+        for variable, (lower, upper) in [
+            (U[0, k], U_LIMITS["force"]),
+            (X[0, k + 1], X_LIMITS["position"]),
+            (X[1, k + 1], X_LIMITS["velocity"]),
+        ]:
+            opti.subject_to(opti.bounded(lower, variable, upper))
+        cost += casadi.bilin(Q, X[:, k] - setpoint) + casadi.bilin(R, U[:, k])
+    opti.minimize(cost)
+    opti.solver("ipopt", {"print_time": False}, {"print_level": 0, "tol": 1e-10})
+    try:
+        return opti.solve().value(U[0, 0])
+    except RuntimeError:
+        return None
+
+
+def test_act_matchesOnlineSolution(cart_model, explicit_mpc):
+    model, setpoint = cart_model
+    rng = np.random.default_rng(16)
+    n_solved = 0
+    for x0 in rng.uniform([-20, -10], [20, 10], size=(20, 2)):
+        expected = solve_mpc(model, setpoint, x0)
+        if expected is None:
+            continue
+        n_solved += 1
+        assert explicit_mpc.locate(x0) >= 0
+        np.testing.assert_allclose(explicit_mpc.act(x0), [expected], atol=1e-5)
+    assert n_solved > 10
+
+
+def test_act_isLQRNearSetpoint(cart_model, explicit_mpc):
+    model, setpoint = cart_model
+    A, B = np.asarray(model.sys_A), np.asarray(model.sys_B)
+    P = solve_discrete_are(A, B, Q, R)
+    K = np.linalg.solve(R + B.T @ P @ B, B.T @ P @ A)
+    x = setpoint + np.array([0.01, -0.02])
+    np.testing.assert_allclose(explicit_mpc.act(x), -K @ (x - setpoint), rtol=1e-8)
+    # Saturated far from the setpoint, also outside of the domain
+    np.testing.assert_allclose(explicit_mpc.act(np.array([-15.0, 0.0])), [10.0])
+    np.testing.assert_allclose(explicit_mpc.act(np.array([-100.0, 0.0])), [10.0])
+
+
+def test_build_explicit_mpc_controller_requiresAllStateLimits(cart_model):
+    model, setpoint = cart_model
+    with pytest.raises(ValueError):
+        build_explicit_mpc_controller(
+            model, N_HORIZON, setpoint, Q, R, x_limits={"position": [-20, 20]}
+        )
+
+
+def test_build_explicit_mpc_controller_logsRegionCount(cart_model, caplog):
+    model, setpoint = cart_model
+    with caplog.at_level("INFO", logger="training_ml_control.explicit_mpc"):
+        controller = build_explicit_mpc_controller(
+            model, 1, setpoint, Q, R, x_limits=X_LIMITS, u_limits=U_LIMITS
+        )
+    assert f"{controller.n_regions} critical regions" in caplog.text
@@ -0,0 +1,17 @@
+import pytest
+
+from training_ml_control._files import atomic_write
+
+
+def test_atomic_write_keepsFileOnFailure(tmp_path):
+    path = tmp_path / "entry.json"
+    with atomic_write(path, "w") as file:
+        file.write("first")
+    assert path.read_text() == "first"
+
+    with pytest.raises(RuntimeError):
+        with atomic_write(path, "w") as file:
+            file.write("second")
+            raise RuntimeError
+    assert path.read_text() == "first"
+    assert list(tmp_path.iterdir()) == [path]
@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+from scipy.linalg import solve_discrete_are
+
+from training_ml_control.environments import create_inverted_pendulum_environment
+from training_ml_control.gain_scheduling import (
+    GainScheduledLQRController,
+    LQRGainTable,
+    build_inverted_pendulum_lqr_gain_table,
+    discretize_zoh,
+    linearize_inverted_pendulum,
+    solve_discrete_are_batched,
+)
+
+Q = np.diag([100.0, 1.0])
+R = np.diag([1e-2])
+
+
+def test_solve_discrete_are_batched_matchesScipy():
+    rng = np.random.default_rng(16)
+    A = rng.normal(size=(5, 3, 3))
+    B = rng.normal(size=(5, 3, 2))
+    P = solve_discrete_are_batched(A, B, np.eye(3), np.eye(2))
+    for i in range(5):
+        expected = solve_discrete_are(A[i], B[i], np.eye(3), np.eye(2))
+        np.testing.assert_allclose(P[i], expected, rtol=1e-8)
+
+
+def test_linearize_inverted_pendulum_matchesFiniteDifferences():
+    env = create_inverted_pendulum_environment(render_mode=None).unwrapped
+    A, B = linearize_inverted_pendulum(
+        env.gravity, [0.1, env.masspole], env.masscart, [0.5, env.length]
+    )
+    assert A.shape == (2, 4, 4) and B.shape == (2, 4, 1)
+
+    # Central differences of the dynamics simulated by the environment
+    parameters = (env.masspole, env.masscart, env.length)
+    epsilon = 1e-6
+    columns = []
+    for delta in np.eye(5) * epsilon:
+        (forward,) = env.rhs(delta[:4], delta[4], parameters)
+        (backward,) = env.rhs(-delta[:4], -delta[4], parameters)
+        columns.append((forward - backward) / (2 * epsilon))
+    jacobian = np.stack(columns, axis=1)
+    np.testing.assert_allclose(A[1], jacobian[:, :4], atol=1e-6)
+    np.testing.assert_allclose(B[1], jacobian[:, 4:], atol=1e-6)
+
+
+def test_build_inverted_pendulum_lqr_gain_table_matchesLQR(tmp_path):
+    env = create_inverted_pendulum_environment(render_mode=None)
+    table = build_inverted_pendulum_lqr_gain_table(
+        env, Q, R, masspole=[0.1, 0.3, 0.5], length=[0.5, 1.0]
+    )
+    assert table.gains.shape == (3, 2, 1, 2)
+    table.save(tmp_path / "gains.npz")
+    table = LQRGainTable.load(tmp_path / "gains.npz")
+    assert table.parameter_names == ("masspole", "length")
+
+    controller = GainScheduledLQRController(
+        table, np.zeros(2), observation_indices=[2, 3], masspole=0.3, length=0.5
+    )
+    env = env.unwrapped
+    A, B = linearize_inverted_pendulum(env.gravity, 0.3, env.masscart, 0.5)
+    A, B = discretize_zoh(A[2:, 2:], B[2:], env.dt)
+    P = solve_discrete_are(A, B, Q, R)
+    K = np.linalg.solve(R + B.T @ P @ B, B.T @ P @ A)
+    x = np.array([0.3, 0.5, 0.1, -0.2])
+    np.testing.assert_allclose(controller.act(x), -K @ x[2:], rtol=1e-8)
+
+    # Interpolated in between, keeping the parameters that are not given
+    controller.set_parameters(masspole=0.2)
+    controller.set_parameters(length=0.75)
+    assert controller.parameters == {"masspole": 0.2, "length": 0.75}
+    expected = np.mean([table.gains[i, j] for i in (0, 1) for j in (0, 1)], axis=0)
+    np.testing.assert_allclose(controller.K, expected)
+    with pytest.raises(ValueError):
+        controller.set_parameters(masspole=1.0)
+    assert controller.parameters["masspole"] == 0.2
+    np.testing.assert_array_equal(controller.observation_indices, [2, 3])
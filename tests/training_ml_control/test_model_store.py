@@ -0,0 +1,55 @@
+import casadi
+import numpy as np
+import pysindy as ps
+import pytest
+
+from training_ml_control.model_store import fit_identified_model, model_store_key
+
+
+@pytest.fixture(scope="module")
+def training_data():
+    rng = np.random.default_rng(16)
+    dt = 0.02
+    t = np.arange(0, 10, dt)
+    U = np.sin(t)[:, np.newaxis] + 0.1 * rng.normal(size=(len(t), 1))
+    X = np.stack([np.cos(t), np.sin(t), np.cos(2 * t)], axis=1)
+    return X, U, dt
+
+
+def create_sindy_model(threshold: float = 0.05) -> ps.SINDy:
+    return ps.SINDy(
+        optimizer=ps.STLSQ(threshold=threshold),
+        feature_library=ps.PolynomialLibrary(degree=3),
+    )
+
+
+def test_fit_identified_model_storeHitMatchesFit(tmp_path, training_data):
+    X, U, dt = training_data
+    fitted = fit_identified_model(create_sindy_model(), X, U, dt, store_dir=tmp_path)
+    assert len(list(tmp_path.glob("model-*.pkl"))) == 1
+    estimator = create_sindy_model()
+    loaded = fit_identified_model(estimator, X, U, dt, store_dir=tmp_path)
+    assert len(list(tmp_path.glob("model-*.pkl"))) == 1
+    assert not hasattr(estimator, "model")
+
+    assert loaded.key == fitted.key
+    assert loaded.feature_names == fitted.feature_names
+    np.testing.assert_array_equal(
+        loaded.coefficients["coefficients"], fitted.coefficients["coefficients"]
+    )
+    x = np.random.default_rng(16).normal(size=(3, 5))
+    u = np.ones((1, 5))
+    for identified in (fitted, loaded):
+        model = identified.build_model()
+        assert model.model_type == "continuous"
+        rhs = casadi.Function("rhs", [model.x.cat, model.u.cat], [model._rhs])
+        np.testing.assert_allclose(rhs(x, u), fitted.rhs(x, u))
+
+
+def test_model_store_key_dependsOnHyperparametersAndData(training_data):
+    X, U, dt = training_data
+    keys = {
+        model_store_key(create_sindy_model(threshold), X_, U, dt)
+        for threshold, X_ in [(0.05, X), (0.05, X.copy()), (0.1, X), (0.05, 2 * X)]
+    }
+    assert len(keys) == 3
@@ -0,0 +1,66 @@
+import casadi
+import numpy as np
+import pysindy as ps
+import pytest
+
+from training_ml_control.models import build_dmd_model, build_sindy_model
+
+
+@pytest.mark.parametrize("threshold", [0.0, 0.05])
+def test_build_sindy_model_matchesPrediction(threshold, caplog):
+    rng = np.random.default_rng(16)
+    dt = 0.02
+    t = np.arange(0, 10, dt)
+    U = np.sin(t)[:, np.newaxis] + 0.1 * rng.normal(size=(len(t), 1))
+    X = np.stack([np.cos(t), np.sin(t), np.cos(2 * t)], axis=1)
+    sindy_model = ps.SINDy(
+        optimizer=ps.STLSQ(threshold=threshold),
+        feature_library=ps.PolynomialLibrary(degree=3),
+        differentiation_method=ps.FiniteDifference(order=1),
+    )
+    sindy_model.fit(X, u=U, t=dt)
+
+    with caplog.at_level("INFO", logger="training_ml_control.models.sindy"):
+        model = build_sindy_model(sindy_model)
+    assert f"{casadi.n_nodes(model._rhs)} after" in caplog.text
+    rhs = casadi.Function("rhs", [model.x.cat, model.u.cat], [model._rhs])
+    x = rng.normal(size=(5, 3))
+    u = rng.normal(size=(5, 1))
+    np.testing.assert_allclose(
+        rhs(x.T, u.T).full().T, sindy_model.predict(x, u=u), rtol=1e-10, atol=1e-10
+    )
+
+
+@pytest.mark.parametrize(
+    "observables", ["identity", "polynomial", "fourier", "time-delay"]
+)
+def test_build_dmd_model_matchesSimulation(observables):
+    pk = pytest.importorskip("pykoopman")
+    rng = np.random.default_rng(16)
+    dt = 0.02
+    t = np.arange(0, 10, dt)
+    U = np.sin(t)[:, np.newaxis] + 0.1 * rng.normal(size=(len(t), 1))
+    X = np.stack([np.cos(t), np.sin(t), np.cos(2 * t)], axis=1)
+    if observables == "identity":
+        obsv = pk.observables.Identity()
+    elif observables == "polynomial":
+        obsv = pk.observables.Polynomial(degree=2)
+    elif observables == "fourier":
+        obsv = pk.observables.RandomFourierFeatures(D=4, random_state=16)
+    else:
+        obsv = pk.observables.TimeDelay(delay=2, n_delays=2)
+    n_past = getattr(obsv, "delay", 0) * getattr(obsv, "n_delays", 0)
+    dmd_model = pk.Koopman(observables=obsv, regressor=pk.regression.EDMDc())
+    dmd_model.fit(X, u=U[n_past:], dt=dt)
+
+    model = build_dmd_model(dmd_model)
+    rhs = casadi.Function("rhs", [model.x.cat, model.u.cat], [model._rhs])
+    k = 100
+    # Current state first, followed by the past states
+    x = np.concatenate([X[k - i] for i in range(n_past + 1)])
+    x_next = rhs(x, U[k]).full().ravel()
+    expected = dmd_model.simulate(
+        X[k - n_past : k + 1] if n_past else X[k], U[k : k + 1], n_steps=1
+    )
+    np.testing.assert_allclose(x_next[:3], expected[0], atol=1e-10)
+    np.testing.assert_allclose(x_next[3:], x[:-3])
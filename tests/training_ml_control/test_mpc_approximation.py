@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+from sklearn.neighbors import KNeighborsRegressor
+
+from training_ml_control.control import build_mpc_controller
+from training_ml_control.mpc_approximation import (
+    approximate_mpc_policy,
+    generate_mpc_dataset,
+)
+
+SAMPLE_LIMITS = {"position": [-1.0, 1.0], "velocity": [-1.0, 1.0]}
+
+
+def test_generate_mpc_dataset_parallelMatchesSequential(cart_mpc_kwargs):
+    def factory():
+        return build_mpc_controller(**cart_mpc_kwargs)
+
+    sequential = generate_mpc_dataset(factory, 8, SAMPLE_LIMITS, n_workers=0)
+    parallel = generate_mpc_dataset(factory, 8, SAMPLE_LIMITS, n_workers=2)
+    assert sequential.states.shape == (8, 2) and sequential.inputs.shape == (8, 1)
+    assert np.all(np.abs(sequential.states) <= 1.0)
+    assert sequential.success.all()
+    np.testing.assert_array_equal(parallel.states, sequential.states)
+    np.testing.assert_allclose(parallel.inputs, sequential.inputs, rtol=1e-6)
+
+
+def test_approximate_mpc_policy_clipsToInputLimits(cart_mpc_kwargs):
+    controller, report = approximate_mpc_policy(
+        lambda: build_mpc_controller(**cart_mpc_kwargs),
+        20,
+        SAMPLE_LIMITS,
+        regressor=KNeighborsRegressor(n_neighbors=1),
+        n_workers=0,
+    )
+    assert (report.n_train, report.n_test, report.n_failed) == (16, 4, 0)
+    assert report.max_error >= report.rmse >= 0
+    assert report.speedup > 1
+    np.testing.assert_array_equal(controller.u_upper, [10])
+    u = controller.act_batch(np.array([[-1.0, 0.0], [1.0, 0.0]]))
+    assert u.shape == (2, 1) and np.all(np.abs(u) <= 10)
+    assert controller.act(np.array([-1.0, 0.0])).shape == (1,)
+
+
+def test_approximate_mpc_policy_emptyTestSplitRaises(cart_mpc_kwargs):
+    with pytest.raises(ValueError, match="at least one state"):
+        approximate_mpc_policy(
+            lambda: build_mpc_controller(**cart_mpc_kwargs),
+            4,
+            SAMPLE_LIMITS,
+            test_size=0.1,
+            n_workers=0,
+        )
@@ -0,0 +1,66 @@
+import shutil
+
+import numpy as np
+import pytest
+from do_mpc.controller import MPC
+
+from training_ml_control.control import build_mpc_controller
+from training_ml_control.mpc_cache import compile_mpc_solver, mpc_cache_key, setup_mpc
+
+
+def solve(mpc: MPC, n_steps: int = 3) -> list[float]:
+    x0 = np.array([[0.5], [0.0]])
+    mpc.x0 = x0
+    mpc.set_initial_guess()
+    return [mpc.make_step(x0).item() for _ in range(n_steps)]
+
+
+def configure_mpc(kwargs: dict, n_horizon: int = 10, u_max: float = 10.0) -> MPC:
+    mpc = MPC(kwargs["model"])
+    mpc.set_param(n_horizon=n_horizon, t_step=kwargs["t_step"])
+    mpc.set_objective(mterm=kwargs["terminal_cost"], lterm=kwargs["stage_cost"])
+    mpc.bounds["upper", "_u", "force"] = u_max
+    return mpc
+
+
+def test_setup_mpc_cacheHitMatchesSetup(tmp_path, cart_mpc_kwargs):
+    expected = solve(build_mpc_controller(**cart_mpc_kwargs))
+
+    cold = build_mpc_controller(**cart_mpc_kwargs, cache_dir=tmp_path)
+    assert len(list(tmp_path.glob("mpc-*.pkl"))) == 1
+    warm = build_mpc_controller(**cart_mpc_kwargs, cache_dir=tmp_path)
+    assert len(list(tmp_path.glob("mpc-*.pkl"))) == 1
+
+    np.testing.assert_allclose(solve(cold), expected)
+    np.testing.assert_allclose(solve(warm), expected)
+    assert warm.data["_u"].shape == (3, 1)
+
+
+def test_setup_mpc_returnsWhetherCacheWasHit(tmp_path, cart_mpc_kwargs):
+    assert not setup_mpc(configure_mpc(cart_mpc_kwargs), tmp_path)
+    assert setup_mpc(configure_mpc(cart_mpc_kwargs), tmp_path)
+    assert not setup_mpc(configure_mpc(cart_mpc_kwargs, n_horizon=5), tmp_path)
+    assert len(list(tmp_path.glob("mpc-*.pkl"))) == 2
+
+
+def test_mpc_cache_key_dependsOnHorizonAndBounds(cart_mpc_kwargs):
+    keys = {
+        mpc_cache_key(configure_mpc(cart_mpc_kwargs, n_horizon, u_max))
+        for n_horizon, u_max in [(10, 10), (10, 10), (20, 10), (10, 5)]
+    }
+    assert len(keys) == 3
+
+
+@pytest.mark.skipif(shutil.which("cc") is None, reason="No C compiler available")
+def test_compile_mpc_solver_reusesLibraryAndMatchesSolution(tmp_path, cart_mpc_kwargs):
+    expected = solve(build_mpc_controller(**cart_mpc_kwargs))
+
+    mpc = build_mpc_controller(**cart_mpc_kwargs, cache_dir=tmp_path, compile="codegen")
+    (library,) = tmp_path.glob("mpc-*.so")
+    modified = library.stat().st_mtime_ns
+    np.testing.assert_allclose(solve(mpc), expected, rtol=1e-6)
+
+    mpc = build_mpc_controller(**cart_mpc_kwargs, cache_dir=tmp_path)
+    assert compile_mpc_solver(mpc, tmp_path) == library
+    assert library.stat().st_mtime_ns == modified
+    np.testing.assert_allclose(solve(mpc), expected, rtol=1e-6)
@@ -0,0 +1,61 @@
+import contextlib
+import io
+
+import numpy as np
+
+from training_ml_control.control import build_mpc_controller
+from training_ml_control.mpc_telemetry import SOLVER_PHASES, MPCTelemetry
+
+
+def run(mpc, n_steps: int) -> None:
+    x0 = np.array([[0.5], [0.0]])
+    mpc.x0 = x0
+    mpc.set_initial_guess()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(n_steps):
+            mpc.make_step(x0)
+
+
+def test_make_step_recordsSolverStatistics(cart_mpc_kwargs):
+    telemetry = MPCTelemetry(build_mpc_controller(**cart_mpc_kwargs))
+    run(telemetry, 4)
+    records = telemetry.records
+    np.testing.assert_array_equal(records["step"], np.arange(4))
+    assert records["success"].all() and telemetry.n_failures == 0
+    assert (records["iter_count"] > 0).all()
+    assert (records["wall_time"] >= records["solver_time"]).all()
+    phase_times = sum(records[f"t_{phase}"] for phase in SOLVER_PHASES)
+    np.testing.assert_allclose(
+        phase_times + records["ipopt_time"], records["solver_time"]
+    )
+    # Forwarded to the wrapped controller
+    assert telemetry.data["_u"].shape == (4, 1)
+
+    df = telemetry.to_dataframe()
+    assert len(df) == 4 and "return_status" in df.columns
+    percentiles = telemetry.latency_percentiles((0, 50, 100))
+    assert percentiles[0] <= percentiles[50] <= percentiles[100]
+    assert percentiles[100] == records["wall_time"].max()
+
+
+def test_records_keepsMostRecentStepsInOrder(cart_mpc_kwargs):
+    telemetry = MPCTelemetry(build_mpc_controller(**cart_mpc_kwargs), capacity=3)
+    run(telemetry, 5)
+    np.testing.assert_array_equal(telemetry.records["step"], [2, 3, 4])
+    assert telemetry.n_steps == 5
+    telemetry.reset()
+    assert len(telemetry.records) == 0
+    assert np.isnan(telemetry.latency_percentiles()[50])
+
+
+def test_setattr_forwardsToController(cart_mpc_kwargs):
+    mpc = build_mpc_controller(**cart_mpc_kwargs)
+    telemetry = MPCTelemetry(mpc)
+    x0, u0 = np.array([[0.5], [0.2]]), np.array([[3.0]])
+    telemetry.x0 = x0
+    telemetry.u0 = u0
+    np.testing.assert_array_equal(mpc.x0.cat.full(), x0)
+    np.testing.assert_array_equal(mpc.u0.cat.full(), u0)
+    assert "x0" not in vars(telemetry)
+    telemetry.set_initial_guess()
+    np.testing.assert_allclose(mpc.opt_x_num["_x", 0, 0, -1].full(), x0)
@@ -0,0 +1,153 @@
+import casadi
+import numpy as np
+import pysindy as ps
+import pytest
+
+from training_ml_control.environments import (
+    create_inverted_pendulum_environment,
+    simulate_environment,
+)
+from training_ml_control.models import build_dmd_model
+from training_ml_control.online_identification import (
+    OnlineEDMDc,
+    OnlineSINDy,
+    RecursiveLeastSquares,
+)
+
+
+def test_recursive_least_squares_matchesWeightedLeastSquares():
+    rng = np.random.default_rng(16)
+    features = rng.normal(size=(90, 4))
+    targets = features @ rng.normal(size=(4, 2)) + 0.1 * rng.normal(size=(90, 2))
+    batches = np.split(np.arange(90), [30, 50])
+
+    for forgetting_factor, window in [(1.0, None), (0.95, None), (1.0, 2), (0.95, 2)]:
+        rls = RecursiveLeastSquares(
+            4, 2, forgetting_factor=forgetting_factor, window=window
+        )
+        for batch in batches:
+            rls.update(features[batch], targets[batch])
+        used = np.concatenate(batches[-window:] if window else batches)
+        weights = np.sqrt(forgetting_factor ** np.arange(len(used) - 1, -1, -1))
+        expected = np.linalg.lstsq(
+            features[used] * weights[:, np.newaxis],
+            targets[used] * weights[:, np.newaxis],
+            rcond=None,
+        )[0]
+        np.testing.assert_allclose(rls.coefficients(), expected.T, atol=1e-10)
+    assert rls.n_samples == 90
+
+
+def simulate_pendulum(seeds: list[int], masspole: float | None = None):
+    env = create_inverted_pendulum_environment(render_mode=None, masspole=masspole)
+    for seed in seeds:
+        results = simulate_environment(env, max_steps=100, seed=seed, dtype=np.float64)
+        yield results.observations, results.actions
+
+
+def create_sindy_model() -> ps.SINDy:
+    return ps.SINDy(
+        optimizer=ps.STLSQ(threshold=0.1, alpha=0.05),
+        feature_library=ps.PolynomialLibrary(degree=2),
+    )
+
+
+def test_online_sindy_matchesBatchFit():
+    dt = create_inverted_pendulum_environment(render_mode=None).dt
+    trajectories = list(simulate_pendulum([1, 2, 3]))
+    online = OnlineSINDy(ps.PolynomialLibrary(degree=2), dt)
+    for observations, actions in trajectories:
+        online.update(observations, actions)
+
+    differentiation_method = ps.FiniteDifference()
+    batch = create_sindy_model()
+    batch.fit(
+        [observations[:-1] for observations, _ in trajectories],
+        u=[actions for _, actions in trajectories],
+        x_dot=[
+            differentiation_method(observations, t=dt)[:-1]
+            for observations, _ in trajectories
+        ],
+        t=dt,
+        multiple_trajectories=True,
+    )
+    np.testing.assert_allclose(online.coefficients, batch.coefficients(), atol=1e-8)
+    model = online.model
+    rhs = casadi.Function("rhs", [model.x.cat, model.u.cat], [model._rhs])
+    x, u = trajectories[0]
+    np.testing.assert_allclose(
+        rhs(x[:-1].T, u.T).full().T, batch.predict(x[:-1], u=u), atol=1e-8
+    )
+
+
+def simulate_duffing(seed: int, damping: float, n_steps: int = 2000):
+    """Damped Duffing oscillator with piecewise constant random inputs,
+    recorded like the trajectories of simulate_environment."""
+    rng = np.random.default_rng(seed)
+    dt = 0.01
+    actions = np.repeat(rng.uniform(-1, 1, size=(n_steps // 50, 1)), 50, axis=0)
+    observations = np.zeros((n_steps + 1, 2))
+    observations[0] = rng.uniform(-1, 1, size=2)
+    for k in range(n_steps):
+        x, v = observations[k]
+        dv = -x - damping * v - x**3 + actions[k, 0]
+        observations[k + 1] = observations[k] + dt * np.array([v, dv])
+    return observations, actions
+
+
+def test_online_sindy_republishesWhenCoefficientsDrift():
+    online = OnlineSINDy(
+        ps.PolynomialLibrary(degree=3),
+        dt=0.01,
+        forgetting_factor=0.999,
+        drift_tolerance=0.05,
+    )
+    assert online.update(*simulate_duffing(1, damping=0.5))
+    model = online.model
+    assert not online.update(*simulate_duffing(2, damping=0.5))
+    assert online.model is model
+
+    assert online.update(*simulate_duffing(3, damping=1.5))
+    assert online.n_published == 2
+    assert online.model is not model
+    damping = -online.coefficients[1, 2]
+    assert 1.0 < damping < 1.5
+
+
+def test_online_edmdc_matchesBatchFit():
+    pk = pytest.importorskip("pykoopman")
+    trajectories = [simulate_duffing(seed, damping=0.5, n_steps=500) for seed in (1, 2)]
+    online = OnlineEDMDc(
+        pk.observables.TimeDelay(delay=1, n_delays=2), drift_tolerance=0.0
+    )
+    for observations, actions in trajectories:
+        online.update(observations, actions)
+    assert online.model.n_x == 6
+
+    features, targets = [], []
+    for observations, actions in trajectories:
+        lifted = online.observables.transform(observations)
+        features.append(np.hstack([lifted[:-1], actions[2:]]))
+        targets.append(lifted[1:])
+    expected = np.linalg.lstsq(np.vstack(features), np.vstack(targets), rcond=None)[0]
+    np.testing.assert_allclose(online.A, expected[:6].T, atol=1e-8)
+    np.testing.assert_allclose(online.B, expected[6:].T, atol=1e-8)
+
+    # The same model as that of the Koopman model fitted by EDMDc
+    koopman_model = pk.Koopman(
+        observables=pk.observables.TimeDelay(delay=1, n_delays=2),
+        regressor=pk.regression.EDMDc(),
+    )
+    observations, actions = trajectories[0]
+    koopman_model.fit(observations, u=actions[2:], dt=0.01)
+    online = OnlineEDMDc(pk.observables.TimeDelay(delay=1, n_delays=2))
+    online.update(observations, actions)
+    expected_model = build_dmd_model(koopman_model)
+    rhs, expected_rhs = [
+        casadi.Function("rhs", [model.x.cat, model.u.cat], [model._rhs])
+        for model in (online.model, expected_model)
+    ]
+    x = np.hstack([observations[2:-1], observations[1:-2], observations[:-3]])
+    np.testing.assert_allclose(
+        rhs(x.T, actions[2:].T), expected_rhs(x.T, actions[2:].T), atol=1e-6
+    )
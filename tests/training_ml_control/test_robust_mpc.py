@@ -0,0 +1,67 @@
+import functools
+
+import casadi
+import numpy as np
+import pytest
+
+from training_ml_control.control import build_mpc_controller
+from training_ml_control.environments import create_inverted_pendulum_environment
+from training_ml_control.models import build_inverted_pendulum_nonlinear_model
+from training_ml_control.robust_mpc import (
+    evaluate_scenario_configurations,
+    reduce_scenarios,
+)
+
+
+def test_reduce_scenarios_keepsNominalAndExtremes():
+    values = {"m_p": [1.0, 1.2, 0.8, 1.1], "length": [0.5, 0.6]}
+    full = reduce_scenarios(values)
+    assert len(full["m_p"]) == 8
+    assert (full["m_p"][0], full["length"][0]) == (1.0, 0.5)
+
+    extreme = reduce_scenarios(values, "extreme")
+    combinations = set(zip(extreme["m_p"], extreme["length"]))
+    # The nominal length is also the smallest one
+    assert combinations == {(1.0, 0.5), (0.8, 0.5), (0.8, 0.6), (1.2, 0.5), (1.2, 0.6)}
+    assert (extreme["m_p"][0], extreme["length"][0]) == (1.0, 0.5)
+
+
+def test_reduce_scenarios_capsNumberOfBranches():
+    values = {"m_p": [1.0, 1.2, 0.8, 1.1, 0.9, 1.3, 0.7]}
+    representative = reduce_scenarios(values, "representative", max_branches=3)
+    np.testing.assert_allclose(representative["m_p"], [1.0, 1.3, 0.7])
+    assert len(reduce_scenarios(values, "full", max_branches=5)["m_p"]) == 5
+    with pytest.raises(ValueError):
+        reduce_scenarios(values, "representative")
+
+
+def test_evaluate_scenario_configurations_reportsSmallerProblems():
+    env = create_inverted_pendulum_environment(render_mode=None)
+    model = build_inverted_pendulum_nonlinear_model(env, with_uncertainty=True)
+    cost = casadi.bilin(np.diag([1, 0, 100, 1]), model.x.cat)
+    factory = functools.partial(
+        build_mpc_controller,
+        model=model,
+        t_step=env.dt,
+        n_horizon=5,
+        stage_cost=cost,
+        terminal_cost=cost,
+        u_limits={"force": np.array([-30, 30])},
+        uncertainty_values={"m_p": env.masspole * np.array([1.0, 1.2, 0.8, 1.1])},
+        n_robust=2,
+    )
+    configurations = {
+        "full": {},
+        "extreme": {"scenario_reduction": "extreme"},
+        "representative": {"scenario_reduction": "representative", "max_branches": 2},
+    }
+    states = np.tile([0.0, 0.0, 0.1, 0.0], (3, 1))
+    reports = evaluate_scenario_configurations(
+        factory, configurations, states, n_workers=2
+    )
+    assert [report.name for report in reports] == list(configurations)
+    assert [report.n_scenarios for report in reports] == [16, 9, 4]
+    assert reports[0].n_variables > reports[1].n_variables > reports[2].n_variables
+    for report in reports:
+        assert report.latencies.shape == (3,)
+        assert report.n_failures == 0
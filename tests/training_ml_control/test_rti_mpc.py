@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from training_ml_control.environments import create_inverted_pendulum_environment
+from training_ml_control.models import build_inverted_pendulum_nonlinear_model
+from training_ml_control.rti_mpc import build_rti_mpc_controller
+
+Q = np.diag([1.0, 0.0, 100.0, 1.0])
+R = np.diag([1e-3])
+U_LIMITS = {"force": np.array([-30.0, 30.0])}
+
+
+@pytest.fixture
+def inverted_pendulum_env():
+    return create_inverted_pendulum_environment(render_mode=None, max_steps=500)
+
+
+def test_make_step_stabilizesInvertedPendulum(inverted_pendulum_env):
+    env = inverted_pendulum_env
+    model = build_inverted_pendulum_nonlinear_model(env)
+    controller = build_rti_mpc_controller(
+        model,
+        env.dt,
+        n_horizon=50,
+        setpoint=np.zeros(4),
+        Q=Q,
+        R=R,
+        x_limits={"position": np.array([-3.0, 3.0])},
+        u_limits=U_LIMITS,
+    )
+    env.reset(seed=16)
+    env.unwrapped.state = np.array([1.0, 0.0, 0.3, 0.0])
+    observation = env.unwrapped.state
+    for _ in range(150):
+        u = controller.make_step(observation.reshape(-1, 1))
+        assert u.shape == (1, 1)
+        assert U_LIMITS["force"][0] - 1e-6 <= u[0, 0] <= U_LIMITS["force"][1] + 1e-6
+        observation, _, terminated, _, _ = env.step(u.ravel())
+        assert not terminated
+        assert controller.solver_stats["success"]
+    np.testing.assert_allclose(observation[2:], 0.0, atol=0.05)
+
+
+def test_build_rti_mpc_controller_rejectsParameters(inverted_pendulum_env):
+    model = build_inverted_pendulum_nonlinear_model(
+        inverted_pendulum_env, with_uncertainty=True
+    )
+    with pytest.raises(ValueError):
+        build_rti_mpc_controller(model, 0.02, 10, np.zeros(4), Q, R)
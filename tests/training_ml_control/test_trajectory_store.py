@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from training_ml_control.environments import (
+    create_inverted_pendulum_environment,
+    simulate_environment,
+)
+from training_ml_control.trajectory_store import (
+    TrajectoryDataset,
+    TrajectoryDatasetWriter,
+)
+
+
+def test_trajectory_dataset_writer_record_roundTrip(tmp_path):
+    env = create_inverted_pendulum_environment(render_mode=None)
+    writer = TrajectoryDatasetWriter(tmp_path, chunk_size=60)
+    for seed in range(3):
+        writer.record(env, max_steps=100, seed=seed, metadata={"split": "random"})
+    # Appending to the existing dataset
+    writer = TrajectoryDatasetWriter(tmp_path)
+    writer.record(env, max_steps=100, seed=3)
+
+    dataset = TrajectoryDataset(tmp_path)
+    assert len(dataset) == 4
+    # The episodes of 55, 36, 25 and 23 observations fill chunks of 60 steps
+    assert [episode["chunk"] for episode in dataset.index["episodes"]] == [0, 1, 2, 2]
+    for seed, episode in enumerate(dataset):
+        results = simulate_environment(env, max_steps=100, seed=seed)
+        assert isinstance(episode.observations, np.memmap)
+        assert episode.observations.dtype == results.observations.dtype
+        np.testing.assert_array_equal(episode.observations, results.observations)
+        np.testing.assert_array_equal(episode.actions, results.actions)
+        assert episode.metadata["controller"] == "RandomController"
+        assert episode.metadata["seed"] == seed
+        assert episode.metadata["dt"] == env.unwrapped.dt
+        assert episode.metadata["env_parameters"]["masspole"] == env.unwrapped.masspole
+    assert dataset[0].metadata["split"] == "random"
+    assert "split" not in dataset[3].metadata
+
+    with pytest.raises(ValueError):
+        writer.append(np.zeros((11, 2)), np.zeros((10, 1)))
+
+
+def test_trajectory_dataset_trainTestSplit(tmp_path):
+    writer = TrajectoryDatasetWriter(tmp_path, chunk_size=20, dtype=np.float64)
+    for i in range(10):
+        # The longer episodes get chunks of their own
+        n_steps = 5 * (i + 1)
+        writer.append(
+            np.full((n_steps + 1, 2), i, dtype=np.float32),
+            np.full((n_steps, 1), i),
+        )
+
+    dataset = TrajectoryDataset(tmp_path)
+    train, test = dataset.train_test_split(test_size=0.3, seed=16)
+    assert (len(train), len(test)) == (7, 3)
+    assert sorted(train.indices + test.indices) == list(range(10))
+    assert train.n_steps + test.n_steps == dataset.n_steps == 275
+    for split in (train, test):
+        for i, episode in zip(split.indices, split):
+            assert episode.observations.shape == (5 * (i + 1) + 1, 2)
+            assert episode.observations.dtype == np.float64
+            np.testing.assert_array_equal(episode.actions, i)